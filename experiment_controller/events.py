@@ -0,0 +1,210 @@
+"""
+experiment_controller.events
+Типизированный поток событий для /ws.
+
+Каждое событие — JSON-объект::
+
+    {"seq": 17, "ts": 1718000000.1, "type": "stage", "exp_id": 3,
+     "stage": "mpi_run", "status": "running", "text": "Эксперимент 3: этап mpi_run"}
+
+Типы: ``experiment`` (смена статуса: queued / running / completed / failed),
+``stage`` (этап конвейера), ``log`` (строка stdout/stderr MPI), ``metrics``
+(последние отсчёты с VM), ``batch`` (прогресс серии), ``dropped`` (сколько
+событий клиент не получил).  Поле ``text`` — готовая строка для журнала GUI.
+
+У каждого клиента своя ограниченная очередь и своя задача отправки, поэтому
+медленный клиент не задерживает остальных.  При переполнении очереди
+сначала отбрасываются ``log`` / ``metrics`` (самые старые), события о ходе
+эксперимента не теряются; если очередь забита ими целиком или отправка
+зависла дольше WS_SEND_TIMEOUT, клиент отключается.
+
+Клиент может подписаться на отдельные эксперименты и типы событий —
+параметрами подключения ``/ws?experiments=1,2&types=stage,experiment``
+или сообщениями::
+
+    {"action": "subscribe",   "experiments": [4], "types": ["log"]}
+    {"action": "unsubscribe", "experiments": [4]}
+    {"action": "subscribe",   "experiments": null}   # снова все эксперименты
+
+``types`` — список имён из EVENT_TYPES или строка ``"stage,log"``, как в
+параметре подключения; неизвестный тип — ответ ``{"type": "error"}``.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+WS_CLIENT_QUEUE = int(os.environ.get("WS_CLIENT_QUEUE", "2000"))    # событий на клиента
+WS_SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", "10"))    # с на одну отправку
+
+EVENT_TYPES = ("experiment", "stage", "log", "metrics", "batch", "dropped")
+# события, которые можно потерять при переполнении очереди клиента
+DROPPABLE = {"log", "metrics"}
+
+
+def _parse_ids(values: Optional[Iterable[Any]]) -> Optional[Set[int]]:
+    if values is None:
+        return None
+    return {int(v) for v in values}
+
+
+def parse_types(values: Any) -> Optional[Set[str]]:
+    """Фильтр типов: список имён или строка ``"stage,log"``; None — все типы.
+
+    ValueError — не список строк или неизвестный тип (строка ``"log"`` не
+    должна превратиться в набор букв и молча отсечь все события).
+    """
+    if values is None or isinstance(values, str):
+        types = parse_filter(values)
+    elif isinstance(values, list) and all(isinstance(v, str) for v in values):
+        types = set(values)
+    else:
+        raise ValueError("types must be a list of strings")
+    unknown = sorted((types or set()) - set(EVENT_TYPES))
+    if unknown:
+        raise ValueError(f"unknown event types {unknown}; known: {list(EVENT_TYPES)}")
+    return types
+
+
+class Client:
+    def __init__(self, ws: WebSocket, experiments: Optional[Set[int]] = None,
+                 types: Optional[Set[str]] = None, max_queue: int = WS_CLIENT_QUEUE):
+        self.ws = ws
+        self.experiments = experiments     # None — все эксперименты
+        self.types = types                 # None — все типы
+        self.max_queue = max(1, max_queue)
+        self.dropped = 0                   # всего потеряно событий
+        self._pending_dropped = 0          # ещё не сообщено клиенту
+        self._queue: Deque[Tuple[str, str]] = deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def wants(self, kind: str, exp_id: Optional[int]) -> bool:
+        if self.types is not None and kind not in self.types:
+            return False
+        # события без эксперимента (серии) получают все
+        return self.experiments is None or exp_id is None or exp_id in self.experiments
+
+    def offer(self, kind: str, text: str) -> bool:
+        """Ставит событие в очередь; False — клиент безнадёжно отстал."""
+        if len(self._queue) >= self.max_queue:
+            if kind in DROPPABLE:
+                self._drop()
+                return True
+            # важное событие вытесняет самое старое отбрасываемое
+            victim = next((i for i, (k, _) in enumerate(self._queue) if k in DROPPABLE), None)
+            if victim is None:
+                return False
+            del self._queue[victim]
+            self._drop()
+        self._queue.append((kind, text))
+        self._ready.set()
+        return True
+
+    def _drop(self) -> None:
+        self.dropped += 1
+        self._pending_dropped += 1
+
+    async def run_sender(self) -> None:
+        """Отправляет события из очереди, пока клиент подключён."""
+        while not self.closed:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._queue and not self.closed:
+                if self._pending_dropped:
+                    notice = {"type": "dropped", "count": self._pending_dropped,
+                              "text": f"Пропущено {self._pending_dropped} событий"}
+                    self._pending_dropped = 0
+                    await self._send(json.dumps(notice, ensure_ascii=False))
+                _, text = self._queue.popleft()
+                await self._send(text)
+
+    async def _send(self, text: str) -> None:
+        await asyncio.wait_for(self.ws.send_text(text), WS_SEND_TIMEOUT)
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    def handle(self, message: str) -> Dict[str, Any]:
+        """Разбирает управляющее сообщение клиента; возвращает ответ."""
+        try:
+            msg = json.loads(message)
+            action = msg.get("action")
+            if action == "subscribe":
+                # разбираем всё до изменения подписки: ошибка не меняет её наполовину
+                ids = _parse_ids(msg["experiments"]) if "experiments" in msg else None
+                types = parse_types(msg["types"]) if "types" in msg else None
+                if "experiments" in msg:
+                    if ids is None or self.experiments is None:
+                        self.experiments = ids
+                    else:
+                        self.experiments |= ids
+                if "types" in msg:
+                    self.types = types
+            elif action == "unsubscribe":
+                ids = _parse_ids(msg.get("experiments")) or set()
+                types = parse_types(msg.get("types"))
+                # отписка от части «всех» экспериментов не выражается множеством
+                if self.experiments is not None:
+                    self.experiments -= ids
+                if types and self.types is not None:
+                    self.types -= types
+            else:
+                return {"type": "error", "error": f"unknown action {action!r}"}
+        except (ValueError, TypeError, AttributeError) as e:
+            return {"type": "error", "error": f"bad message: {e}"}
+        return {"type": "subscribed", **self.subscription()}
+
+    def subscription(self) -> Dict[str, Any]:
+        return {
+            "experiments": sorted(self.experiments) if self.experiments is not None else None,
+            "types": sorted(self.types) if self.types is not None else None,
+        }
+
+
+class EventHub:
+    """Реестр WebSocket-клиентов и публикация событий (без ожидания отправки)."""
+
+    def __init__(self):
+        self.clients: Set[Client] = set()
+        self.seq = 0
+
+    def publish(self, kind: str, exp_id: Optional[int] = None, text: str = "", **data: Any) -> None:
+        self.seq += 1
+        event = {"seq": self.seq, "ts": time.time(), "type": kind, "exp_id": exp_id,
+                 **data, "text": text}
+        payload = json.dumps(event, ensure_ascii=False, default=str)   # один раз на всех
+        for client in list(self.clients):
+            if client.wants(kind, exp_id) and not client.offer(kind, payload):
+                self.remove(client)
+
+    def add(self, client: Client) -> None:
+        self.clients.add(client)
+
+    def remove(self, client: Client) -> None:
+        self.clients.discard(client)
+        client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self.clients),
+            "seq": self.seq,
+            "queued": sum(len(c) for c in self.clients),
+            "dropped": sum(c.dropped for c in self.clients),
+        }
+
+
+def parse_filter(text: Optional[str]) -> Optional[Set[str]]:
+    """``"1,2"`` → {"1", "2"}; пустое значение — без фильтра."""
+    if not text:
+        return None
+    return {v.strip() for v in text.split(",") if v.strip()}
@@ -1,7 +1,14 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-import requests, subprocess, time, asyncio
-from .utils_ssh import push_openmpi_files_all, run_mpi
+from contextlib import asynccontextmanager
+from requests.adapters import HTTPAdapter
+import requests, subprocess, time, asyncio, os, collections, json
+from .utils_ssh import exec_ssh, push_openmpi_files_all, run_mpi, ssh_pool
+from .scheduler import Batch, Run, SweepSpec
+from .store import GROUP_COLUMNS, ResultStore, record_of
+from .streaming import LineRelay, OutputCapture, output_path
+from .events import Client, EventHub, parse_filter, parse_types
+from .probe import probe_network
 
 app = FastAPI(title="Experiment Controller")
 EXPCTL_REST = "http://localhost:8000" 
@@ -10,16 +17,47 @@ GNS3_TOKEN = None  # Токен авторизации GNS3 server будет с
 gns3_proc: subprocess.Popen | None = None
 PLACEMENT_URL = "http://localhost:8003/map"
 METRICS_URL   = "http://localhost:8004"
-experiment_counter = 0  # простой счётчик для ID экспериментов
-experiments = {}  # хранение информации об экспериментах в памяти (можно сохранять в JSON при необходимости)
+VM_MANAGER_URL = "http://localhost:8002"
+# при остановке контроллера снести все развёртки (POST /cleanup) ...
+TEARDOWN_ON_SHUTDOWN = os.environ.get("TEARDOWN_ON_SHUTDOWN", "1") != "0"
+# ... и добить осиротевшие qemu проектов GNS3 — только по явному согласию
+KILL_ORPHANS_ON_SHUTDOWN = os.environ.get("KILL_ORPHANS_ON_SHUTDOWN", "0") == "1"
+# период событий ``metrics`` в /ws, пока идёт mpirun
+METRICS_EVENT_INTERVAL = float(os.environ.get("METRICS_EVENT_INTERVAL", "2.0"))
+# замер сети между VM (probe.py) как модель расстояний для placement — по умолчанию
+PROBE_NETWORK = os.environ.get("PROBE_NETWORK", "0") == "1"
+# Эксперименты сохраняются в SQLite (store.py); нумерация продолжается после перезапуска
+store = ResultStore()
+store.mark_interrupted()
+experiment_counter = (store.max_id() or -1) + 1  # простой счётчик для ID экспериментов
+experiments = {}  # эксперименты текущего запуска; история — в store
+# Сколько экспериментов выполняется одновременно (все делят один gns3server)
+EXPERIMENT_WORKERS = int(os.environ.get("EXPERIMENT_WORKERS", "1"))
+STAGES = ("select_topology", "deploy", "probe", "placement", "push_files",
+          "metrics_start", "mpi_run", "metrics_finish")
 
-# Список активных WebSocket-соединений для отправки статусов GUI
-active_connections: list[WebSocket] = []  
+# Общая HTTP-сессия (keep-alive) для обращений к соседним сервисам;
+# блокирующие вызовы выполняются в пуле потоков, а не в event loop.
+http = requests.Session()
+http.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
+job_queue: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+batch_counter = 0
+batches: dict[int, Batch] = {}
+_batch_tasks: dict[int, asyncio.Task] = {}
+
+# WebSocket-клиенты GUI и типизированные события для них (см. events.py)
+hub = EventHub()
 
 class ExperimentRequest(BaseModel):
     topology: str
     task_topology: str = "STAR"
     strategy: str = "Simple"
+    processes: int | None = None   # число рангов; по умолчанию — все слоты
+    slots: int | None = None       # рангов на VM; по умолчанию — число vCPU
+    cpus: int | None = None        # vCPU на VM при развёртывании
+    seed: int | None = None        # воспроизводимое размещение для стратегии Random
+    probe: bool | None = None      # замерить сеть и размещать по замеру; по умолчанию — PROBE_NETWORK
 
 @app.on_event("startup")
 def startup_event():
@@ -36,96 +74,414 @@ def startup_event():
     GNS3_TOKEN = resp.json().get("access_token")
     print("GNS3 Server authenticated, token:", GNS3_TOKEN)
 
-@app.post("/experiments/start")
-async def start_experiment(req: ExperimentRequest):
-    """
-    REST-метод для запуска нового эксперимента.
-    Клиент (GUI) вызывает этот метод, передавая название топологии (например, "torus").
+async def _call(method: str, url: str, **kwargs) -> requests.Response:
+    """HTTP-запрос к соседнему сервису без блокировки event loop."""
+    return await asyncio.to_thread(http.request, method, url, **kwargs)
+
+
+@asynccontextmanager
+async def _stage(exp_id: int, name: str):
+    """Отмечает этап эксперимента: running → done | failed.
+
+    started_at/finished_at — настенное время для отображения, а
+    длительность ``duration_ms`` меряется монотонными часами.
     """
-    topology = req.topology
-    task_topology = req.task_topology
-    strategy = req.strategy
-    global experiment_counter
-    exp_id = experiment_counter
-    experiment_counter += 1
-    # Сохраняем начальное состояние эксперимента
-    experiments[exp_id] = {
-        "topology": topology,
-        "task_topology": task_topology,
-        "strategy": strategy,
-        "status": "starting",
-        "result": None,
+    exp = experiments[exp_id]
+    info = exp["stages"][name]
+    exp["stage"] = name
+    info.update(status="running", started_at=time.time())
+    hub.publish("stage", exp_id, f"Эксперимент {exp_id}: этап {name}",
+                stage=name, status="running")
+    t0 = time.perf_counter_ns()
+    try:
+        yield info
+    except Exception as e:
+        info.update(status="failed", finished_at=time.time(), error=str(e),
+                    duration_ms=round((time.perf_counter_ns() - t0) / 1e6, 3))
+        hub.publish("stage", exp_id, f"Эксперимент {exp_id}: этап {name} — ошибка",
+                    stage=name, status="failed", duration_ms=info["duration_ms"], error=str(e))
+        raise
+    except asyncio.CancelledError:
+        info.update(status="interrupted", finished_at=time.time(),
+                    duration_ms=round((time.perf_counter_ns() - t0) / 1e6, 3))
+        raise
+    info.update(status="done", finished_at=time.time(),
+                duration_ms=round((time.perf_counter_ns() - t0) / 1e6, 3))
+    hub.publish("stage", exp_id, f"Эксперимент {exp_id}: этап {name} — {info['duration_ms']:.0f} мс",
+                stage=name, status="done", duration_ms=info["duration_ms"])
+
+
+async def _metrics_feed(exp_id: int, token: str, done: asyncio.Event):
+    """Пока идёт mpirun, публикует последние отсчёты метрик с каждой VM."""
+    while True:
+        try:
+            await asyncio.wait_for(done.wait(), METRICS_EVENT_INTERVAL)
+            return
+        except asyncio.TimeoutError:
+            pass
+        try:
+            resp = await _call("GET", f"{METRICS_URL}/metrics/{token}", timeout=5)
+            summary = resp.json()["summary"]
+        except (requests.RequestException, ValueError, KeyError):
+            continue
+        hosts = {h: {field: s["last"] for field, s in stats.items()}
+                 for h, stats in summary["hosts"].items()}
+        cpu = summary["cluster"].get("cpu_pct", {}).get("mean")
+        text = f"Эксперимент {exp_id}: метрики с {len(hosts)} VM"
+        if cpu is not None:
+            text += f", CPU в среднем {cpu:.0f}%"
+        hub.publish("metrics", exp_id, text, hosts=hosts)
+
+
+def _timing_breakdown(exp: dict, vm_result: dict, mpi_timing: dict, window_s: float) -> dict:
+    """Куда ушло время: этапы конвейера, фазы развёртывания, запуск MPI."""
+    # при переиспользовании развёртки из серии её timings относятся к прошлому прогону
+    reused = exp["stages"]["deploy"].get("status") == "reused"
+    deploy = {} if reused else vm_result.get("timings") or {}
+    return {
+        "stages_ms": {name: info.get("duration_ms") for name, info in exp["stages"].items()
+                      if info.get("duration_ms") is not None},
+        # фазы VM Manager (topology, templates, nodes, links, start, boot_wait, ip_config, …)
+        "deploy_ms": {k: round(v * 1000, 3) for k, v in deploy.items()},
+        "mpi": mpi_timing,
+        "metrics_window_ms": round(window_s * 1000, 3),
     }
+
+
+async def _run_experiment(exp_id: int, deployment: dict | None = None):
+    """Конвейер эксперимента; выполняется воркером в фоне.
+
+    Если передана ``deployment`` (ответ VM Manager от предыдущего прогона на
+    той же топологии), этап развёртывания пропускается.
+    """
+    exp = experiments[exp_id]
+    topology = exp["topology"]
+    task_topology = exp["task_topology"]
+    strategy = exp["strategy"]
+    exp["status"] = "running"
     # Отправляем начальный статус по WebSocket всем подключенным клиентам
-    for ws in active_connections:
-        await ws.send_text(
-            f"Эксперимент {exp_id} запускается (кластер: {topology}, задача: {task_topology}, стратегия: {strategy})"
-        )
+    hub.publish(
+        "experiment", exp_id,
+        f"Эксперимент {exp_id} запускается (кластер: {topology}, задача: {task_topology}, стратегия: {strategy})",
+        status="running", topology=topology, task_topology=task_topology, strategy=strategy,
+    )
 
     # 3. Уведомляем GNS3 Manager о выбранной топологии через REST
-    requests.post("http://localhost:8001/select_topology", json={"name": topology})
+    async with _stage(exp_id, "select_topology"):
+        await _call("POST", "http://localhost:8001/select_topology", json={"name": topology})
 
     # 4. Вызываем GNS3 VM Manager для создания виртуальной сети по выбранной топологии.
     # Передаём название топологии и токен авторизации для gns3server.
-    resp = requests.post(
-        "http://localhost:8002/start",
-        json={"topology": topology, "token": GNS3_TOKEN},
-    )
-    vm_result = resp.json()
+    if deployment is not None:
+        exp["stages"]["deploy"] = {"status": "reused"}
+        vm_result = deployment
+    else:
+        async with _stage(exp_id, "deploy"):
+            resp = await _call(
+                "POST",
+                f"{VM_MANAGER_URL}/start",
+                json={"topology": topology, "token": GNS3_TOKEN, "cpus": exp.get("cpus")},
+            )
+            vm_result = resp.json()
+            if "error" in vm_result:
+                raise RuntimeError(vm_result["error"])
+    exp["deployment"] = vm_result
     # будем работать по IP, которые вернул VM-manager
-    hosts = [n.get("ip_address") for n in vm_result.get("nodes", [])]
-    hosts = [h for h in hosts if h]   # отфильтровали None
+    configured = [n for n in vm_result.get("nodes", []) if n.get("ip_address")]
+    hosts = [n["ip_address"] for n in configured]
+    # имена узлов GNS3 — чтобы placement сопоставил адреса вершинам топологии
+    node_names = [n.get("name") for n in configured]
+    if not hosts:
+        raise RuntimeError("no configured hosts in deployment")
+    cores = [int((n.get("properties") or {}).get("cpus") or 1) for n in configured]
+    slots = [exp.get("slots") or c for c in cores]
+    n_proc = exp.get("processes") or sum(slots)
+
+    # 4-A. Замер задержек/полос между VM; кэшируется, пока жива развёртка
+    distance_matrix = None
+    if exp.get("probe"):
+        async with _stage(exp_id, "probe") as info:
+            fresh = deployment is None and not vm_result.get("reused")
+            probe = await asyncio.to_thread(probe_network, hosts, vm_result, exec_ssh, fresh)
+            distance_matrix = probe["distance_matrix"]
+            info.update(probe["summary"])
+    else:
+        exp["stages"]["probe"] = {"status": "skipped"}
+
     # 5. Запрашиваем у Placement Engine mapping rank→host
-    map_resp = requests.post(
-        PLACEMENT_URL,
-        json={
-            "task_graph": {"processes": len(hosts)},
-            "nodes": hosts,
-            "strategy": strategy,
-            "cluster_topology": topology,
-            "task_topology": task_topology,
-        },
-    )
-    mapping = map_resp.json()
+    async with _stage(exp_id, "placement"):
+        map_resp = await _call(
+            "POST",
+            PLACEMENT_URL,
+            json={
+                "task_graph": {"processes": n_proc},
+                "nodes": hosts,
+                "node_names": node_names,
+                "slots": slots,
+                "cores": cores,
+                "seed": exp.get("seed"),
+                "strategy": strategy,
+                "cluster_topology": topology,
+                "task_topology": task_topology,
+                "distance_matrix": distance_matrix,
+            },
+        )
+        map_resp.raise_for_status()
+        mapping = map_resp.json()
 
     # 6-A. Отправляем rank/host-files на все VM
     master_vm = hosts[0]                 # упрощение: первый хост мастер
-    rf_remote, hf_remote = push_openmpi_files_all(
-        hosts,
-        mapping["rankfile"],
-        mapping["hostfile"]
-    )
+    async with _stage(exp_id, "push_files"):
+        rf_remote, hf_remote = await asyncio.to_thread(
+            push_openmpi_files_all, hosts, mapping["rankfile"], mapping["hostfile"]
+        )
 
     # 6-B. Старт метрик
-    token = requests.post(f"{METRICS_URL}/start",
-                          json={"exp_id": exp_id}).json()["token"]
+    async with _stage(exp_id, "metrics_start"):
+        token = (await _call("POST", f"{METRICS_URL}/start",
+                             json={"exp_id": exp_id, "hosts": hosts})).json()["token"]
 
-    # 6-C. Запускаем mpirun удалённо
-    stdout, stderr = run_mpi(master_vm,
-                             np=len(hosts),
-                             rf=rf_remote)
+    # 6-C. Запускаем mpirun удалённо; вывод по мере поступления уходит в /ws,
+    # а большой вывод сбрасывается на диск (см. streaming.py)
+    relay = LineRelay()
+    finished = asyncio.Event()
+
+    async def send_line(stream: str, line: str):
+        hub.publish("log", exp_id, f"Эксперимент {exp_id} [{stream}] {line}",
+                    stream=stream, line=line)
+
+    forwarder = asyncio.create_task(relay.pump(send_line, finished))
+    feed = asyncio.create_task(_metrics_feed(exp_id, token, finished))
+    out_cap = OutputCapture(output_path(exp_id, "stdout"))
+    err_cap = OutputCapture(output_path(exp_id, "stderr"))
+    try:
+        async with _stage(exp_id, "mpi_run"):
+            stdout, stderr, mpi_timing = await asyncio.to_thread(
+                run_mpi, master_vm, np=n_proc, rf=rf_remote, hf=hf_remote,
+                oversubscribe=mapping.get("oversubscribed", False),
+                on_line=relay.push, stdout=out_cap, stderr=err_cap,
+            )
+    finally:
+        finished.set()
+        await asyncio.gather(forwarder, feed)
+    if relay.dropped:
+        hub.publish("dropped", exp_id, f"Эксперимент {exp_id}: пропущено {relay.dropped} строк вывода",
+                    count=relay.dropped, source="relay")
 
     # 6-D. Финиш метрик
-    exec_time = requests.post(f"{METRICS_URL}/finish",
-                              json={"token": token}).json()["exec_time"]
+    async with _stage(exp_id, "metrics_finish"):
+        metrics = (await _call("POST", f"{METRICS_URL}/finish",
+                               json={"token": token})).json()
+        window = metrics["exec_time"]
+    # время счёта — замер mpirun внутри гостя; окно метрик включает ещё и SSH
+    wall_ms = mpi_timing.get("mpirun_wall_ms")
+    exec_time = wall_ms / 1000 if wall_ms is not None else window
 
     result = {"project": vm_result,
               "mapping": mapping,
               "exec_time": exec_time,
+              "timings": _timing_breakdown(exp, vm_result, mpi_timing, window),
+              "metrics_token": token,
+              "metrics": metrics.get("summary"),
               "mpi_stdout": stdout,
-              "mpi_stderr": stderr}
-
+              "mpi_stderr": stderr,
+              "mpi_output": {"stdout": out_cap.info(), "stderr": err_cap.info(),
+                             "ws_dropped": relay.dropped}}
 
     # Обновляем статус и результат эксперимента в памяти
-    experiments[exp_id]["status"] = "completed"
-    experiments[exp_id]["result"] = result
+    exp["status"] = "completed"
+    exp["result"] = result
+
+
+async def _execute(exp_id: int, deployment: dict | None = None) -> bool:
+    """Выполняет эксперимент и фиксирует исход (успех/ошибка)."""
+    try:
+        await _run_experiment(exp_id, deployment)
+    except Exception as e:
+        experiments[exp_id]["status"] = "failed"
+        experiments[exp_id]["error"] = f"{type(e).__name__}: {e}"
+        hub.publish("experiment", exp_id, f"Эксперимент {exp_id} завершён. Результат: ошибка ({e})",
+                    status="failed", error=experiments[exp_id]["error"])
+        return False
+    except asyncio.CancelledError:
+        # контроллер останавливается посреди прогона
+        experiments[exp_id]["status"] = "interrupted"
+        experiments[exp_id]["error"] = "прервано остановкой контроллера"
+        hub.publish("experiment", exp_id, f"Эксперимент {exp_id} прерван остановкой контроллера",
+                    status="interrupted")
+        raise
+    else:
+        # Финальное уведомление о завершении эксперимента через WebSocket
+        hub.publish("experiment", exp_id, f"Эксперимент {exp_id} завершён. Результат: успех",
+                    status="completed", exec_time=experiments[exp_id]["result"]["exec_time"])
+        return True
+    finally:
+        experiments[exp_id]["stage"] = None
+        experiments[exp_id]["finished_at"] = time.time()
+        store.save(record_of(exp_id, experiments[exp_id]))
+
+
+async def _worker():
+    """Фоновый воркер: берёт эксперименты из очереди по одному.
+
+    Элемент очереди — (exp_id, развёртка для переиспользования | None,
+    future для ожидающей серии | None): одиночные эксперименты и прогоны
+    серий идут через одну очередь и один лимит EXPERIMENT_WORKERS, чтобы
+    mpirun на одних и тех же VM не шли одновременно.
+    """
+    while True:
+        exp_id, deployment, done = await job_queue.get()
+        try:
+            ok = await _execute(exp_id, deployment)
+            if done is not None and not done.done():
+                done.set_result(ok)
+        finally:
+            if done is not None and not done.done():
+                done.cancel()
+            job_queue.task_done()
+
+
+@app.on_event("startup")
+async def start_workers():
+    global job_queue
+    job_queue = asyncio.Queue()
+    for _ in range(max(1, EXPERIMENT_WORKERS)):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+def _new_experiment(topology: str, task_topology: str, strategy: str,
+                    processes: int | None = None, slots: int | None = None,
+                    cpus: int | None = None, seed: int | None = None,
+                    probe: bool | None = None) -> int:
+    """Регистрирует эксперимент и возвращает его ID."""
+    global experiment_counter
+    exp_id = experiment_counter
+    experiment_counter += 1
+    # Сохраняем начальное состояние эксперимента
+    experiments[exp_id] = {
+        "topology": topology,
+        "task_topology": task_topology,
+        "strategy": strategy,
+        "processes": processes,
+        "slots": slots,
+        "cpus": cpus,
+        "seed": seed,
+        "probe": PROBE_NETWORK if probe is None else probe,
+        "status": "queued",
+        "stage": None,
+        "stages": {name: {"status": "pending"} for name in STAGES},
+        "created_at": time.time(),
+        "result": None,
+    }
+    store.save(record_of(exp_id, experiments[exp_id]))
+    hub.publish("experiment", exp_id, f"Эксперимент {exp_id} поставлен в очередь",
+                status="queued", topology=topology, task_topology=task_topology, strategy=strategy)
+    return exp_id
 
-    # 5. Отправляем финальное уведомление о завершении эксперимента через WebSocket
-    for ws in active_connections:
-        await ws.send_text(f"Эксперимент {exp_id} завершён. Результат: успех")
 
+@app.post("/experiments/start")
+async def start_experiment(req: ExperimentRequest):
+    """
+    REST-метод для запуска нового эксперимента.
+    Клиент (GUI) вызывает этот метод, передавая название топологии (например, "torus").
+    Эксперимент ставится в очередь и выполняется в фоне; ID возвращается сразу,
+    ход выполнения доступен через /experiments/{id}/status и WebSocket.
+    """
+    exp_id = _new_experiment(req.topology, req.task_topology, req.strategy,
+                             req.processes, req.slots, req.cpus, req.seed, req.probe)
+    await job_queue.put((exp_id, None, None))
     # Возвращаем клиенту ID запущенного эксперимента (может использоваться для запроса результата)
-    return {"experiment_id": exp_id}
+    return {"experiment_id": exp_id, "status": "queued"}
+
+async def _run_batch(batch: Batch):
+    async def run_one(run: Run, deployment: dict | None):
+        spec = batch.spec
+        exp_id = _new_experiment(run.topology, run.task_topology, run.strategy,
+                                 spec.processes, spec.slots, spec.cpus, spec.seed, spec.probe)
+        experiments[exp_id]["batch_id"] = batch.id
+        done = asyncio.get_running_loop().create_future()
+        await job_queue.put((exp_id, deployment, done))
+        ok = await done
+        p = batch.progress
+        hub.publish(
+            "batch", None,
+            f"Серия {batch.id}: {p['completed'] + p['failed']}/{p['total']} "
+            f"(эксперимент {exp_id}: {'успех' if ok else 'ошибка'})",
+            batch_id=batch.id, progress=p, experiment=exp_id, ok=ok,
+        )
+        # после неудачи (или если часть VM осталась без IP) развёртку не
+        # переиспользуем — следующий прогон развернёт её заново
+        deployment = experiments[exp_id].get("deployment") if ok else None
+        if deployment and deployment.get("unconfigured"):
+            deployment = None
+        return exp_id, ok, deployment
+
+    async def release(topology: str):
+        resp = await _call("POST", f"{VM_MANAGER_URL}/teardown",
+                           json={"topology": topology, "token": GNS3_TOKEN})
+        report = resp.json()
+        freed = report.get("freed", {})
+        hub.publish("batch", None,
+                    f"Серия {batch.id}: топология {topology} снята "
+                    f"(VM: {freed.get('vms', 0)}, RAM: {freed.get('ram_mb', 0)} МБ)",
+                    batch_id=batch.id, progress=batch.progress, teardown=report)
+
+    try:
+        await batch.execute(run_one, release if batch.spec.teardown else None)
+    finally:
+        _batch_tasks.pop(batch.id, None)
+    hub.publish("batch", None, f"Серия {batch.id} завершена: {batch.progress}",
+                batch_id=batch.id, progress=batch.progress, status="finished")
+
+
+@app.post("/batches")
+async def start_batch(spec: SweepSpec):
+    """
+    Запускает серию экспериментов по sweep-спецификации
+    (topologies × task_topologies × strategies × repetitions).
+    Возвращает ID серии сразу; прогресс — через GET /batches/{id}.
+    """
+    global batch_counter
+    batch = Batch(batch_counter, spec)
+    batch_counter += 1
+    batches[batch.id] = batch
+    _batch_tasks[batch.id] = asyncio.create_task(_run_batch(batch))
+    return {"batch_id": batch.id, "runs": len(batch.runs)}
+
+
+@app.get("/batches")
+def list_batches():
+    return [
+        {"batch_id": b.id, "status": b.status, "progress": b.progress}
+        for b in batches.values()
+    ]
+
+
+@app.get("/batches/{batch_id}")
+def get_batch(batch_id: int):
+    """Прогресс серии и агрегированные результаты (exec_time по комбинациям)."""
+    batch = batches.get(batch_id)
+    if batch is None:
+        return {"error": "Batch not found"}
+    return batch.summary(experiments)
+
+
+@app.get("/experiments/{exp_id}/status")
+def get_experiment_status(exp_id: int):
+    """Текущее состояние эксперимента по этапам."""
+    exp = experiments.get(exp_id)
+    if exp is None:
+        row = store.get(exp_id)
+        if row is None:
+            return {"error": "Experiment not found"}
+        return {"status": row["status"], "stage": None, "stages": row["stages"],
+                "error": row["error"]}
+    return {
+        "status": exp["status"],
+        "stage": exp["stage"],
+        "stages": exp["stages"],
+        "error": exp.get("error"),
+    }
 
 @app.get("/experiments/{exp_id}/result")
 def get_experiment_result(exp_id: int):
@@ -135,36 +491,187 @@ def get_experiment_result(exp_id: int):
     """
     exp = experiments.get(exp_id)
     if exp is None:
-        return {"error": "Experiment not found"}
+        row = store.get(exp_id)
+        if row is None:
+            return {"error": "Experiment not found"}
+        return {
+            "topology": row["topology"],
+            "task_topology": row["task_topology"],
+            "strategy": row["strategy"],
+            "status": row["status"],
+            "error": row["error"],
+            "result": {"mapping": row["mapping"], "exec_time": row["exec_time"],
+                       "timings": row["timings"],
+                       "metrics": row["metrics"], "mpi_stdout": row["stdout"],
+                       "mpi_stderr": row["stderr"]},
+        }
     return {
         "topology": exp["topology"],
         "task_topology": exp.get("task_topology"),
         "strategy": exp.get("strategy"),
         "status": exp["status"],
+        "error": exp.get("error"),
         "result": exp["result"],
     }
 
+@app.get("/experiments/{exp_id}/output")
+def get_experiment_output(exp_id: int, stream: str = "stdout", tail: int = 200):
+    """
+    Последние ``tail`` строк вывода MPI.  Если вывод был сброшен на диск,
+    читается файл (построчно — память не зависит от его размера).
+    """
+    if stream not in ("stdout", "stderr"):
+        return {"error": "stream must be stdout or stderr"}
+    tail = max(1, tail)
+    path = output_path(exp_id, stream)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = list(collections.deque((l.rstrip("\n") for l in f), maxlen=tail))
+        return {"stream": stream, "source": path, "lines": lines}
+    exp = experiments.get(exp_id)
+    if exp is not None:
+        text = (exp.get("result") or {}).get(f"mpi_{stream}")
+    else:
+        row = store.get(exp_id)
+        if row is None:
+            return {"error": "Experiment not found"}
+        text = row[stream]
+    return {"stream": stream, "source": "result",
+            "lines": (text or "").splitlines()[-tail:]}
+
+
+@app.get("/results")
+def list_results(
+    topology: str | None = None,
+    task_topology: str | None = None,
+    strategy: str | None = None,
+    status: str | None = None,
+    batch_id: int | None = None,
+    since: float | None = None,
+    until: float | None = None,
+    limit: int = 50,
+    offset: int = 0,
+    before_id: int | None = None,
+):
+    """
+    История экспериментов из хранилища, новые первыми.
+    Фильтры — по полям и по времени создания (since/until, unix-время);
+    страницы — limit/offset или курсор before_id (= next_before_id из ответа).
+    """
+    limit = max(1, min(limit, 1000))
+    filters = {"topology": topology, "task_topology": task_topology,
+               "strategy": strategy, "status": status, "batch_id": batch_id}
+    rows, total = store.query(filters, since, until, limit, max(0, offset), before_id)
+    return {
+        "total": total,
+        "items": rows,
+        "next_before_id": rows[-1]["id"] if len(rows) == limit else None,
+    }
+
+
+@app.get("/results/aggregate")
+def aggregate_results(
+    group_by: str = "strategy",
+    topology: str | None = None,
+    task_topology: str | None = None,
+    strategy: str | None = None,
+    batch_id: int | None = None,
+    since: float | None = None,
+    until: float | None = None,
+):
+    """Среднее/мин/макс/σ exec_time по группам, например ?group_by=topology,strategy."""
+    cols = [c.strip() for c in group_by.split(",") if c.strip()]
+    unknown = [c for c in cols if c not in GROUP_COLUMNS]
+    if unknown:
+        return {"error": f"cannot group by {', '.join(unknown)}"}
+    filters = {"topology": topology, "task_topology": task_topology,
+               "strategy": strategy, "batch_id": batch_id}
+    return store.aggregate(cols, filters, since, until)
+
+
+@app.get("/results/{exp_id}")
+def get_stored_result(exp_id: int):
+    """Полная запись эксперимента из хранилища (с mapping, метриками и выводом MPI)."""
+    row = store.get(exp_id)
+    if row is None:
+        return {"error": "Experiment not found"}
+    return row
+
+
+@app.get("/ssh/pool")
+def get_ssh_pool_stats():
+    """Статистика пула SSH-соединений (hits / misses / открытые сессии)."""
+    ssh_pool.evict_idle()
+    return ssh_pool.stats()
+
+@app.get("/ws/stats")
+def get_ws_stats():
+    """Число WebSocket-клиентов, события в их очередях и потерянные события."""
+    return hub.stats()
+
 @app.websocket("/ws")
 async def websocket_status(websocket: WebSocket):
     """
     WebSocket-эндпоинт для отправки статусов эксперимента в режиме реального времени на GUI.
+    Поток JSON-событий (см. events.py); фильтр — ``?experiments=1,2&types=stage,log``
+    или сообщения ``{"action": "subscribe", ...}``.
     """
     # Принимаем новое WebSocket-соединение от клиента
     await websocket.accept()
-    active_connections.append(websocket)
     try:
-        # Удерживаем соединение открытым, слушая входящие (при необходимости)
+        ids = parse_filter(websocket.query_params.get("experiments"))
+        client = Client(websocket, experiments=None if ids is None else {int(i) for i in ids},
+                        types=parse_types(websocket.query_params.get("types")))
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    hub.add(client)
+    client.offer("subscribed", json.dumps({"type": "subscribed", **client.subscription()}))
+
+    async def receive():
+        # входящие сообщения — управление подпиской
         while True:
-            _ = await websocket.receive_text()  # (Можно обрабатывать входящие сообщения от GUI, если нужно)
-    except WebSocketDisconnect:
-        # Удаляем соединение из списка при отключении
-        active_connections.remove(websocket)
+            reply = client.handle(await websocket.receive_text())
+            client.offer(reply["type"], json.dumps(reply, ensure_ascii=False))
+
+    sender = asyncio.create_task(client.run_sender())
+    receiver = asyncio.create_task(receive())
+    try:
+        done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        hub.remove(client)
+    errors = [t.exception() for t in done]
+    if any(isinstance(e, WebSocketDisconnect) for e in errors):
+        return
+    # клиент отстал (очередь переполнена) или завис на отправке — закрываем
+    try:
+        await websocket.close(code=1013)
+    except Exception:
+        pass
 
 
 @app.on_event("shutdown")
-def shutdown_event():
-    """Terminate the gns3server process on shutdown."""
+async def shutdown_event():
+    """Tear down deployed VMs and terminate the gns3server process on shutdown."""
     global gns3_proc
+    for task in _workers:
+        task.cancel()
+    # прерванные прогоны сохраняются (interrupted) в finally у _execute —
+    # store закрываем только после того, как воркеры действительно вышли
+    await asyncio.gather(*_workers, return_exceptions=True)
+    ssh_pool.close_all()
+    store.close()
+    if TEARDOWN_ON_SHUTDOWN and GNS3_TOKEN:
+        try:
+            report = http.post(f"{VM_MANAGER_URL}/cleanup",
+                               json={"token": GNS3_TOKEN,
+                                     "kill_orphans": KILL_ORPHANS_ON_SHUTDOWN},
+                               timeout=120).json()
+            print("Развёртки сняты, освобождено:", report.get("freed"))
+        except (requests.RequestException, ValueError) as e:
+            print(f"[WARN] cleanup при остановке не выполнен: {e}")
     if gns3_proc and gns3_proc.poll() is None:
         gns3_proc.terminate()
         try:
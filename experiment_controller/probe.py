@@ -0,0 +1,205 @@
+"""
+experiment_controller.probe
+Замер сети между развёрнутыми VM: матрица задержек и полос «каждый с каждым».
+
+Каждая VM по SSH пингует всех остальных — все пары одновременно, по одной
+SSH-команде на VM.  По каждой паре делаются две серии ICMP echo: маленькими
+пакетами (задержка, RTT/2) и пакетами PROBE_SIZE байт; разница их RTT даёт
+оценку полосы (лишние байты прошли туда и обратно).
+
+Из замеров строится матрица стоимостей N×N — время доставки сообщения
+REF_MESSAGE_KB в мс (задержка + передача), как у весов связей в
+placement_engine; она передаётся в placement как ``distance_matrix``.
+
+Результат хранится компактно — ``.npz`` с массивами float32 — в PROBE_DIR,
+по файлу на развёртку (project_id + fingerprint + список хостов).  Пока
+развёртка переиспользуется, замер берётся из кэша; свежая развёртка
+замеряется заново.
+"""
+
+import hashlib
+import math
+import os
+import re
+import shlex
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from placement_engine.topology import REF_MESSAGE_KB
+
+PROBE_DIR = os.environ.get(
+    "PROBE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "cluster_net", "probes"),
+)
+PROBE_COUNT = int(os.environ.get("PROBE_COUNT", "5"))       # пакетов в серии
+PROBE_SIZE = int(os.environ.get("PROBE_SIZE", "8000"))      # байт в «большом» пакете
+PROBE_INTERVAL = 0.2    # с между пакетами (меньше — только от root)
+PROBE_WAIT = 1          # с ожидания ответа на пакет
+SMALL_SIZE = 56         # размер данных ping по умолчанию
+
+_RTT = re.compile(r"min/avg/max\S* = [\d.]+/([\d.]+)/")
+
+# exec(host, cmd, timeout) -> (stdout, stderr), как utils_ssh.exec_ssh
+Exec = Callable[[str, str, float], Tuple[str, str]]
+
+
+def probe_command(targets: Sequence[str], count: int = PROBE_COUNT,
+                  size: int = PROBE_SIZE) -> str:
+    """Команда гостя: обе серии ping до каждой цели, все цели параллельно.
+
+    На каждую цель выводится строка ``цель|итог малых|итог больших``.
+    """
+    ping = f"ping -n -q -c {count} -i {PROBE_INTERVAL} -W {PROBE_WAIT}"
+    parts = []
+    for t in map(shlex.quote, targets):
+        parts.append(f'(echo {t}"|$({ping} {t} 2>&1 | tail -1)'
+                     f'|$({ping} -s {size} {t} 2>&1 | tail -1)") &')
+    return " ".join(parts) + " wait"
+
+
+def parse_probe(output: str) -> Dict[str, Tuple[float, float]]:
+    """Средние RTT (мс) малых и больших пакетов по целям; NaN — нет ответа."""
+    rtts = {}
+    for line in output.splitlines():
+        fields = line.split("|")
+        if len(fields) != 3:
+            continue
+        avg = [_RTT.search(f) for f in fields[1:]]
+        rtts[fields[0].strip()] = tuple(float(m.group(1)) if m else math.nan for m in avg)
+    return rtts
+
+
+def _symmetric(m: np.ndarray) -> np.ndarray:
+    """Среднее замеров с двух сторон пары (или тот, что есть)."""
+    return np.where(np.isnan(m), m.T, np.where(np.isnan(m.T), m, (m + m.T) / 2))
+
+
+def measure(hosts: Sequence[str], exec_fn: Exec, count: int = PROBE_COUNT,
+            size: int = PROBE_SIZE) -> Dict[str, np.ndarray]:
+    """Замер всех пар: ``latency_ms`` (RTT/2) и ``bandwidth_mbit``, N×N.
+
+    Каждая пара меряется с обеих сторон, берётся среднее; NaN — пара не
+    ответила (или полоса не оценилась).  На диагонали — 0 и inf.
+    """
+    n = len(hosts)
+    small = np.full((n, n), np.nan)
+    large = np.full((n, n), np.nan)
+    # ping-серии длятся count·interval, плюс ожидание последнего ответа
+    timeout = 2 * (count * PROBE_INTERVAL + PROBE_WAIT) + 30
+
+    def run(i: int) -> Dict[str, Tuple[float, float]]:
+        others = [h for h in hosts if h != hosts[i]]
+        if not others:
+            return {}
+        out, _ = exec_fn(hosts[i], probe_command(others, count, size), timeout)
+        return parse_probe(out)
+
+    index = {h: i for i, h in enumerate(hosts)}
+    with ThreadPoolExecutor(max_workers=max(1, min(32, n))) as pool:
+        for i, rtts in enumerate(pool.map(run, range(n))):
+            for target, (s, l) in rtts.items():
+                if target in index:
+                    small[i, index[target]], large[i, index[target]] = s, l
+
+    small, large = _symmetric(small), _symmetric(large)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # (size − 56) байт лишних в каждую сторону: бит / мс / 1000 = Мбит/с
+        extra_kbit = 2 * (size - SMALL_SIZE) * 8 / 1000
+        bandwidth = np.where(large > small, extra_kbit / (large - small), np.nan)
+    latency = small / 2
+    np.fill_diagonal(latency, 0.0)
+    np.fill_diagonal(bandwidth, np.inf)
+    return {"latency_ms": latency, "bandwidth_mbit": bandwidth}
+
+
+def cost_matrix(latency_ms: np.ndarray, bandwidth_mbit: np.ndarray) -> List[List[float]]:
+    """Время доставки сообщения REF_MESSAGE_KB (мс) между хостами.
+
+    Неоценённая полоса не добавляет времени передачи; пары без ответа
+    получают удвоенную худшую стоимость среди замеренных — placement
+    будет держать их ранги порознь, но не сломается на бесконечности.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        transfer = np.where(np.isfinite(bandwidth_mbit) & (bandwidth_mbit > 0),
+                            REF_MESSAGE_KB * 8 / bandwidth_mbit, 0.0)
+    cost = latency_ms + transfer
+    measured = cost[np.isfinite(cost)]
+    worst = float(measured.max()) if measured.size else 1.0
+    cost = np.where(np.isfinite(cost), cost, 2 * worst or 1.0)
+    np.fill_diagonal(cost, 0.0)
+    return np.round(cost, 4).tolist()
+
+
+def cache_path(deployment: Dict[str, Any], hosts: Sequence[str]) -> str:
+    key = "|".join([str(deployment.get("project_id")),
+                    str(deployment.get("fingerprint")), *hosts])
+    return os.path.join(PROBE_DIR, hashlib.sha256(key.encode()).hexdigest()[:24] + ".npz")
+
+
+def load(path: str, hosts: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """Замер из кэша, если он есть и снят с тех же хостов."""
+    try:
+        with np.load(path) as f:
+            if list(f["hosts"]) != list(hosts):
+                return None
+            return {"latency_ms": f["latency_ms"].astype(float),
+                    "bandwidth_mbit": f["bandwidth_mbit"].astype(float),
+                    "measured_at": float(f["measured_at"])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save(path: str, hosts: Sequence[str], probe: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(
+        tmp,
+        hosts=np.array(hosts),
+        latency_ms=probe["latency_ms"].astype(np.float32),
+        bandwidth_mbit=probe["bandwidth_mbit"].astype(np.float32),
+        measured_at=np.float64(probe["measured_at"]),
+    )
+    os.replace(tmp, path)
+
+
+def probe_network(hosts: Sequence[str], deployment: Dict[str, Any], exec_fn: Exec,
+                  fresh: bool = False) -> Dict[str, Any]:
+    """Матрица стоимостей для placement, из кэша развёртки или новым замером.
+
+    ``fresh`` — развёртка только что создана: старый кэш не годится.
+    """
+    path = cache_path(deployment, hosts)
+    probe = None if fresh else load(path, hosts)
+    cached = probe is not None
+    if probe is None:
+        t0 = time.perf_counter()
+        probe = measure(hosts, exec_fn)
+        probe["measured_at"] = time.time()
+        probe["probe_time_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        save(path, hosts, probe)
+    latency, bandwidth = probe["latency_ms"], probe["bandwidth_mbit"]
+    off = ~np.eye(len(hosts), dtype=bool)
+    answered = np.isfinite(latency[off])
+    bw = bandwidth[off][np.isfinite(bandwidth[off])]
+    return {
+        "distance_matrix": cost_matrix(latency, bandwidth),
+        "summary": {
+            "cached": cached,
+            "file": path,
+            "measured_at": probe["measured_at"],
+            "probe_time_ms": probe.get("probe_time_ms"),
+            "pairs": int(off.sum()),
+            "unreachable_pairs": int((~answered).sum()),
+            "latency_ms": {
+                "min": round(float(latency[off][answered].min()), 4) if answered.any() else None,
+                "max": round(float(latency[off][answered].max()), 4) if answered.any() else None,
+            },
+            "bandwidth_mbit": {
+                "min": round(float(bw.min()), 1) if bw.size else None,
+                "max": round(float(bw.max()), 1) if bw.size else None,
+            },
+        },
+    }
@@ -0,0 +1,163 @@
+"""
+experiment_controller.scheduler
+Пакетный запуск экспериментов: развёртка sweep-спецификации
+(topology × task_topology × strategy × repetitions) в очередь прогонов.
+
+Прогоны группируются по топологии кластера: внутри группы они идут
+последовательно и переиспользуют уже развёрнутый GNS3-проект, поэтому
+переразвёртывание происходит только при смене топологии.  Разные
+топологии (разные проекты) могут выполняться параллельно — не более
+``concurrency`` групп одновременно.
+"""
+
+import asyncio
+import itertools
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+
+class SweepSpec(BaseModel):
+    topologies: List[str]
+    task_topologies: List[str] = ["STAR"]
+    strategies: List[str] = ["Simple"]
+    repetitions: int = Field(1, ge=1)
+    concurrency: int = Field(1, ge=1)   # сколько топологий обрабатывается одновременно
+    teardown: bool = False              # снимать развёртку топологии после её прогонов
+    # параметры каждого прогона — как в ExperimentRequest
+    processes: Optional[int] = None     # число рангов; по умолчанию — все слоты
+    slots: Optional[int] = None         # рангов на VM; по умолчанию — число vCPU
+    cpus: Optional[int] = None          # vCPU на VM при развёртывании
+    seed: Optional[int] = None          # воспроизводимое размещение для стратегии Random
+    probe: Optional[bool] = None        # замер сети перед placement (см. probe.py)
+
+
+class Run(BaseModel):
+    topology: str
+    task_topology: str
+    strategy: str
+    repetition: int
+    exp_id: Optional[int] = None
+    status: str = "pending"
+
+
+def plan_runs(spec: SweepSpec) -> List[Run]:
+    """Полный список прогонов, упорядоченный по топологии кластера.
+
+    Внутри топологии повторы чередуются по комбинациям (task, strategy),
+    чтобы дрейф состояния стенда не смещал результаты одной стратегии.
+    """
+    runs = []
+    for topology in dict.fromkeys(spec.topologies):
+        for rep in range(spec.repetitions):
+            for task, strategy in itertools.product(
+                dict.fromkeys(spec.task_topologies), dict.fromkeys(spec.strategies)
+            ):
+                runs.append(Run(topology=topology, task_topology=task,
+                                strategy=strategy, repetition=rep))
+    return runs
+
+
+# run_one(run, deployment) -> (exp_id, ok, deployment | None): выполняет один
+# эксперимент, получив развёртку предыдущего прогона той же топологии
+# (None — развернуть заново).
+RunOne = Callable[[Run, Optional[Dict[str, Any]]], Awaitable[Tuple[int, bool, Optional[Dict[str, Any]]]]]
+# release(topology): снимает развёртку топологии, когда её прогоны закончились
+Release = Callable[[str], Awaitable[None]]
+
+
+class Batch:
+    """Состояние одной серии экспериментов."""
+
+    def __init__(self, batch_id: int, spec: SweepSpec):
+        self.id = batch_id
+        self.spec = spec
+        self.runs = plan_runs(spec)
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.deployments = 0            # сколько раз топология разворачивалась
+
+    @property
+    def progress(self) -> Dict[str, int]:
+        counts = {"total": len(self.runs), "completed": 0, "failed": 0, "running": 0}
+        for r in self.runs:
+            if r.status in counts:
+                counts[r.status] += 1
+        counts["pending"] = counts["total"] - counts["completed"] - counts["failed"] - counts["running"]
+        return counts
+
+    async def execute(self, run_one: RunOne, release: Optional[Release] = None) -> None:
+        self.status = "running"
+        sem = asyncio.Semaphore(self.spec.concurrency)
+        groups: Dict[str, List[Run]] = {}
+        for r in self.runs:
+            groups.setdefault(r.topology, []).append(r)
+
+        async def run_group(runs: List[Run]) -> None:
+            async with sem:
+                deployment = None
+                for r in runs:
+                    r.status = "running"
+                    if deployment is None:
+                        self.deployments += 1
+                    r.exp_id, ok, deployment = await run_one(r, deployment)
+                    r.status = "completed" if ok else "failed"
+                if release is not None:
+                    try:
+                        await release(runs[0].topology)
+                    except Exception as e:
+                        # серия продолжается: VM снимет cleanup при остановке
+                        print(f"[WARN] не удалось снять топологию {runs[0].topology}: {e}")
+
+        await asyncio.gather(*(run_group(g) for g in groups.values()))
+        self.status = "completed"
+        self.finished_at = time.time()
+
+    def summary(self, experiments: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "deployments": self.deployments,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "runs": [r.model_dump() for r in self.runs],
+            "aggregate": aggregate(self.runs, experiments),
+        }
+
+
+def aggregate(runs: List[Run], experiments: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Сводка exec_time по каждой комбинации (topology, task_topology, strategy)."""
+    groups: Dict[tuple, List[Optional[float]]] = {}
+    for r in runs:
+        key = (r.topology, r.task_topology, r.strategy)
+        bucket = groups.setdefault(key, [])
+        exp = experiments.get(r.exp_id) if r.exp_id is not None else None
+        if exp is None or exp.get("status") != "completed":
+            if r.status == "failed":
+                bucket.append(None)
+            continue
+        bucket.append((exp.get("result") or {}).get("exec_time"))
+
+    rows = []
+    for (topology, task, strategy), values in groups.items():
+        times = [v for v in values if v is not None]
+        row: Dict[str, Any] = {
+            "topology": topology,
+            "task_topology": task,
+            "strategy": strategy,
+            "runs": len(values),
+            "failed": len(values) - len(times),
+        }
+        if times:
+            row.update(
+                mean=statistics.fmean(times),
+                min=min(times),
+                max=max(times),
+                stdev=statistics.stdev(times) if len(times) > 1 else 0.0,
+            )
+        rows.append(row)
+    return rows
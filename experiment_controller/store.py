@@ -0,0 +1,271 @@
+"""
+experiment_controller.store
+Постоянное хранилище экспериментов (SQLite в режиме WAL).
+
+Записи (параметры, этапы, mapping, exec_time, сводка метрик, stdout/stderr)
+ставятся в очередь и пишутся фоновым потоком пачками — одна транзакция на
+пачку, event loop не ждёт диска.  Чтение идёт через отдельные соединения
+потоков: WAL позволяет читать параллельно с записью.
+
+Индексы покрывают типичные выборки: по (topology, task_topology, strategy),
+по strategy / status и по времени создания; списки отдаются без тяжёлых
+столбцов (stdout/stderr/mapping), поэтому остаются быстрыми и на десятках
+тысяч прогонов.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+RESULTS_DB = os.environ.get(
+    "RESULTS_DB",
+    os.path.join(os.path.expanduser("~"), ".cache", "cluster_net", "results.sqlite3"),
+)
+WRITE_BATCH = 256          # записей в одной транзакции
+WRITE_FLUSH_INTERVAL = 0.2  # с — сколько ждать добора пачки
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+    id            INTEGER PRIMARY KEY,
+    batch_id      INTEGER,
+    topology      TEXT NOT NULL,
+    task_topology TEXT,
+    strategy      TEXT,
+    status        TEXT,
+    created_at    REAL,
+    finished_at   REAL,
+    exec_time     REAL,
+    processes     INTEGER,
+    hop_bytes     REAL,
+    error         TEXT,
+    params        TEXT,
+    stages        TEXT,
+    timings       TEXT,
+    mapping       TEXT,
+    metrics       TEXT,
+    stdout        TEXT,
+    stderr        TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_exp_combo   ON experiments(topology, task_topology, strategy, created_at);
+CREATE INDEX IF NOT EXISTS ix_exp_strategy ON experiments(strategy, exec_time);
+CREATE INDEX IF NOT EXISTS ix_exp_status  ON experiments(status, created_at);
+CREATE INDEX IF NOT EXISTS ix_exp_created ON experiments(created_at);
+CREATE INDEX IF NOT EXISTS ix_exp_batch   ON experiments(batch_id);
+"""
+
+COLUMNS = (
+    "id", "batch_id", "topology", "task_topology", "strategy", "status",
+    "created_at", "finished_at", "exec_time", "processes", "hop_bytes", "error",
+    "params", "stages", "timings", "mapping", "metrics", "stdout", "stderr",
+)
+JSON_COLUMNS = {"params", "stages", "timings", "mapping", "metrics"}
+# в списках не отдаём тяжёлые столбцы
+SUMMARY_COLUMNS = tuple(c for c in COLUMNS if c not in {"mapping", "metrics", "stdout", "stderr"})
+FILTERS = ("topology", "task_topology", "strategy", "status", "batch_id")
+GROUP_COLUMNS = ("topology", "task_topology", "strategy", "status", "batch_id", "processes")
+
+_STOP = object()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class ResultStore:
+    def __init__(self, path: str = RESULTS_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with _connect(path) as conn:
+            conn.executescript(SCHEMA)
+            # базы, созданные до появления столбца timings
+            have = {r["name"] for r in conn.execute("PRAGMA table_info(experiments)")}
+            if "timings" not in have:
+                conn.execute("ALTER TABLE experiments ADD COLUMN timings TEXT")
+        self._local = threading.local()
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="result-store", daemon=True)
+        self._writer.start()
+
+    # -- запись ---------------------------------------------------------------
+    def save(self, record: Dict[str, Any]) -> None:
+        """Поставить запись (полную строку, ключ — id) в очередь на запись."""
+        row = tuple(
+            json.dumps(record.get(c)) if c in JSON_COLUMNS and record.get(c) is not None
+            else record.get(c)
+            for c in COLUMNS
+        )
+        self._queue.put(row)
+
+    def flush(self) -> None:
+        """Дождаться записи всего, что уже поставлено в очередь."""
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(_STOP)
+        self._writer.join(timeout=10)
+
+    def _write_loop(self) -> None:
+        conn = _connect(self.path)
+        sql = (
+            f"INSERT OR REPLACE INTO experiments ({', '.join(COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(COLUMNS))})"
+        )
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < WRITE_BATCH:
+                    batch.append(self._queue.get(timeout=WRITE_FLUSH_INTERVAL))
+            except queue.Empty:
+                pass
+            rows = [r for r in batch if r is not _STOP]
+            stop = len(rows) != len(batch)
+            try:
+                if rows:
+                    with conn:
+                        conn.executemany(sql, rows)
+            except sqlite3.Error as e:
+                print(f"result store: failed to write {len(rows)} rows: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    # -- чтение ---------------------------------------------------------------
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    def mark_interrupted(self) -> int:
+        """Прогоны, оставшиеся queued/running от прошлого запуска, — interrupted."""
+        with self._conn as conn:
+            cur = conn.execute(
+                "UPDATE experiments SET status = 'interrupted' "
+                "WHERE status IN ('queued', 'running')"
+            )
+        return cur.rowcount
+
+    def max_id(self) -> Optional[int]:
+        return self._conn.execute("SELECT MAX(id) FROM experiments").fetchone()[0]
+
+    def get(self, exp_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT * FROM experiments WHERE id = ?", (exp_id,)).fetchone()
+        return _decode(row) if row else None
+
+    def query(
+        self,
+        filters: Dict[str, Any],
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+        offset: int = 0,
+        before_id: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Страница записей (новые первыми) и общее число подходящих.
+
+        ``before_id`` — курсор: следующая страница без OFFSET, что не
+        замедляется с ростом номера страницы.
+        """
+        where, args = _where(filters, since, until)
+        total = self._conn.execute(f"SELECT COUNT(*) FROM experiments{where}", args).fetchone()[0]
+        if before_id is not None:
+            where += (" AND" if where else " WHERE") + " id < ?"
+            args.append(before_id)
+        rows = self._conn.execute(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM experiments{where} "
+            "ORDER BY id DESC LIMIT ? OFFSET ?",
+            [*args, limit, offset],
+        ).fetchall()
+        return [_decode(r) for r in rows], total
+
+    def aggregate(
+        self,
+        group_by: Sequence[str],
+        filters: Dict[str, Any],
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Статистика exec_time по группам (только завершённые прогоны)."""
+        cols = [c for c in group_by if c in GROUP_COLUMNS]
+        where, args = _where({**filters, "status": "completed"}, since, until)
+        where += (" AND" if where else " WHERE") + " exec_time IS NOT NULL"
+        select = ", ".join(cols + [
+            "COUNT(*) AS runs",
+            "AVG(exec_time) AS mean",
+            "MIN(exec_time) AS min",
+            "MAX(exec_time) AS max",
+            "AVG(exec_time * exec_time) AS mean_sq",
+            "AVG(hop_bytes) AS mean_hop_bytes",
+        ])
+        group = f" GROUP BY {', '.join(cols)} ORDER BY {', '.join(cols)}" if cols else ""
+        out = []
+        for row in self._conn.execute(f"SELECT {select} FROM experiments{where}{group}", args):
+            item = dict(row)
+            mean_sq = item.pop("mean_sq")
+            n = item["runs"]
+            var = max(0.0, mean_sq - item["mean"] ** 2) * n / (n - 1) if n > 1 else 0.0
+            item["stdev"] = var ** 0.5
+            out.append(item)
+        return out
+
+
+def _where(
+    filters: Dict[str, Any], since: Optional[float], until: Optional[float]
+) -> Tuple[str, List[Any]]:
+    clauses, args = [], []
+    for col in FILTERS:
+        if filters.get(col) is not None:
+            clauses.append(f"{col} = ?")
+            args.append(filters[col])
+    if since is not None:
+        clauses.append("created_at >= ?")
+        args.append(since)
+    if until is not None:
+        clauses.append("created_at < ?")
+        args.append(until)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+
+def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+    item = dict(row)
+    for col in JSON_COLUMNS & item.keys():
+        if item[col] is not None:
+            item[col] = json.loads(item[col])
+    return item
+
+
+def record_of(exp_id: int, exp: Dict[str, Any]) -> Dict[str, Any]:
+    """Строка хранилища из записи эксперимента в памяти контроллера."""
+    result = exp.get("result") or {}
+    mapping = result.get("mapping") or {}
+    return {
+        "id": exp_id,
+        "batch_id": exp.get("batch_id"),
+        "topology": exp["topology"],
+        "task_topology": exp.get("task_topology"),
+        "strategy": exp.get("strategy"),
+        "status": exp.get("status"),
+        "created_at": exp.get("created_at"),
+        "finished_at": exp.get("finished_at"),
+        "exec_time": result.get("exec_time"),
+        "processes": len(mapping.get("mapping") or {}) or exp.get("processes"),
+        "hop_bytes": (mapping.get("cost") or {}).get("hop_bytes"),
+        "error": exp.get("error"),
+        "params": {k: exp.get(k) for k in ("processes", "slots", "cpus", "seed", "probe")},
+        "stages": exp.get("stages"),
+        "timings": result.get("timings"),
+        "mapping": mapping or None,
+        "metrics": result.get("metrics"),
+        "stdout": result.get("mpi_stdout"),
+        "stderr": result.get("mpi_stderr"),
+    }
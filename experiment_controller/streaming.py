@@ -0,0 +1,147 @@
+"""
+experiment_controller.streaming
+Потоковая обработка вывода удалённой команды.
+
+– LineSplitter   : режет поток байтов из SSH-канала на строки;
+– OutputCapture  : хранит вывод в памяти до ``max_memory`` байт, дальше
+                   сбрасывает его в файл на диске (spill) и держит в памяти
+                   только хвост последних строк — память не растёт с объёмом;
+– LineRelay      : ограниченная потокобезопасная очередь строк от
+                   SSH-потока к event loop; при переполнении отбрасывает
+                   самые старые строки и считает их.
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Tuple
+
+OUTPUT_DIR = os.environ.get(
+    "MPI_OUTPUT_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "cluster_net", "output"),
+)
+OUTPUT_MEMORY_LIMIT = 1 << 20   # байт вывода в памяти до сброса на диск
+OUTPUT_TAIL_LINES = 200         # строк хвоста, остающихся в памяти после сброса
+MAX_LINE = 64 * 1024            # более длинные строки режутся на части
+RELAY_MAX_LINES = 10000         # строк в очереди к WebSocket
+
+
+class LineSplitter:
+    def __init__(self, on_line: Callable[[str], None]):
+        self.on_line = on_line
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> None:
+        self._buf += data
+        start = 0
+        while True:
+            nl = self._buf.find(b"\n", start)
+            if nl < 0:
+                break
+            self._emit(self._buf[start:nl])
+            start = nl + 1
+        del self._buf[:start]
+        while len(self._buf) > MAX_LINE:
+            self._emit(self._buf[:MAX_LINE])
+            del self._buf[:MAX_LINE]
+
+    def close(self) -> None:
+        if self._buf:
+            self._emit(self._buf)
+            self._buf.clear()
+
+    def _emit(self, raw: bytes) -> None:
+        self.on_line(bytes(raw).rstrip(b"\r").decode(errors="replace"))
+
+
+class OutputCapture:
+    def __init__(self, spill_path: Optional[str] = None, max_memory: int = OUTPUT_MEMORY_LIMIT):
+        self.spill_path = spill_path
+        self.max_memory = max_memory
+        self.lines = 0
+        self.bytes = 0
+        self._mem: List[str] = []
+        self._mem_bytes = 0
+        self._tail: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+        self._file = None
+        self.spilled = False
+
+    def write(self, line: str) -> None:
+        size = len(line) + 1
+        self.lines += 1
+        self.bytes += size
+        self._tail.append(line)
+        if self.spilled:
+            self._file.write(line + "\n")
+            return
+        self._mem.append(line)
+        self._mem_bytes += size
+        if self._mem_bytes > self.max_memory and self.spill_path:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            self._file = open(self.spill_path, "w", encoding="utf-8")
+            self._file.write("\n".join(self._mem) + "\n")
+            self._mem, self._mem_bytes = [], 0
+            self.spilled = True
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def text(self) -> str:
+        """Весь вывод, либо — после сброса на диск — его хвост."""
+        if not self.spilled:
+            return "\n".join(self._mem)
+        skipped = self.lines - len(self._tail)
+        return f"... ({skipped} строк — в {self.spill_path})\n" + "\n".join(self._tail)
+
+    def info(self) -> dict:
+        return {"lines": self.lines, "bytes": self.bytes,
+                "spill": self.spill_path if self.spilled else None}
+
+
+class LineRelay:
+    def __init__(self, max_lines: int = RELAY_MAX_LINES):
+        self._lines: Deque[Tuple[str, str]] = deque()
+        self._max = max_lines
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def push(self, stream: str, line: str) -> None:
+        """Вызывается из потока SSH; никогда не блокируется."""
+        with self._lock:
+            if len(self._lines) >= self._max:
+                self._lines.popleft()
+                self.dropped += 1
+            self._lines.append((stream, line))
+
+    def drain(self, limit: int = 500) -> List[Tuple[str, str]]:
+        with self._lock:
+            n = min(limit, len(self._lines))
+            return [self._lines.popleft() for _ in range(n)]
+
+    async def pump(
+        self,
+        send: Callable[[str, str], Awaitable[None]],
+        done: asyncio.Event,
+        interval: float = 0.05,
+    ) -> None:
+        """Пересылает строки до установки ``done`` и опустошения очереди."""
+        while True:
+            batch = self.drain()
+            for stream, line in batch:
+                await send(stream, line)
+            if batch:
+                await asyncio.sleep(0)      # дать поработать остальным задачам loop
+            else:
+                if done.is_set():
+                    return
+                try:
+                    await asyncio.wait_for(done.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+def output_path(exp_id: int, stream: str) -> str:
+    return os.path.join(OUTPUT_DIR, f"exp_{exp_id}.{stream}.log")
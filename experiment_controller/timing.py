@@ -0,0 +1,61 @@
+"""
+experiment_controller.timing
+Время выполнения MPI, измеренное внутри гостя.
+
+Окно metrics_collector (/start … /finish) охватывает весь SSH-вызов
+run_mpi, включая установку соединения и передачу вывода, поэтому
+завышает время счёта.  Здесь команда mpirun оборачивается замером
+``date +%s%N`` на master-VM: маркер с длительностью в наносекундах
+пишется в stderr и отфильтровывается из него при чтении.  Дополнительно
+из stdout извлекаются времена, которые печатает сама MPI-программа
+(строки вида ``time: 1.23 s``, ``elapsed = 850 ms``, ``Wall time 0.4``).
+"""
+
+import re
+from typing import Any, Dict, List
+
+WALL_MARKER = "__MPI_WALL_NS__"
+_MARKER_LINE_RE = re.compile(rf"^{WALL_MARKER}=(-?\d+)\s*$")
+_PROGRAM_TIME_RE = re.compile(
+    r"(?i)\b(?:elapsed|wall(?:[ _-]?(?:clock|time))?|run[ _-]?time|time)\b"
+    r"[^0-9\n]{0,12}?([0-9]+(?:\.[0-9]+)?(?:e[-+]?\d+)?)\s*(ns|us|µs|ms|sec|s)?\b"
+)
+_UNIT = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "sec": 1.0, "s": 1.0, None: 1.0}
+
+
+def wrap_timed(cmd: str) -> str:
+    """Команда, которая после ``cmd`` печатает в stderr его длительность (нс)
+    и завершается с тем же кодом возврата."""
+    return (
+        "__t0=$(date +%s%N); "
+        f"{cmd}; __rc=$?; "
+        f'echo "{WALL_MARKER}=$(( $(date +%s%N) - __t0 ))" >&2; '
+        "exit $__rc"
+    )
+
+
+def wall_marker(line: str) -> int | None:
+    """Длительность (нс), если строка stderr — маркер замера."""
+    m = _MARKER_LINE_RE.match(line)
+    return int(m.group(1)) if m else None
+
+
+def program_time(line: str) -> float | None:
+    """Время (в секундах), напечатанное программой в строке, если есть."""
+    m = _PROGRAM_TIME_RE.search(line)
+    if m is None:
+        return None
+    return float(m.group(1)) * _UNIT[m.group(2) and m.group(2).lower()]
+
+
+def guest_timing(times: List[float], wall_ns: int | None) -> Dict[str, Any]:
+    """Сводка времени со стороны гостя для результата эксперимента."""
+    out: Dict[str, Any] = {
+        "mpirun_wall_ms": round(wall_ns / 1e6, 3) if wall_ns is not None else None,
+        "program_reports": len(times),
+    }
+    if times:
+        # ранги считают параллельно — время задачи определяет самый медленный
+        out["program_max_s"] = max(times)
+        out["program_mean_s"] = sum(times) / len(times)
+    return out
@@ -1,16 +1,34 @@
 import paramiko
 import io
+import os
+import posixpath
+import select
+import shlex
 import time
-from typing import Sequence
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from .streaming import LineSplitter, OutputCapture
+from .timing import guest_timing, program_time, wall_marker, wrap_timed
 
 SSH_USER = "root"
 SSH_PASS = "0000"
+SSH_PORT = 22
 REMOTE_TMP = "/tmp/mpi_experiment"  # куда копировать hostfile/rankfile
+POOL_MAX_IDLE = 300.0   # с — простаивающие соединения закрываются
+POOL_PROBE_AFTER = 30.0  # с простоя, после которых соединение проверяется перед выдачей
+PUSH_CONCURRENCY = 16    # одновременных загрузок при раздаче файлов
+# ssh между самими VM (mpirun, relay-раздача): ключи хостов не проверяются
+VM_SSH_OPTS = "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
 def _client(host: str, timeout=8) -> paramiko.SSHClient:
     cl = paramiko.SSHClient()
     cl.set_missing_host_key_policy(paramiko.AutoAddPolicy())
     cl.connect(
         hostname=host,
+        port=SSH_PORT,
         username=SSH_USER,
         password=SSH_PASS,
         look_for_keys=False,
@@ -19,49 +37,427 @@ def _client(host: str, timeout=8) -> paramiko.SSHClient:
     )
     return cl
 
-def scp_text(host: str, text: str, remote_path: str):
-    cl = _client(host)
-    sftp = cl.open_sftp()
-    try:
-        # убеждаемся, что /tmp/mpi_experiment существует
+
+@dataclass
+class _PoolEntry:
+    client: paramiko.SSHClient
+    sftp: Optional[paramiko.SFTPClient] = None
+    last_used: float = field(default_factory=time.monotonic)
+    # SFTPClient не потокобезопасен — операции через него сериализуются
+    sftp_lock: threading.Lock = field(default_factory=threading.Lock)
+    dirs: Set[str] = field(default_factory=set)  # уже созданные удалённые каталоги
+
+
+class SSHPool:
+    """
+    Пул SSH-соединений с ключом (host, user, port).
+
+    На каждый хост держится одно соединение: paramiko мультиплексирует
+    каналы exec/sftp поверх одного транспорта, поэтому повторное
+    рукопожатие и аутентификация не нужны ни между вызовами, ни между
+    экспериментами на одной топологии.  Перед выдачей соединение
+    проверяется, простаивающие дольше ``max_idle`` закрываются.
+    """
+
+    def __init__(self, max_idle: float = POOL_MAX_IDLE, probe_after: float = POOL_PROBE_AFTER):
+        self.max_idle = max_idle
+        self.probe_after = probe_after
+        self._entries: Dict[Tuple[str, str, int], _PoolEntry] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, str, int], threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(host: str) -> Tuple[str, str, int]:
+        return host, SSH_USER, SSH_PORT
+
+    def _healthy(self, entry: _PoolEntry) -> bool:
+        transport = entry.client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        if time.monotonic() - entry.last_used > self.probe_after:
+            try:
+                transport.send_ignore()
+            except (paramiko.SSHException, OSError, EOFError):
+                return False
+        return True
+
+    @staticmethod
+    def _close_entry(entry: _PoolEntry) -> None:
         try:
-            sftp.stat(REMOTE_TMP)
-        except FileNotFoundError:
-            sftp.mkdir(REMOTE_TMP)
+            if entry.sftp is not None:
+                entry.sftp.close()
+        finally:
+            entry.client.close()
+
+    def _entry(self, host: str, timeout: float = 8) -> _PoolEntry:
+        self.evict_idle()
+        key = self._key(host)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # соединение с одним хостом открывается не более одного раза одновременно
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                if self._healthy(entry):
+                    with self._lock:
+                        self.hits += 1
+                    entry.last_used = time.monotonic()
+                    return entry
+                self.discard(host)
+            entry = _PoolEntry(client=_client(host, timeout))
+            transport = entry.client.get_transport()
+            if transport is not None:
+                transport.set_keepalive(int(self.probe_after))
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = entry
+            return entry
+
+    def client(self, host: str, timeout: float = 8) -> paramiko.SSHClient:
+        """Возвращает живое (переиспользуемое) соединение с хостом."""
+        return self._entry(host, timeout).client
+
+    @contextmanager
+    def sftp(self, host: str) -> Iterator[Tuple[paramiko.SFTPClient, Set[str]]]:
+        """SFTP-сессия хоста (создаётся один раз на соединение) и множество
+        уже существующих удалённых каталогов."""
+        entry = self._entry(host)
+        with entry.sftp_lock:
+            if entry.sftp is None:
+                entry.sftp = entry.client.open_sftp()
+            try:
+                yield entry.sftp, entry.dirs
+            finally:
+                entry.last_used = time.monotonic()
+
+    def discard(self, host: str) -> None:
+        """Закрывает и убирает соединение с хостом (например, после ошибки)."""
+        with self._lock:
+            entry = self._entries.pop(self._key(host), None)
+        if entry is not None:
+            self._close_entry(entry)
+
+    def evict_idle(self) -> int:
+        """Закрывает соединения, простаивающие дольше max_idle; возвращает их число."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if now - e.last_used > self.max_idle]
+            entries = [self._entries.pop(k) for k in stale]
+            self.evictions += len(entries)
+        for entry in entries:
+            self._close_entry(entry)
+        return len(entries)
+
+    def close_all(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._close_entry(entry)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "open_sessions": len(self._entries),
+                "open_sftp": sum(1 for e in self._entries.values() if e.sftp is not None),
+                "hosts": sorted(k[0] for k in self._entries),
+            }
+
+
+ssh_pool = SSHPool()
+
+
+def scp_text(host: str, text: str, remote_path: str):
+    with ssh_pool.sftp(host) as (sftp, dirs):
+        # убеждаемся, что /tmp/mpi_experiment существует (один раз на соединение)
+        if REMOTE_TMP not in dirs:
+            try:
+                sftp.stat(REMOTE_TMP)
+            except FileNotFoundError:
+                sftp.mkdir(REMOTE_TMP)
+            dirs.add(REMOTE_TMP)
         with sftp.file(remote_path, "w") as f:
             f.write(text)
-    finally:
-        sftp.close(); cl.close()
 
 def exec_ssh(host: str, cmd: str, timeout=0):
-    cl = _client(host)
-    try:
-        stdin, stdout, stderr = cl.exec_command(cmd, timeout=timeout)
+    for attempt in (0, 1):
+        cl = ssh_pool.client(host)
+        try:
+            stdin, stdout, stderr = cl.exec_command(cmd, timeout=timeout or None)
+        except (paramiko.SSHException, EOFError):
+            # транспорт умер между проверкой и открытием канала — переподключаемся
+            ssh_pool.discard(host)
+            if attempt:
+                raise
+            continue
         return stdout.read().decode(), stderr.read().decode()
+
+def exec_ssh_stream(
+    host: str,
+    cmd: str,
+    on_stdout: Callable[[str], None],
+    on_stderr: Callable[[str], None],
+    timeout: float = 0,
+    chunk: int = 32768,
+) -> int:
+    """
+    Выполняет команду и отдаёт её вывод построчно по мере поступления
+    (а не целиком после завершения).  Возвращает код возврата.
+    ``timeout`` (с, 0 — без ограничения) — на всю команду.
+    """
+    for attempt in (0, 1):
+        cl = ssh_pool.client(host)
+        try:
+            chan = cl.get_transport().open_session()
+            break
+        except (paramiko.SSHException, EOFError, AttributeError):
+            ssh_pool.discard(host)
+            if attempt:
+                raise
+    deadline = time.monotonic() + timeout if timeout else None
+    out, err = LineSplitter(on_stdout), LineSplitter(on_stderr)
+    try:
+        chan.exec_command(cmd)
+        while True:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"{host}: command timed out after {timeout}s")
+            select.select([chan], [], [], 1.0)
+            while chan.recv_ready():
+                out.feed(chan.recv(chunk))
+            while chan.recv_stderr_ready():
+                err.feed(chan.recv_stderr(chunk))
+            # exit-status может прийти раньше хвоста вывода — ждём EOF обоих
+            # потоков (или закрытия канала), а не только кода возврата
+            if ((chan.eof_received or chan.closed)
+                    and not chan.recv_ready() and not chan.recv_stderr_ready()):
+                break
+        out.close()
+        err.close()
+        return chan.recv_exit_status()
     finally:
-        cl.close()
+        chan.close()
+
+@dataclass
+class Artifact:
+    """
+    Файл для раздачи на VM: содержимое задаётся либо ``data`` (str/bytes),
+    либо путём к локальному файлу ``local_path``.  Относительный ``remote``
+    считается от REMOTE_TMP.
+    """
+    remote: str
+    data: Union[str, bytes, None] = None
+    local_path: Optional[str] = None
+    mode: Optional[int] = None          # например 0o755 для бинарников
+
+    @property
+    def remote_path(self) -> str:
+        return posixpath.join(REMOTE_TMP, self.remote)
+
+    @property
+    def size(self) -> int:
+        if self.local_path is not None:
+            return os.path.getsize(self.local_path)
+        return len(self.data.encode() if isinstance(self.data, str) else self.data or b"")
+
+
+def _ensure_remote_dir(sftp: paramiko.SFTPClient, dirs: Set[str], path: str) -> None:
+    """mkdir -p через SFTP; уже созданные каталоги запоминаются в *dirs*."""
+    if not path or path == "/" or path in dirs:
+        return
+    _ensure_remote_dir(sftp, dirs, posixpath.dirname(path))
+    try:
+        sftp.stat(path)
+    except FileNotFoundError:
+        sftp.mkdir(path)
+    dirs.add(path)
+
+
+def _upload(sftp: paramiko.SFTPClient, dirs: Set[str], art: Artifact) -> None:
+    _ensure_remote_dir(sftp, dirs, posixpath.dirname(art.remote_path))
+    if art.local_path is not None:
+        sftp.put(art.local_path, art.remote_path)
+    else:
+        data = art.data.encode() if isinstance(art.data, str) else art.data or b""
+        sftp.putfo(io.BytesIO(data), art.remote_path)
+    if art.mode is not None:
+        sftp.chmod(art.remote_path, art.mode)
+
+
+def push_artifacts_host(host: str, artifacts: Sequence[Artifact]) -> Dict[str, Any]:
+    """Загружает все артефакты на один хост в рамках одной SFTP-сессии."""
+    t0 = time.perf_counter()
+    try:
+        with ssh_pool.sftp(host) as (sftp, dirs):
+            for art in artifacts:
+                _upload(sftp, dirs, art)
+        ok, error = True, None
+    except Exception as e:
+        ssh_pool.discard(host)
+        ok, error = False, f"{type(e).__name__}: {e}"
+    return {
+        "ok": ok,
+        "latency": round(time.perf_counter() - t0, 4),
+        "bytes": sum(a.size for a in artifacts) if ok else 0,
+        "error": error,
+    }
+
+
+def _relay_from(master: str, targets: Sequence[str], artifacts: Sequence[Artifact]) -> Dict[str, Dict[str, Any]]:
+    """Master сам пересылает уже загруженные на него файлы остальным VM
+    (параллельно, по ssh/scp между VM)."""
+    dirs = sorted({posixpath.dirname(a.remote_path) for a in artifacts})
+    mkdir = shlex.quote("mkdir -p " + " ".join(shlex.quote(d) for d in dirs))
+    lines = []
+    for h in targets:
+        # каждый файл копируется в тот же путь; scp -p сохраняет права
+        copies = " && ".join(
+            f"scp -p -q {VM_SSH_OPTS} {shlex.quote(a.remote_path)} {h}:{shlex.quote(a.remote_path)}"
+            for a in artifacts
+        )
+        lines.append(
+            f"( s=$(date +%s%N); ssh {VM_SSH_OPTS} {h} {mkdir} && {copies}; "
+            f"rc=$?; e=$(date +%s%N); echo \"__PUSH__ {h} $rc $(( (e - s) / 1000 ))\" ) &"
+        )
+    script = "\n".join(lines + ["wait"])
+    out, err = exec_ssh(master, script)
+    results = {h: {"ok": False, "latency": None, "bytes": 0, "error": err.strip() or "no report"} for h in targets}
+    total = sum(a.size for a in artifacts)
+    for line in out.splitlines():
+        parts = line.split()
+        if len(parts) == 4 and parts[0] == "__PUSH__" and parts[1] in results:
+            rc, us = int(parts[2]), int(parts[3])
+            results[parts[1]] = {
+                "ok": rc == 0,
+                "latency": round(us / 1e6, 4),
+                "bytes": total if rc == 0 else 0,
+                "error": None if rc == 0 else f"relay exit code {rc}",
+                "via": master,
+            }
+    return results
+
+
+def push_artifacts(
+    hosts: Sequence[str],
+    artifacts: Sequence[Artifact],
+    concurrency: int = PUSH_CONCURRENCY,
+    mode: str = "direct",
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Раздаёт набор артефактов (rankfile, hostfile, бинарники, входные данные)
+    на все хосты.
+
+    mode="direct" — контроллер параллельно грузит на каждый хост сам
+    (не более ``concurrency`` одновременно, одна SFTP-сессия на хост);
+    mode="relay"  — файлы загружаются только на первый хост (master),
+    который пересылает их остальным; полезно для больших кластеров и
+    бинарников, когда канал контроллер→VM узкий.
+
+    Возвращает ``{host: {"ok", "latency", "bytes", "error"}}``.
+    """
+    hosts = list(dict.fromkeys(hosts))
+    if not hosts:
+        return {}
+    if mode == "relay" and len(hosts) > 1:
+        master, rest = hosts[0], hosts[1:]
+        results = {master: push_artifacts_host(master, artifacts)}
+        if results[master]["ok"]:
+            results.update(_relay_from(master, rest, artifacts))
+        else:
+            for h in rest:
+                results[h] = {"ok": False, "latency": None, "bytes": 0, "error": "master upload failed"}
+        return results
+    if mode not in ("direct", "relay"):
+        raise ValueError(f"unknown push mode {mode!r}")
+    workers = max(1, min(concurrency, len(hosts)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="push") as pool:
+        outcomes = pool.map(lambda h: push_artifacts_host(h, artifacts), hosts)
+        return dict(zip(hosts, outcomes))
+
+
+def openmpi_artifacts(rankfile: str, hostfile: str) -> List[Artifact]:
+    return [Artifact("rankfile", rankfile), Artifact("hostfile", hostfile)]
+
 
 def push_openmpi_files(master_ip: str, rankfile: str, hostfile: str):
     """Копирует rankfile и hostfile на master-VM."""
-    rf_remote = f"{REMOTE_TMP}/rankfile"
-    hf_remote = f"{REMOTE_TMP}/hostfile"
-    scp_text(master_ip, rankfile, rf_remote)
-    scp_text(master_ip, hostfile, hf_remote)
-    return rf_remote, hf_remote
-
-def push_openmpi_files_all(hosts: Sequence[str], rankfile: str, hostfile: str):
-    """Копирует rankfile и hostfile на каждую VM."""
-    rf_remote = f"{REMOTE_TMP}/rankfile"
-    hf_remote = f"{REMOTE_TMP}/hostfile"
-    for host in hosts:
-        scp_text(host, rankfile, rf_remote)
-        scp_text(host, hostfile, hf_remote)
-    return rf_remote, hf_remote
-
-def run_mpi(master_ip: str, np: int, rf: str):
-    """Запускает mpirun на master‑хосте, отключая проверку SSH‑ключей."""
-    ssh_opts = "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
-    mca = f"OMPI_MCA_plm_rsh_agent='ssh {ssh_opts}'"
-    cmd = f"{mca} mpirun -np {np} --rankfile {rf} /usr/bin/mpi_hello"
-    out, err = exec_ssh(master_ip, cmd)
-    return out, err
+    return push_openmpi_files_all([master_ip], rankfile, hostfile)
+
+def push_openmpi_files_all(hosts: Sequence[str], rankfile: str, hostfile: str,
+                           concurrency: int = PUSH_CONCURRENCY, mode: str = "direct"):
+    """Параллельно копирует rankfile и hostfile на каждую VM.
+
+    Бросает RuntimeError, если хотя бы на один хост файлы не попали.
+    """
+    artifacts = openmpi_artifacts(rankfile, hostfile)
+    results = push_artifacts(hosts, artifacts, concurrency=concurrency, mode=mode)
+    failed = {h: r["error"] for h, r in results.items() if not r["ok"]}
+    if failed:
+        raise RuntimeError(f"failed to push MPI files: {failed}")
+    return artifacts[0].remote_path, artifacts[1].remote_path
+
+def run_mpi(master_ip: str, np: int, rf: str, hf: str | None = None,
+            oversubscribe: bool = False,
+            on_line: Callable[[str, str], None] | None = None,
+            stdout: OutputCapture | None = None,
+            stderr: OutputCapture | None = None):
+    """Запускает mpirun на master‑хосте, отключая проверку SSH‑ключей.
+
+    ``hf`` — hostfile со ``slots=N`` (ёмкость VM); ``oversubscribe`` —
+    рангов на VM больше, чем ядер, и несколько рангов делят ядро.
+    Вывод читается потоково: каждая строка передаётся в
+    ``on_line(stream, line)`` и в ``stdout``/``stderr`` (OutputCapture).
+    Возвращает (stdout, stderr, timing); stdout/stderr — текст из capture
+    (после сброса на диск — хвост).
+    """
+    mca = f"OMPI_MCA_plm_rsh_agent='ssh {VM_SSH_OPTS}'"
+    opts = f"--hostfile {hf} " if hf else ""
+    if oversubscribe:
+        opts += "--oversubscribe --bind-to core:overload-allowed "
+    cmd = f"{mca} mpirun -np {np} {opts}--rankfile {rf} /usr/bin/mpi_hello"
+    # соединение берём из пула отдельно, чтобы его установка не попала в замер
+    t0 = time.perf_counter_ns()
+    ssh_pool.client(master_ip)
+    t1 = time.perf_counter_ns()
+
+    out_cap = stdout if stdout is not None else OutputCapture()
+    err_cap = stderr if stderr is not None else OutputCapture()
+    times: List[float] = []
+    wall: List[int] = []
+
+    def on_out(line: str) -> None:
+        out_cap.write(line)
+        t = program_time(line)
+        if t is not None:
+            times.append(t)
+        if on_line:
+            on_line("stdout", line)
+
+    def on_err(line: str) -> None:
+        ns = wall_marker(line)
+        if ns is not None:
+            wall.append(ns)
+            return
+        err_cap.write(line)
+        if on_line:
+            on_line("stderr", line)
+
+    try:
+        rc = exec_ssh_stream(master_ip, wrap_timed(cmd), on_out, on_err)
+    finally:
+        out_cap.close()
+        err_cap.close()
+    t2 = time.perf_counter_ns()
+    timing = {
+        "ssh_setup_ms": round((t1 - t0) / 1e6, 3),
+        "round_trip_ms": round((t2 - t1) / 1e6, 3),
+        "exit_code": rc,
+        **guest_timing(times, wall[-1] if wall else None),
+    }
+    return out_cap.text(), err_cap.text(), timing
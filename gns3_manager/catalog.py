@@ -0,0 +1,216 @@
+"""
+gns3_manager.catalog
+Каталог топологий: JSON-файлы из ``topologies/`` читаются и нормализуются
+один раз и держатся в памяти.
+
+Актуальность проверяется по (mtime_ns, size) файла при каждом обращении —
+это один ``stat``; изменённый файл перечитывается, удалённый — забывается.
+Для каждой топологии заранее сериализованы оба представления (исходное и
+нормализованное) и посчитаны их ETag, так что ответ не требует ни разбора,
+ни сериализации JSON.
+
+Кроме файлов, каталог отдаёт топологии из generator.py: по имени-спецификации
+(``fat-tree-k8``, ``torus-4x4x2`` …) они строятся при первом запросе, а
+через ``add_generated`` регистрируются под произвольным именем.
+
+Нормализованный формат — тот, с которым работает gns3_vm_manager::
+
+    {"nodes": [{"id", "name", "type", "x", "y", ["image", "ram", "cpus", "platform"]}],
+     "links": [{"endpoints": [{"node", "adapter", "port"}, ...],
+                ["delay", "jitter", "bandwidth", "loss"]}]}
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .generator import generate, parse_spec
+from .links import link_attrs
+
+FORMATS = ("raw", "normalized")
+SWITCH_TYPES = {"ethernet_switch", "ethernet_hub", "atm_switch", "frame_relay_switch"}
+
+
+def normalize(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Описание топологии в упрощённом внутреннем формате (экспорт GNS3 → nodes/links)."""
+    if "topology" not in config:
+        return config
+
+    topo = config.get("topology", {})
+
+    nodes: List[Dict[str, Any]] = []
+    for n in topo.get("nodes", []):
+        n_type = n.get("node_type") or n.get("type")
+        entry = {
+            "id": n.get("node_id") or n.get("name"),
+            "name": n.get("name"),
+            "type": n_type,
+            "x": n.get("x", 0),
+            "y": n.get("y", 0),
+        }
+        if n_type == "qemu":
+            props = n.get("properties", {})
+            entry["image"] = props.get("hda_disk_image") or n.get("image", "")
+            entry["ram"] = props.get("ram", n.get("ram", 512))
+            if props.get("cpus") or n.get("cpus"):
+                entry["cpus"] = props.get("cpus") or n.get("cpus")
+            if props.get("platform"):
+                entry["platform"] = props.get("platform")
+
+        nodes.append(entry)
+
+    links: List[Dict[str, Any]] = []
+    for link in topo.get("links", []):
+        eps = []
+        for ep in link.get("nodes", []):
+            eps.append(
+                {
+                    "node": ep.get("node_id"),
+                    "adapter": ep.get("adapter_number", 0),
+                    "port": ep.get("port_number", 0),
+                }
+            )
+        if eps:
+            # filters GNS3 (задержка, потери) -> поля delay / jitter / loss
+            links.append({"endpoints": eps, **link_attrs(link)})
+
+    return {"nodes": nodes, "links": links}
+
+
+def summarize(normalized: Dict[str, Any]) -> Dict[str, int]:
+    kinds = [n.get("type") or "qemu" for n in normalized.get("nodes", [])]
+    hosts = sum(k == "qemu" for k in kinds)
+    switches = sum(k in SWITCH_TYPES for k in kinds)
+    return {
+        "hosts": hosts,
+        "switches": switches,
+        "other_nodes": len(kinds) - hosts - switches,
+        "links": len(normalized.get("links", [])),
+    }
+
+
+def _entry(name: str, stamp: Tuple[int, int], raw_body: bytes, raw: Dict[str, Any],
+           extra: Dict[str, Any]) -> "Entry":
+    normalized = normalize(raw)
+    norm_body = raw_body if normalized is raw else json.dumps(normalized, separators=(",", ":")).encode()
+    return Entry(
+        name=name,
+        stamp=stamp,
+        bodies={"raw": raw_body, "normalized": norm_body},
+        etags={"raw": _etag(raw_body), "normalized": _etag(norm_body)},
+        summary={**summarize(normalized), **extra},
+    )
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+@dataclass
+class Entry:
+    name: str
+    stamp: Tuple[int, int]            # (mtime_ns, size) файла
+    bodies: Dict[str, bytes]          # формат -> готовое тело ответа
+    etags: Dict[str, str]             # формат -> ETag
+    summary: Dict[str, Any]
+
+    def info(self) -> Dict[str, Any]:
+        return {"name": self.name, **self.summary, "etag": self.etags["normalized"]}
+
+
+class TopologyCatalog:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._entries: Dict[str, Entry] = {}
+        self._generated: Dict[str, Entry] = {}
+        self._lock = threading.Lock()
+        self.loads = 0                 # сколько раз файлы читались с диска
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached": len(self._entries), "generated": len(self._generated),
+                "loads": self.loads}
+
+    def path_of(self, name: str) -> Optional[str]:
+        # имя — только файл внутри каталога, без путей
+        if not name or os.path.basename(name) != name or name.startswith("."):
+            return None
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, name: str) -> Optional[Entry]:
+        """Запись каталога; файл перечитывается, только если изменился."""
+        path = self.path_of(name)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(name, None)
+            return self._get_generated(name)
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = self._entries.get(name)
+        if entry is not None and entry.stamp == stamp:
+            return entry
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.stamp != stamp:
+                entry = self._load(name, path, stamp)
+                self._entries[name] = entry
+        return entry
+
+    def _load(self, name: str, path: str, stamp: Tuple[int, int]) -> Entry:
+        with open(path, "rb") as f:
+            raw_body = f.read()
+        raw = json.loads(raw_body)
+        self.loads += 1
+        return _entry(name, stamp, raw_body, raw,
+                      {"format": "gns3" if "topology" in raw else "simple",
+                       "size": stamp[1], "mtime": stamp[0] / 1e9})
+
+    def _get_generated(self, name: str) -> Optional[Entry]:
+        entry = self._generated.get(name)
+        if entry is not None:
+            return entry
+        spec = parse_spec(name)
+        if spec is None:
+            return None
+        return self.add_generated(name, *spec)
+
+    def add_generated(self, name: str, kind: str, params: Dict[str, Any]) -> Entry:
+        """Строит топологию генератором и регистрирует её под ``name``.
+        Ошибки параметров — ValueError."""
+        config = generate(kind, params)
+        body = json.dumps(config, separators=(",", ":")).encode()
+        entry = _entry(name, (0, len(body)), body, config,
+                       {"format": "generated", "generator": {"kind": kind, "params": params},
+                        "size": len(body)})
+        with self._lock:
+            self._generated[name] = entry
+        return entry
+
+    def list(self) -> List[Entry]:
+        """Все топологии каталога (с проверкой актуальности каждой)."""
+        try:
+            names = sorted(
+                e.name[:-5] for e in os.scandir(self.directory)
+                if e.is_file() and e.name.endswith(".json")
+            )
+        except OSError:
+            names = []
+        with self._lock:
+            for stale in set(self._entries) - set(names):
+                del self._entries[stale]
+        entries = []
+        names += sorted(set(self._generated) - set(names))
+        for name in names:
+            try:
+                entry = self.get(name)
+            except (OSError, ValueError) as e:
+                print(f"Топология {name} пропущена: {e}")
+                continue
+            if entry is not None:
+                entries.append(entry)
+        return entries
@@ -0,0 +1,316 @@
+"""
+gns3_manager.generator
+Параметрические топологии кластера в нормализованном формате (см. catalog.py):
+
+– fat_tree(k)              : k-арное fat-tree (k³/4 хостов, коммутаторы по k портов);
+– torus(dims, p)           : тор X×Y×… — коммутатор в каждой точке, p хостов на нём;
+– dragonfly(a, p, h, g)    : g групп по a маршрутизаторов (полный граф внутри
+                             группы), p хостов и h глобальных связей на маршрутизатор;
+– thin_tree(down, up, l)   : l-уровневое дерево, где у коммутатора down детей
+                             и up родителей (up < down — «утончение» к корню).
+
+Деревья строятся как XGFT(h; m₁…m_h; w₁…w_h).  Порты коммутаторов нумеруются
+по порядку подключения (adapter 0, port N); если нужно больше 8 портов
+(значение GNS3 по умолчанию), в ``properties.ports_mapping`` описываются все.
+Хосты — QEMU-узлы с одним адаптером; их порядок в ``nodes`` — логический
+(соседи по дереву / решётке / группе идут подряд), в нём gns3_vm_manager
+раздаёт IP.
+
+Параметры ``host_link`` / ``switch_link`` (словари delay / jitter / bandwidth /
+loss, см. links.py) задают характеристики связей хост–коммутатор и
+коммутатор–коммутатор — например, fat-tree с переподпиской:
+``{"k": 4, "host_link": {"bandwidth": 1000}, "switch_link": {"bandwidth": 250}}``.
+
+Имя-спецификация (``fat-tree-k4``, ``torus-4x4x2``, ``torus-8x8-p2``,
+``dragonfly-a4-p2-h2``, ``dragonfly-a4-p2-h2-g5``, ``thin-tree-d4-u2-l3``)
+разбирается ``parse_spec`` — каталог строит такую топологию по запросу.
+"""
+
+import itertools
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .links import link_attrs
+
+DEFAULT_IMAGE = "arch3.qcow"
+DEFAULT_RAM = 512
+SWITCH_DEFAULT_PORTS = 8     # столько портов у ethernet_switch GNS3 без ports_mapping
+SPACING = 80                 # шаг раскладки на холсте GNS3, пикселей
+MAX_NODES = 20000            # защита от случайной спецификации на миллионы узлов
+
+
+class _Builder:
+    def __init__(self, image: str = DEFAULT_IMAGE, ram: int = DEFAULT_RAM,
+                 host_link: Optional[Dict[str, Any]] = None,
+                 switch_link: Optional[Dict[str, Any]] = None):
+        self.image = image
+        self.ram = ram
+        # характеристики связей (links.py): хост–коммутатор и коммутатор–коммутатор
+        self.host_link = link_attrs(host_link or {})
+        self.switch_link = link_attrs(switch_link or {})
+        self.nodes: List[Dict[str, Any]] = []
+        self.links: List[Dict[str, Any]] = []
+        self._kind: Dict[str, str] = {}
+        self._used: Dict[str, int] = {}      # узел -> занятых портов / адаптеров
+
+    def _check_size(self) -> None:
+        if len(self.nodes) >= MAX_NODES:
+            raise ValueError(f"topology exceeds {MAX_NODES} nodes")
+
+    def switch(self, name: str, x: float, y: float) -> str:
+        self._check_size()
+        self.nodes.append({"id": name, "name": name, "type": "ethernet_switch",
+                           "x": round(x), "y": round(y)})
+        self._kind[name] = "ethernet_switch"
+        return name
+
+    def host(self, name: str, x: float, y: float) -> str:
+        self._check_size()
+        self.nodes.append({"id": name, "name": name, "type": "qemu", "x": round(x), "y": round(y),
+                           "image": self.image, "ram": self.ram})
+        self._kind[name] = "qemu"
+        return name
+
+    def link(self, a: str, b: str) -> None:
+        attrs = self.host_link if "qemu" in (self._kind[a], self._kind[b]) else self.switch_link
+        self.links.append({"endpoints": [self._endpoint(a), self._endpoint(b)], **attrs})
+
+    def _endpoint(self, node: str) -> Dict[str, Any]:
+        n = self._used.get(node, 0)
+        self._used[node] = n + 1
+        if self._kind[node] == "qemu":
+            if n:
+                raise ValueError(f"host {node} has a single network adapter")
+            return {"node": node, "adapter": 0, "port": 0}
+        return {"node": node, "adapter": 0, "port": n}
+
+    def build(self) -> Dict[str, Any]:
+        for node in self.nodes:
+            ports = self._used.get(node["id"], 0)
+            if node["type"] == "ethernet_switch" and ports > SWITCH_DEFAULT_PORTS:
+                node["properties"] = {"ports_mapping": [
+                    {"name": f"Ethernet{i}", "port_number": i, "type": "access",
+                     "vlan": 1, "ethertype": ""}
+                    for i in range(ports)
+                ]}
+        return {"nodes": self.nodes, "links": self.links}
+
+
+def _limit(count: int) -> None:
+    """Проверка размера до построения — не перебирать заведомо огромные решётки."""
+    if count > MAX_NODES:
+        raise ValueError(f"topology exceeds {MAX_NODES} nodes")
+
+
+def _row(count: int, width: float, y: float) -> List[Tuple[float, float]]:
+    """``count`` точек, равномерно разложенных по ширине ``width`` на высоте ``y``."""
+    return [(width * ((i + 0.5) / count - 0.5), y) for i in range(count)]
+
+
+def xgft(
+    m: Sequence[int],
+    w: Sequence[int],
+    level_names: Optional[Sequence[str]] = None,
+    image: str = DEFAULT_IMAGE,
+    ram: int = DEFAULT_RAM,
+    host_link: Optional[Dict[str, Any]] = None,
+    switch_link: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Обобщённое fat-tree XGFT(h; m₁…m_h; w₁…w_h): у узла уровня l
+    ``m[l]`` детей и ``w[l]`` родителей; уровень 0 — хосты.
+
+    Метка узла — кортеж цифр по позициям h…1: на уровне l позиции ≤ l
+    пробегают w, остальные — m.  Родители узла уровня l отличаются от него
+    только цифрой в позиции l+1.
+    """
+    h = len(m)
+    if h < 1 or len(w) != h or min(m) < 1 or min(w) < 1:
+        raise ValueError("m and w must be non-empty, of equal length and positive")
+    if w[0] != 1:
+        raise ValueError("hosts have a single network adapter: w1 must be 1")
+    names = list(level_names or [f"sw{l}" for l in range(1, h + 1)])
+    _limit(sum(math.prod(w[:l]) * math.prod(m[l:]) for l in range(h + 1)))
+
+    def labels(level: int) -> List[Tuple[int, ...]]:
+        # кортеж t: t[0] — позиция h, t[h-1] — позиция 1
+        ranges = [range(w[p - 1]) if p <= level else range(m[p - 1]) for p in range(h, 0, -1)]
+        return list(itertools.product(*ranges))
+
+    levels = [labels(l) for l in range(h + 1)]
+    width = max(1, len(levels[0]) - 1) * SPACING
+    b = _Builder(image, ram, host_link, switch_link)
+    ids: List[Dict[Tuple[int, ...], str]] = []
+    for l, level in enumerate(levels):
+        coords = _row(len(level), width, (h - l) * 2 * SPACING)
+        if l == 0:
+            ids.append({t: b.host(f"host-{i}", *coords[i]) for i, t in enumerate(level)})
+        else:
+            ids.append({t: b.switch(f"{names[l - 1]}-{i}", *coords[i]) for i, t in enumerate(level)})
+    for l in range(h):
+        pos = h - (l + 1)                 # индекс позиции l+1 в кортеже
+        for t in levels[l]:
+            for digit in range(w[l]):
+                parent = t[:pos] + (digit,) + t[pos + 1:]
+                b.link(ids[l][t], ids[l + 1][parent])
+    return b.build()
+
+
+def fat_tree(k: int, **kw: Any) -> Dict[str, Any]:
+    """k-арное fat-tree (Al-Fares): k подов, k³/4 хостов, (k/2)² ядер."""
+    if k < 2 or k % 2:
+        raise ValueError("fat-tree k must be an even number ≥ 2")
+    half = k // 2
+    return xgft([half, half, k], [1, half, half], ["edge", "agg", "core"], **kw)
+
+
+def thin_tree(down: int, up: int, levels: int, **kw: Any) -> Dict[str, Any]:
+    """Дерево из ``levels`` уровней коммутаторов: down детей, up родителей."""
+    if levels < 1 or down < 1 or up < 1:
+        raise ValueError("thin-tree down, up and levels must be positive")
+    return xgft([down] * levels, [1] + [up] * (levels - 1), **kw)
+
+
+def torus(dims: Sequence[int], hosts_per_switch: int = 1, **kw: Any) -> Dict[str, Any]:
+    """Тор: коммутатор в каждой точке решётки ``dims``, связи с соседями по
+    каждому измерению с замыканием (для размера 2 — одна связь, не две)."""
+    dims = list(dims)
+    if not dims or min(dims) < 1 or hosts_per_switch < 1:
+        raise ValueError("torus dims and hosts_per_switch must be positive")
+    _limit(math.prod(dims) * (1 + hosts_per_switch))
+    b = _Builder(**kw)
+    # плоскости по измерениям 3… раскладываются по горизонтали
+    x_size = dims[0] + 1
+    points = list(itertools.product(*[range(d) for d in dims]))
+
+    def name(c: Tuple[int, ...]) -> str:
+        return "-".join(map(str, c))
+
+    def xy(c: Tuple[int, ...]) -> Tuple[float, float]:
+        plane = 0
+        for i, d in zip(c[2:], dims[2:]):
+            plane = plane * d + i
+        y = c[1] if len(c) > 1 else 0
+        return (c[0] + plane * x_size) * 2 * SPACING, y * 2 * SPACING
+
+    for c in points:
+        b.switch(f"sw-{name(c)}", *xy(c))
+    for c in points:
+        x, y = xy(c)
+        for j in range(hosts_per_switch):
+            host = b.host(f"host-{name(c)}-{j}", x + SPACING * 0.6, y + SPACING * (0.6 + 0.4 * j))
+            b.link(host, f"sw-{name(c)}")
+    for c in points:
+        for axis, size in enumerate(dims):
+            if size == 1 or (size == 2 and c[axis] == 1):
+                continue
+            nb = c[:axis] + ((c[axis] + 1) % size,) + c[axis + 1:]
+            b.link(f"sw-{name(c)}", f"sw-{name(nb)}")
+    return b.build()
+
+
+def dragonfly(a: int, p: int, h: int, g: Optional[int] = None, **kw: Any) -> Dict[str, Any]:
+    """
+    Dragonfly: ``g`` групп (по умолчанию a·h + 1 — каждая пара групп связана
+    ровно одной глобальной связью), в группе ``a`` маршрутизаторов, связанных
+    полным графом; у маршрутизатора ``p`` хостов и до ``h`` глобальных связей.
+    """
+    if min(a, p, h) < 1:
+        raise ValueError("dragonfly a, p and h must be positive")
+    g = a * h + 1 if g is None else g
+    if g < 1 or g - 1 > a * h:
+        raise ValueError(f"dragonfly needs 1 ≤ g ≤ a·h + 1 = {a * h + 1}")
+    _limit(g * a * (1 + p))
+    b = _Builder(**kw)
+    big_r = max(3 * SPACING, g * a * SPACING / math.pi)
+    small_r = max(SPACING, a * SPACING / math.pi)
+
+    def router(grp: int, r: int) -> str:
+        return f"r-{grp}-{r}"
+
+    for grp in range(g):
+        gx = big_r * math.cos(2 * math.pi * grp / g)
+        gy = big_r * math.sin(2 * math.pi * grp / g)
+        for r in range(a):
+            phi = 2 * math.pi * (grp / g + r / (a * g))
+            rx, ry = gx + small_r * math.cos(phi), gy + small_r * math.sin(phi)
+            b.switch(router(grp, r), rx, ry)
+            for j in range(p):
+                # хосты — наружу от центра группы
+                dist = small_r + SPACING * (1 + 0.5 * j)
+                b.link(b.host(f"host-{grp}-{r}-{j}", gx + dist * math.cos(phi), gy + dist * math.sin(phi)),
+                       router(grp, r))
+    for grp in range(g):
+        for r1, r2 in itertools.combinations(range(a), 2):
+            b.link(router(grp, r1), router(grp, r2))
+    # k-я «чужая» группа группы i подключена к её маршрутизатору k // h
+    for g1, g2 in itertools.combinations(range(g), 2):
+        k1, k2 = g2 - 1, g1            # номер группы среди остальных
+        b.link(router(g1, k1 // h), router(g2, k2 // h))
+    return b.build()
+
+
+GENERATORS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "fat-tree": fat_tree,
+    "torus": torus,
+    "dragonfly": dragonfly,
+    "thin-tree": thin_tree,
+}
+
+_SPECS = [
+    ("fat-tree", re.compile(r"^fat-tree-k(?P<k>\d+)$")),
+    ("torus", re.compile(r"^torus-(?P<dims>\d+(?:x\d+)+)(?:-p(?P<hosts_per_switch>\d+))?$")),
+    ("dragonfly", re.compile(r"^dragonfly-a(?P<a>\d+)-p(?P<p>\d+)-h(?P<h>\d+)(?:-g(?P<g>\d+))?$")),
+    ("thin-tree", re.compile(r"^thin-tree-d(?P<down>\d+)-u(?P<up>\d+)-l(?P<levels>\d+)$")),
+]
+
+
+def parse_spec(name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """``"torus-4x4-p2"`` → ("torus", {"dims": [4, 4], "hosts_per_switch": 2}); иначе None."""
+    for kind, rx in _SPECS:
+        m = rx.match(name)
+        if m is None:
+            continue
+        params: Dict[str, Any] = {}
+        for key, value in m.groupdict().items():
+            if value is None:
+                continue
+            params[key] = [int(v) for v in value.split("x")] if key == "dims" else int(value)
+        return kind, params
+    return None
+
+
+def spec_name(kind: str, params: Dict[str, Any]) -> Optional[str]:
+    """Обратное к ``parse_spec``: имя-спецификация для параметров (None, если
+    среди них есть не выражаемые в имени, например ``image``)."""
+    p = dict(params)
+    try:
+        if kind == "fat-tree":
+            name = f"fat-tree-k{p.pop('k')}"
+        elif kind == "torus":
+            name = "torus-" + "x".join(map(str, p.pop("dims")))
+            hosts = p.pop("hosts_per_switch", 1)
+            name += f"-p{hosts}" if hosts != 1 else ""
+        elif kind == "dragonfly":
+            name = f"dragonfly-a{p.pop('a')}-p{p.pop('p')}-h{p.pop('h')}"
+            g = p.pop("g", None)
+            name += f"-g{g}" if g is not None else ""
+        elif kind == "thin-tree":
+            name = f"thin-tree-d{p.pop('down')}-u{p.pop('up')}-l{p.pop('levels')}"
+        else:
+            return None
+    except KeyError:
+        return None
+    return None if p else name
+
+
+def generate(kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Топология вида ``kind`` (ключ GENERATORS); ошибки параметров — ValueError."""
+    fn = GENERATORS.get(kind)
+    if fn is None:
+        raise ValueError(f"unknown topology kind {kind!r}; known: {', '.join(GENERATORS)}")
+    try:
+        return fn(**params)
+    except TypeError as e:        # лишние / недостающие параметры
+        raise ValueError(str(e)) from None
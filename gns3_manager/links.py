@@ -0,0 +1,76 @@
+"""
+gns3_manager.links
+Характеристики связей топологии: задержка, джиттер, полоса, потери.
+
+В нормализованном формате они — необязательные поля связи::
+
+    {"endpoints": [...], "delay": 2, "jitter": 0.5, "bandwidth": 100, "loss": 0.1}
+
+``delay`` / ``jitter`` — мс, ``bandwidth`` — Мбит/с, ``loss`` — % (для
+развёртывания в GNS3 — целый).
+В экспорте GNS3 те же величины хранятся в ``filters`` связи
+(``{"delay": [мс, джиттер], "packet_loss": [%]}``) и при нормализации
+переносятся в поля.
+
+Применяет их gns3_vm_manager (фильтры GNS3 + tc в гостях), а
+placement_engine учитывает как веса рёбер графа кластера.
+"""
+
+from typing import Any, Dict, List
+
+LINK_ATTRS = ("delay", "jitter", "bandwidth", "loss")
+
+
+def link_attrs(link: Dict[str, Any]) -> Dict[str, float]:
+    """Характеристики связи из полей или из ``filters`` GNS3; ValueError — при
+    нечисловом или отрицательном значении (потери — не больше 100 %)."""
+    attrs: Dict[str, float] = {}
+    filters = link.get("filters") or {}
+    if filters.get("delay"):
+        attrs["delay"] = filters["delay"][0]
+        if len(filters["delay"]) > 1:
+            attrs["jitter"] = filters["delay"][1]
+    if filters.get("packet_loss"):
+        attrs["loss"] = filters["packet_loss"][0]
+    for key in LINK_ATTRS:
+        if link.get(key) is not None:
+            attrs[key] = link[key]
+    for key, value in attrs.items():
+        try:
+            attrs[key] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"link {key} must be a number, got {value!r}") from None
+        if attrs[key] < 0 or (key == "loss" and attrs[key] > 100):
+            raise ValueError(f"link {key} out of range: {value!r}")
+    if attrs.get("bandwidth") == 0:
+        raise ValueError("link bandwidth must be positive")
+    # нулевые значения — то же, что их отсутствие
+    return {k: v for k, v in attrs.items() if v}
+
+
+def gns3_filters(attrs: Dict[str, float]) -> Dict[str, List[int]]:
+    """Фильтры GNS3 (ubridge) для задержки и потерь связи.
+
+    GNS3 принимает только целые мс и проценты.  Задержка округляется (меньше
+    0.5 мс пропадает); дробные потери — ValueError: округление 0.1 % до 1 %
+    исказило бы эксперимент в разы.  Полосу GNS3 ограничивать не умеет.
+    """
+    filters: Dict[str, List[int]] = {}
+    delay = [round(attrs.get("delay", 0)), round(attrs.get("jitter", 0))]
+    if any(delay):
+        filters["delay"] = delay
+    loss = attrs.get("loss")
+    if loss:
+        if loss != int(loss):
+            raise ValueError(f"link loss must be a whole percent for GNS3 filters, got {loss}")
+        filters["packet_loss"] = [int(loss)]
+    return filters
+
+
+def rate_limit_command(bandwidth_mbit: float, iface: str = "ens3") -> str:
+    """Команда гостя, ограничивающая исходящую полосу интерфейса (tbf)."""
+    rate_kbit = max(8, round(bandwidth_mbit * 1000))
+    # буфер — не меньше 10 мс трафика и одного MTU
+    burst = max(1600, rate_kbit * 10 // 8)
+    return (f"tc qdisc replace dev {iface} root tbf rate {rate_kbit}kbit "
+            f"burst {burst} latency 50ms")
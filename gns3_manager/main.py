@@ -1,12 +1,25 @@
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from typing import Any, Dict
 import json, os
 
+from .catalog import FORMATS, TopologyCatalog
+from .generator import GENERATORS, generate, spec_name
+
 app = FastAPI(title="GNS3 Manager")
 
 # Путь к папке с JSON-конфигурациями топологий
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TOPOLOGY_DIR = os.path.join(BASE_DIR, "topologies")
+# Топологии читаются и нормализуются один раз; файл перечитывается при изменении
+catalog = TopologyCatalog(TOPOLOGY_DIR)
+
+class GenerateRequest(BaseModel):
+    kind: str                        # fat-tree | torus | dragonfly | thin-tree
+    params: Dict[str, Any] = {}      # аргументы генератора, например {"k": 8}
+    name: str | None = None          # имя в каталоге; по умолчанию — из параметров
+    save: bool = False               # записать JSON в topologies/
 
 @app.post("/select_topology")
 def select_topology(data: dict):
@@ -18,16 +31,73 @@ def select_topology(data: dict):
     print(f"Получен запрос на топологию: {topology_name}")
     return {"status": "topology selected", "topology": topology_name}
 
+@app.get("/topologies")
+def list_topologies():
+    """
+    Список топологий каталога со сводкой: число хостов, коммутаторов, связей.
+    GUI заполняет по нему выбор топологии.
+    """
+    return [entry.info() for entry in catalog.list()]
+
 @app.get("/topologies/{name}")
-def get_topology_config(name: str):
+def get_topology_config(name: str, request: Request, format: str = "raw"):
     """
     Возвращает JSON-конфигурацию топологии по имени (например, "torus").
     GNS3 VM Manager вызывает этот метод, чтобы получить описание топологии.
+
+    ``format=normalized`` — упрощённый формат nodes/links (см. catalog.py).
+    Ответ несёт ETag; при совпадении If-None-Match отдаётся 304 без тела.
     """
-    file_path = os.path.join(TOPOLOGY_DIR, f"{name}.json")
-    if not os.path.isfile(file_path):
+    if format not in FORMATS:
+        return JSONResponse(status_code=400, content={"error": f"format must be one of {FORMATS}"})
+    try:
+        entry = catalog.get(name)
+    except json.JSONDecodeError as e:
+        return JSONResponse(status_code=500, content={"error": f"Invalid topology file: {e}"})
+    except ValueError as e:        # имя-спецификация с недопустимыми параметрами
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if entry is None:
         return JSONResponse(status_code=404, content={"error": "Topology not found"})
-    # Читаем JSON-файл топологии и возвращаем его содержимое
-    with open(file_path, "r") as f:
-        topology_data = json.load(f)
-    return topology_data  # FastAPI автоматически преобразует dict в JSON
+    etag = entry.etags[format]
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in (request.headers.get("if-none-match") or "").split(", "):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.bodies[format], media_type="application/json", headers=headers)
+
+@app.post("/topologies/generate")
+def generate_topology(req: GenerateRequest):
+    """
+    Строит параметрическую топологию (см. generator.py) и добавляет её в
+    каталог: дальше её можно развернуть и разместить по имени, как файл.
+    Топологии вида ``fat-tree-k8`` строятся и без этого вызова — по имени.
+    """
+    if req.kind not in GENERATORS:
+        return JSONResponse(status_code=400, content={"error": f"kind must be one of {list(GENERATORS)}"})
+    name = req.name or spec_name(req.kind, req.params)
+    if name is None or catalog.path_of(name) is None:
+        # имени нет или оно недопустимо — чаще всего из-за самих параметров
+        try:
+            generate(req.kind, req.params)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+        if name is None:
+            error = "these params cannot be expressed in a topology name; pass name"
+        else:
+            error = f"invalid topology name {name!r}"
+        return JSONResponse(status_code=400, content={"error": error})
+    try:
+        entry = catalog.add_generated(name, req.kind, req.params)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if req.save:
+        path = catalog.path_of(name)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(entry.bodies["normalized"])
+        os.replace(tmp, path)
+    return entry.info()
+
+@app.get("/catalog/stats")
+def get_catalog_stats():
+    """Сколько топологий в памяти и сколько раз файлы читались с диска."""
+    return catalog.stats()
@@ -0,0 +1,261 @@
+"""
+gns3_vm_manager.admission
+Admission control: does a topology fit on this host next to the VMs that
+are already deployed?
+
+Host capacity comes from ``/proc`` (``MemTotal`` / ``MemAvailable``, number
+of cores, 1-minute load average).  A topology's footprint is the RAM and
+vCPUs of its QEMU nodes plus a per-VM QEMU overhead.  Every admitted
+deployment *reserves* its footprint until it is torn down, so concurrent
+deployments are checked against one shared budget:
+
+* RAM:   reserved + needed ≤ MemTotal · ADMIT_RAM_FRACTION − ADMIT_RESERVE_MB,
+         and needed ≤ MemAvailable − ADMIT_RESERVE_MB (memory used by others);
+* vCPUs: reserved + needed ≤ cores · ADMIT_CPU_OVERCOMMIT;
+* load:  1-minute load average per core ≤ ADMIT_MAX_LOAD.
+
+Policies when a topology does not fit:
+
+``reject``  fail the request immediately;
+``queue``   wait (up to ADMIT_QUEUE_TIMEOUT s) until other deployments are
+            torn down or the host calms down;
+``scale``   shrink RAM / vCPUs of every VM (not below ADMIT_MIN_RAM_MB / 1
+            vCPU) until it fits;
+``off``     no checks (previous behaviour).
+
+A topology that could not fit even on an empty host is rejected by every
+policy except ``scale`` (if scaling helps) and ``off``.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+POLICIES = ("off", "reject", "queue", "scale")
+
+ADMIT_POLICY = os.environ.get("GNS3_ADMISSION", "queue")
+ADMIT_RAM_FRACTION = float(os.environ.get("ADMIT_RAM_FRACTION", "0.85"))
+ADMIT_RESERVE_MB = int(os.environ.get("ADMIT_RESERVE_MB", "1024"))   # for host / gns3server
+ADMIT_CPU_OVERCOMMIT = float(os.environ.get("ADMIT_CPU_OVERCOMMIT", "2.0"))
+ADMIT_MAX_LOAD = float(os.environ.get("ADMIT_MAX_LOAD", "1.5"))      # per core
+ADMIT_QUEUE_TIMEOUT = float(os.environ.get("ADMIT_QUEUE_TIMEOUT", "600"))
+ADMIT_MIN_RAM_MB = int(os.environ.get("ADMIT_MIN_RAM_MB", "256"))
+QEMU_OVERHEAD_MB = int(os.environ.get("QEMU_OVERHEAD_MB", "64"))      # per VM
+
+
+class AdmissionError(Exception):
+    """The topology cannot be deployed under the current policy."""
+
+    def __init__(self, message: str, report: Dict[str, Any]):
+        super().__init__(message)
+        self.report = report
+
+
+@dataclass
+class Footprint:
+    vms: int
+    ram_mb: int
+    vcpus: int
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"vms": self.vms, "ram_mb": self.ram_mb, "vcpus": self.vcpus}
+
+
+def host_capacity() -> Dict[str, Any]:
+    """Memory (MB), cores and load of this host read from ``/proc``."""
+    mem: Dict[str, int] = {}
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                if key in ("MemTotal", "MemAvailable"):
+                    mem[key] = int(value.split()[0]) // 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/proc/loadavg") as f:
+            load = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        load = 0.0
+    cores = os.cpu_count() or 1
+    return {
+        "mem_total_mb": mem.get("MemTotal", 0),
+        "mem_available_mb": mem.get("MemAvailable", 0),
+        "cores": cores,
+        "load1": load,
+    }
+
+
+def _qemu_nodes(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [n for n in config.get("nodes", []) if n.get("type", "qemu") == "qemu"]
+
+
+def footprint(config: Dict[str, Any]) -> Footprint:
+    """RAM (with QEMU overhead) and vCPUs of a normalized topology."""
+    qemu = _qemu_nodes(config)
+    return Footprint(
+        vms=len(qemu),
+        ram_mb=sum(int(n.get("ram") or 512) + QEMU_OVERHEAD_MB for n in qemu),
+        vcpus=sum(int(n.get("cpus") or 1) for n in qemu),
+    )
+
+
+def scale_config(config: Dict[str, Any], ram_factor: float, cpu_factor: float) -> None:
+    """Shrink every VM's RAM / vCPUs in place by the given factors."""
+    for n in _qemu_nodes(config):
+        n["ram"] = max(ADMIT_MIN_RAM_MB, int(int(n.get("ram") or 512) * ram_factor))
+        n["cpus"] = max(1, int(int(n.get("cpus") or 1) * cpu_factor))
+
+
+class AdmissionController:
+    """Shared budget of all deployments of this manager."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.reserved: Dict[str, Footprint] = {}     # topology name -> footprint
+        self.waiting = 0
+
+    # ------------------------------------------------------------------
+    def _limits(self, host: Dict[str, Any]) -> Tuple[int, int]:
+        ram = int(host["mem_total_mb"] * ADMIT_RAM_FRACTION) - ADMIT_RESERVE_MB
+        cpus = int(host["cores"] * ADMIT_CPU_OVERCOMMIT)
+        return ram, cpus
+
+    def _check(self, name: str, need: Footprint, host: Dict[str, Any],
+               empty: bool = False) -> List[str]:
+        """Reasons why *need* does not fit now (or on an empty host)."""
+        ram_limit, cpu_limit = self._limits(host)
+        others = [f for n, f in self.reserved.items() if n != name and not empty]
+        ram_used = sum(f.ram_mb for f in others)
+        cpu_used = sum(f.vcpus for f in others)
+        reasons = []
+        if not host["mem_total_mb"]:
+            return reasons          # no /proc: nothing to check against
+        if ram_used + need.ram_mb > ram_limit:
+            reasons.append(f"RAM: need {need.ram_mb} MB, {max(0, ram_limit - ram_used)} MB "
+                           f"of {ram_limit} MB budget free")
+        if cpu_used + need.vcpus > cpu_limit:
+            reasons.append(f"vCPU: need {need.vcpus}, {max(0, cpu_limit - cpu_used)} "
+                           f"of {cpu_limit} free")
+        if not empty:
+            # memory taken by processes outside the budget; our own previous
+            # deployment of this topology is torn down before redeploying
+            available = self._available(name, host)
+            if need.ram_mb > available:
+                reasons.append(f"RAM: need {need.ram_mb} MB, host has {max(0, available)} MB "
+                               f"available above the {ADMIT_RESERVE_MB} MB reserve")
+            load = host["load1"] / host["cores"]
+            if load > ADMIT_MAX_LOAD:
+                reasons.append(f"load: {load:.2f} per core > {ADMIT_MAX_LOAD}")
+        return reasons
+
+    def _available(self, name: str, host: Dict[str, Any]) -> int:
+        own = self.reserved.get(name)
+        return host["mem_available_mb"] + (own.ram_mb if own else 0) - ADMIT_RESERVE_MB
+
+    def _fit_scale(self, name: str, config: Dict[str, Any],
+                   host: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+        """Factors that make *config* fit the free budget, or None."""
+        need = footprint(config)
+        if need.vms == 0:
+            return None
+        ram_limit, cpu_limit = self._limits(host)
+        others = [f for n, f in self.reserved.items() if n != name]
+        ram_free = min(ram_limit - sum(f.ram_mb for f in others), self._available(name, host))
+        cpu_free = cpu_limit - sum(f.vcpus for f in others)
+        guest_ram = need.ram_mb - need.vms * QEMU_OVERHEAD_MB
+        ram_factor = min(1.0, (ram_free - need.vms * QEMU_OVERHEAD_MB) / max(1, guest_ram))
+        cpu_factor = min(1.0, cpu_free / max(1, need.vcpus))
+        if ram_factor <= 0 or cpu_factor <= 0:
+            return None
+        return ram_factor, cpu_factor
+
+    # ------------------------------------------------------------------
+    def admit(self, name: str, config: Dict[str, Any], policy: str = ADMIT_POLICY,
+              timeout: float = ADMIT_QUEUE_TIMEOUT) -> Dict[str, Any]:
+        """Reserve the footprint of *config* for deployment *name*.
+
+        Depending on *policy* this waits, scales *config* in place, or raises
+        :class:`AdmissionError`.  Returns a report for the response.
+        """
+        if policy not in POLICIES:
+            raise AdmissionError(f"unknown admission policy '{policy}'",
+                                 {"policy": policy, "supported": list(POLICIES)})
+        need = footprint(config)
+        report: Dict[str, Any] = {"policy": policy, "footprint": need.as_dict()}
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                host = host_capacity()
+                report["host"] = host
+                reasons = [] if policy == "off" else self._check(name, need, host)
+                if not reasons:
+                    report.setdefault("decision", "admitted")
+                    break
+                if policy == "scale":
+                    factors = self._fit_scale(name, config, host)
+                    if factors is not None:
+                        scale_config(config, *factors)
+                        scaled = footprint(config)
+                        if not self._check(name, scaled, host):
+                            need = scaled
+                            report.update(decision="scaled", scaled=scaled.as_dict(),
+                                          ram_factor=round(factors[0], 3),
+                                          cpu_factor=round(factors[1], 3))
+                            break
+                    raise AdmissionError("topology does not fit even scaled down: "
+                                         + "; ".join(reasons), {**report, "reasons": reasons})
+                impossible = self._check(name, need, host, empty=True)
+                if policy == "reject" or impossible:
+                    raise AdmissionError("topology does not fit on this host: "
+                                         + "; ".join(impossible or reasons),
+                                         {**report, "reasons": impossible or reasons})
+                # queue: wait for a release (or re-check /proc every 2 s)
+                remaining = timeout - (time.monotonic() - t0)
+                if remaining <= 0:
+                    raise AdmissionError("timed out waiting for host resources: "
+                                         + "; ".join(reasons), {**report, "reasons": reasons})
+                report["decision"] = "queued"
+                self.waiting += 1
+                try:
+                    self._cond.wait(min(2.0, remaining))
+                finally:
+                    self.waiting -= 1
+            self.reserved[name] = need
+        report["waited_s"] = round(time.monotonic() - t0, 3)
+        return report
+
+    def restore(self, name: str, nodes: List[Dict[str, Any]]) -> None:
+        """Re-reserve a deployment known from the state file (GNS3 node list)."""
+        qemu = [n for n in nodes if n.get("node_type") == "qemu"]
+        with self._cond:
+            self.reserved[name] = Footprint(
+                vms=len(qemu),
+                ram_mb=sum(int((n.get("properties") or {}).get("ram") or 512) + QEMU_OVERHEAD_MB
+                           for n in qemu),
+                vcpus=sum(int((n.get("properties") or {}).get("cpus") or 1) for n in qemu),
+            )
+
+    def release(self, name: str) -> None:
+        with self._cond:
+            if self.reserved.pop(name, None) is not None:
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        host = host_capacity()
+        ram_limit, cpu_limit = self._limits(host)
+        with self._cond:
+            reserved = {n: f.as_dict() for n, f in self.reserved.items()}
+        return {
+            "policy": ADMIT_POLICY,
+            "host": host,
+            "budget": {"ram_mb": ram_limit, "vcpus": cpu_limit},
+            "reserved": reserved,
+            "reserved_total": {
+                "ram_mb": sum(f["ram_mb"] for f in reserved.values()),
+                "vcpus": sum(f["vcpus"] for f in reserved.values()),
+            },
+            "waiting": self.waiting,
+        }
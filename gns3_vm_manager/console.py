@@ -0,0 +1,289 @@
+"""
+gns3_vm_manager.console
+Expect-style asyncio driver for guest telnet consoles.
+
+A :class:`ConsoleSession` wraps one telnet connection: the incoming stream is
+cleaned from telnet negotiation and ANSI escapes and kept in a line buffer,
+on top of which ``expect`` / ``run`` / ``run_batch`` are built.  Sessions are
+plain asyncio objects, so dozens of consoles can be driven from a single
+event loop (see :func:`run_many`).
+
+Only ``host``/``port`` are needed, which makes the module usable against any
+telnet server – including a local fake one in tests.
+"""
+
+import asyncio
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Iterable, List, Optional, Pattern, TypeVar, Union
+
+LOGIN_PROMPT = re.compile(rb"login:\s*$")
+PASSWORD_PROMPT = re.compile(rb"[Pp]assword:\s*$")
+SHELL_PROMPT = re.compile(rb"[#$]\s*$")
+_LOGIN_OR_SHELL = re.compile(rb"(login:|[#$])\s*$")
+
+_ANSI_ESCAPE = re.compile(rb"\x1b\[[0-9;?]*[A-Za-z]|\x1b[()][A-Z0-9]")
+
+IAC, SB, SE = 255, 250, 240
+_NEGOTIATION = {251, 252, 253, 254}  # WILL, WONT, DO, DONT
+
+T = TypeVar("T")
+PatternLike = Union[str, bytes, Pattern[bytes]]
+
+
+class ConsoleError(Exception):
+    """Console interaction failed (connection closed, command failed, …)."""
+
+
+class ConsoleTimeout(ConsoleError, TimeoutError):
+    """The expected pattern did not appear in time."""
+
+
+@dataclass
+class CommandResult:
+    command: str
+    output: str
+    exit_code: int
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+
+def _compile(pattern: PatternLike) -> Pattern[bytes]:
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    if isinstance(pattern, str):
+        pattern = pattern.encode()
+    return re.compile(pattern)
+
+
+class ConsoleSession:
+    """One telnet console connection with a line-buffered reader."""
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        name: str = "",
+        history: int = 200,
+    ):
+        self.name = name
+        self._reader = reader
+        self._writer = writer
+        self._buf = bytearray()             # not yet consumed by expect()
+        self._iac_state = 0                 # telnet parser state between chunks
+        self._partial = bytearray()         # current incomplete transcript line
+        self.transcript: Deque[str] = deque(maxlen=history)
+        self.prompt: Pattern[bytes] = SHELL_PROMPT
+        self._seq = 0
+        self._last_before = b""
+
+    @classmethod
+    async def open(
+        cls, host: str, port: int, timeout: float = 10.0, name: str = ""
+    ) -> "ConsoleSession":
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), timeout
+            )
+        except asyncio.TimeoutError:
+            raise ConsoleTimeout(f"connect to {host}:{port} timed out") from None
+        return cls(reader, writer, name=name or f"{host}:{port}")
+
+    async def close(self) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except (OSError, ConnectionError):
+            pass
+
+    async def __aenter__(self) -> "ConsoleSession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    # ---------- reading ---------- #
+
+    def _strip_telnet(self, data: bytes) -> bytes:
+        """Drop telnet command sequences; the state survives chunk borders."""
+        out = bytearray()
+        st = self._iac_state
+        for b in data:
+            if st == 0:
+                if b == IAC:
+                    st = 1
+                else:
+                    out.append(b)
+            elif st == 1:               # after IAC
+                if b == IAC:
+                    out.append(IAC)
+                    st = 0
+                elif b in _NEGOTIATION:
+                    st = 2
+                elif b == SB:
+                    st = 3
+                else:
+                    st = 0
+            elif st == 2:               # option byte of WILL/WONT/DO/DONT
+                st = 0
+            elif st == 3:               # inside sub-negotiation
+                if b == IAC:
+                    st = 4
+            elif st == 4:
+                st = 0 if b == SE else 3
+        self._iac_state = st
+        return bytes(out)
+
+    def _feed(self, chunk: bytes) -> None:
+        data = self._strip_telnet(chunk)
+        data = _ANSI_ESCAPE.sub(b"", data).replace(b"\r", b"").replace(b"\x00", b"")
+        self._buf += data
+        self._partial += data
+        while b"\n" in self._partial:
+            line, _, rest = bytes(self._partial).partition(b"\n")
+            self.transcript.append(line.decode(errors="replace"))
+            self._partial = bytearray(rest)
+
+    async def _fill(self, timeout: float) -> None:
+        chunk = await asyncio.wait_for(self._reader.read(4096), timeout)
+        if not chunk:
+            raise ConsoleError(f"{self.name}: console closed the connection")
+        self._feed(chunk)
+
+    async def expect(
+        self,
+        pattern: PatternLike,
+        timeout: float,
+        poke: Optional[bytes] = None,
+        poke_interval: float = 2.0,
+    ) -> "re.Match[bytes]":
+        """Wait until *pattern* matches the unread output and consume it.
+
+        When *poke* is set it is written after every *poke_interval* seconds of
+        silence (e.g. a newline to make an idle console re-print its prompt).
+        """
+        regex = _compile(pattern)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            # search an immutable snapshot: the match must stay valid after
+            # the consumed part is removed from the buffer
+            data = bytes(self._buf)
+            m = regex.search(data)
+            if m:
+                self._last_before = data[: m.start()]
+                del self._buf[: m.end()]
+                return m
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                tail = bytes(self._buf[-80:]).decode(errors="replace")
+                raise ConsoleTimeout(
+                    f"{self.name}: {regex.pattern!r} not seen in {timeout:.0f}s (tail: {tail!r})"
+                )
+            wait = remaining if poke is None else min(remaining, poke_interval)
+            try:
+                await self._fill(wait)
+            except asyncio.TimeoutError:
+                if poke is not None:
+                    await self.write(poke)
+
+    @property
+    def before(self) -> str:
+        """Output preceding the last successful :meth:`expect` match."""
+        return self._last_before.decode(errors="replace")
+
+    # ---------- writing ---------- #
+
+    async def write(self, data: bytes) -> None:
+        self._writer.write(data)
+        await self._writer.drain()
+
+    async def send(self, line: str) -> None:
+        await self.write(line.encode() + b"\n")
+
+    # ---------- high level ---------- #
+
+    async def detect_prompt(self, timeout: float = 10.0) -> str:
+        """Find the shell prompt and remember it for :meth:`run`."""
+        await self.write(b"\n")
+        m = await self.expect(SHELL_PROMPT, timeout)
+        head = self.before.rsplit("\n", 1)[-1].lstrip()
+        if head:
+            self.prompt = re.compile(re.escape(head.encode()) + rb"[#$]\s*$")
+        return head + m.group(0).decode().rstrip()
+
+    async def login(
+        self,
+        user: str,
+        password: str,
+        timeout: float = 30.0,
+        wait: Optional[float] = None,
+    ) -> None:
+        """Log in from the ``login:`` prompt and detect the shell prompt.
+
+        *wait* bounds the time until the first prompt shows up (defaults to
+        *timeout*) – this is where a booting guest spends most of its time.
+        A console that is still logged in from a previous session is reused.
+        """
+        m = await self.expect(_LOGIN_OR_SHELL, wait or timeout, poke=b"\n")
+        if m.group(1) == b"login:":
+            await self.send(user)
+            await self.expect(PASSWORD_PROMPT, timeout)
+            await self.send(password)
+            await self.expect(SHELL_PROMPT, timeout)
+        await self.detect_prompt(timeout)
+
+    async def run(self, command: str, timeout: float = 15.0) -> CommandResult:
+        """Execute *command* in the shell and capture its output and exit code."""
+        self._seq += 1
+        marker = f"__RC_{self._seq}__"
+        await self.send(f"{command}; echo {marker}$?__")
+        # the echoed command line contains '$?' literally, so only the real
+        # marker line (with the expanded status) matches
+        m = await self.expect(re.escape(marker).encode() + rb"(\d+)__", timeout)
+        output_lines = self.before.split("\n")[1:]          # drop command echo
+        await self.expect(self.prompt, timeout)
+        return CommandResult(
+            command=command,
+            output="\n".join(output_lines).strip(),
+            exit_code=int(m.group(1)),
+        )
+
+    async def run_batch(
+        self, commands: Iterable[str], timeout: float = 15.0, check: bool = True
+    ) -> List[CommandResult]:
+        """Run *commands* one after another.
+
+        With *check* a non-zero exit code raises :class:`ConsoleError`.
+        """
+        results = []
+        for cmd in commands:
+            res = await self.run(cmd, timeout)
+            results.append(res)
+            if check and not res.ok:
+                raise ConsoleError(
+                    f"{self.name}: '{cmd}' exited with {res.exit_code}: {res.output[-200:]}"
+                )
+        return results
+
+    async def logout(self) -> None:
+        await self.send("exit")
+
+
+async def run_many(
+    jobs: Iterable[Callable[[], Awaitable[T]]], limit: int
+) -> List[Union[T, BaseException]]:
+    """Run console jobs concurrently, at most *limit* at a time.
+
+    Results keep the job order; failures are returned as exception objects.
+    """
+    sem = asyncio.Semaphore(max(1, limit))
+
+    async def guarded(job: Callable[[], Awaitable[T]]) -> T:
+        async with sem:
+            return await job()
+
+    return await asyncio.gather(*(guarded(j) for j in jobs), return_exceptions=True)
@@ -0,0 +1,212 @@
+"""
+gns3_vm_manager.gns3_client
+Thin client for the GNS3 server REST API used by every deployment helper.
+
+* One process-wide keep-alive ``requests.Session`` (connection pool sized for
+  the deployment concurrency) instead of a new TCP connection per call.
+* A ``GNS3Client`` is created per request (deployment / teardown): it carries
+  the bearer token, caches the template / image / project listings for its
+  lifetime and shares one ``GET …/nodes`` listing between all nodes polled
+  for boot status.
+* Transient failures (409 and 5xx, connection errors) are retried with
+  exponential backoff and jitter.  A POST that creates something (project,
+  template, node, link) may have succeeded before a 5xx or a dropped
+  connection, so it is retried only on 409 (rejected, nothing created);
+  node/project actions such as ``…/start`` or ``…/open`` are idempotent and
+  retried like GET / PUT / DELETE.
+* Every call is timed; ``stats()`` summarises count / latency per route.
+"""
+
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = (409, 500, 502, 503, 504)
+# POSTs that can safely be repeated: actions on an existing project / node
+IDEMPOTENT_POST_RE = re.compile(r"/(start|stop|suspend|reload|open|close)$")
+_ID_RE = re.compile(r"/[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}(?=/|$)")
+
+
+_session_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_pool_size = 0
+
+
+def shared_session(pool_size: int = 32) -> requests.Session:
+    """Process-wide keep-alive session with at least *pool_size* pooled connections."""
+    global _session, _pool_size
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        if pool_size > _pool_size:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _pool_size = pool_size
+        return _session
+
+
+def route_of(path: str) -> str:
+    """``/v3/projects/<uuid>/nodes/<uuid>`` → ``/v3/projects/{id}/nodes/{id}``."""
+    return _ID_RE.sub("/{id}", path.split("?", 1)[0])
+
+
+class GNS3Client:
+    def __init__(
+        self,
+        base_url: str,
+        token: Optional[str] = None,
+        retries: int = 3,
+        backoff: float = 0.25,
+        timeout: float = 60.0,
+        pool_size: int = 32,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = shared_session(pool_size)
+        self._lock = threading.Lock()
+        self._calls: List[Tuple[str, str, int, float, int]] = []   # method, route, status, s, attempts
+        self._listings: Dict[Any, Any] = {}
+        self._listing_locks: Dict[Any, threading.Lock] = {}
+        self._node_listing: Dict[str, Tuple[float, Dict[str, Dict[str, Any]]]] = {}
+
+    # ------------------------------------------------------------------
+    # Raw calls
+    # ------------------------------------------------------------------
+    def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        accept: Sequence[int] = (),
+        retry: bool = True,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """Issue one REST call, retrying transient failures.
+
+        Statuses listed in *accept* are returned as-is (e.g. 409 for "project
+        already open"); the caller decides what is an error.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        url = f"{self.base_url}{path}"
+        attempts = (self.retries if retry else 0) + 1
+        # a repeated create could duplicate what the first attempt made
+        create = method.upper() == "POST" and not IDEMPOTENT_POST_RE.search(path.split("?", 1)[0])
+        t0 = time.perf_counter()
+        for attempt in range(1, attempts + 1):
+            try:
+                resp = self.session.request(method, url, headers=self.headers, **kwargs)
+            except requests.ConnectionError:
+                if attempt == attempts or create:
+                    self._record(method, path, 0, t0, attempt)
+                    raise
+            else:
+                if resp.status_code in accept or resp.status_code not in RETRY_STATUSES \
+                        or attempt == attempts or (create and resp.status_code != 409):
+                    self._record(method, path, resp.status_code, t0, attempt)
+                    return resp
+            # full jitter: 0 … backoff·2^(attempt-1)
+            time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+        raise AssertionError("unreachable")
+
+    def get(self, path: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def delete(self, path: str, **kwargs: Any) -> requests.Response:
+        return self.request("DELETE", path, **kwargs)
+
+    def json(self, method: str, path: str, **kwargs: Any) -> Any:
+        """Call and decode JSON; HTTP errors raise ``requests.HTTPError``."""
+        resp = self.request(method, path, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _record(self, method: str, path: str, status: int, t0: float, attempts: int) -> None:
+        with self._lock:
+            self._calls.append((method, route_of(path), status, time.perf_counter() - t0, attempts))
+
+    # ------------------------------------------------------------------
+    # Listings cached for the lifetime of this client
+    # ------------------------------------------------------------------
+    def _listing(self, key: Any, fetch: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        with self._lock:
+            lock = self._listing_locks.setdefault(key, threading.Lock())
+        # concurrent callers wait for the first fetch instead of duplicating it
+        with lock:
+            if key not in self._listings:
+                self._listings[key] = fetch()
+            return self._listings[key]
+
+    def templates(self) -> List[Dict[str, Any]]:
+        return self._listing("templates", lambda: self.json("GET", "/v3/templates"))
+
+    def images(self, image_type: str) -> List[Dict[str, Any]]:
+        return self._listing(
+            ("images", image_type),
+            lambda: self.json("GET", "/v3/images", params={"image_type": image_type}),
+        )
+
+    def projects(self) -> List[Dict[str, Any]]:
+        return self._listing("projects", lambda: self.json("GET", "/v3/projects"))
+
+    def remember(self, key: str, item: Dict[str, Any]) -> None:
+        """Add a freshly created template / project to its cached listing."""
+        with self._lock:
+            if key in self._listings:
+                self._listings[key].append(item)
+
+    def node_status(self, project_id: str, node_id: str, max_age: float = 0.5) -> Optional[str]:
+        """Status of one node from a project-wide listing at most *max_age* old.
+
+        All nodes of a deployment poll concurrently while booting; they share
+        one ``GET /nodes`` per interval instead of one request per node.
+        """
+        key = ("nodes", project_id)
+        with self._lock:
+            lock = self._listing_locks.setdefault(key, threading.Lock())
+        with lock:
+            cached = self._node_listing.get(project_id)
+            if cached is None or time.monotonic() - cached[0] > max_age:
+                resp = self.get(f"/v3/projects/{project_id}/nodes")
+                if resp.status_code != 200:
+                    return None
+                cached = (time.monotonic(), {n["node_id"]: n for n in resp.json()})
+                self._node_listing[project_id] = cached
+        node = cached[1].get(node_id)
+        return node.get("status") if node else None
+
+    # ------------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        """Number of calls, retries and latency (ms) per route."""
+        with self._lock:
+            calls = list(self._calls)
+        routes: Dict[str, Dict[str, Any]] = {}
+        for method, route, status, seconds, attempts in calls:
+            r = routes.setdefault(f"{method} {route}",
+                                  {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0})
+            r["count"] += 1
+            r["total_ms"] += seconds * 1000
+            r["max_ms"] = max(r["max_ms"], seconds * 1000)
+            r["errors"] += not 200 <= status < 300
+        for r in routes.values():
+            r["total_ms"] = round(r["total_ms"], 3)
+            r["max_ms"] = round(r["max_ms"], 3)
+        return {
+            "calls": len(calls),
+            "retries": sum(a - 1 for *_, a in calls),
+            "total_ms": round(sum(c[3] for c in calls) * 1000, 3),
+            "routes": routes,
+        }
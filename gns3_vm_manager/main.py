@@ -2,44 +2,202 @@ from fastapi import FastAPI
 import requests
 import uuid
 import re
+import asyncio
+import functools
+import os
+import json
+import hashlib
 import pathlib
-import socket
+import threading
 import time
-from typing import Optional, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Callable, Iterable, Iterator, Sequence, Tuple, TypeVar
+
+from experiment_controller.utils_ssh import exec_ssh
+from gns3_manager.catalog import normalize as _normalize_topology
+from gns3_manager.links import gns3_filters, link_attrs, rate_limit_command
+
+from .admission import ADMIT_POLICY, AdmissionController, AdmissionError
+from .console import ConsoleError, ConsoleSession, run_many
+from .gns3_client import GNS3Client
+from .processes import kill as kill_processes, scan_qemu, wait_exit
+from .provisioning import (
+    ADDRESS_REPORT, MODES as PROVISIONING_MODES, bake_commands, mac_for_ip, ip_from_mac,
+    verify_guest_address,
+)
+from .readiness import login_when_ready, wait_node_started, wait_port_open
 
 app = FastAPI(title="GNS3 VM Manager (extended)")
 GNS3_SERVER_URL = "http://localhost:3080"
+TOPOLOGY_URL = "http://localhost:8001/topologies"
 IP_BASE = "10.0.0."  
+IP_PREFIX_LEN = 24
+# Max number of concurrent REST/console operations during one deployment;
+# can be overridden per request with payload["concurrency"].
+DEPLOY_CONCURRENCY = int(os.environ.get("GNS3_DEPLOY_CONCURRENCY", "8"))
+
+# Per-node boot readiness: each attempt waits up to BOOT_TIMEOUT seconds for
+# the login prompt and is retried BOOT_RETRIES times.
+BOOT_TIMEOUT = float(os.environ.get("GNS3_BOOT_TIMEOUT", "180"))
+BOOT_RETRIES = int(os.environ.get("GNS3_BOOT_RETRIES", "2"))
+COMMAND_TIMEOUT = 15.0
+# Where the deployment cache survives restarts of the manager
+DEPLOY_STATE_FILE = os.environ.get(
+    "GNS3_DEPLOY_STATE",
+    os.path.join(os.path.expanduser("~"), ".cache", "cluster_net", "deployments.json"),
+)
+# Seconds a stopped node's QEMU process may take to exit before it is killed
+TEARDOWN_GRACE = float(os.environ.get("GNS3_TEARDOWN_GRACE", "10"))
+# vCPUs per VM when neither the topology node nor the request sets "cpus"
+VM_CPUS = int(os.environ.get("GNS3_VM_CPUS", "1"))
+GUEST_USER = "root"
+GUEST_PASSWORD = "0000"
+GUEST_SSH_PORT = 22
+# "console": configure every VM over its telnet console after boot;
+# "golden": linked clones of a baked image that configure themselves from
+# their MAC address (see provisioning.py and POST /golden).
+PROVISIONING = os.environ.get("GNS3_PROVISIONING", "console")
+GOLDEN_IMAGE = os.environ.get("GNS3_GOLDEN_IMAGE", "")
+
+T = TypeVar("T")
+R = TypeVar("R")
 
 # ------------------------------------------------------------------
-# Telnet helpers
+# Console helpers
 # ------------------------------------------------------------------
 
-def _set_ip_via_telnet(console_host: str, console_port: int,
-                       ip_cidr: str, iface: str = "ens3") -> None:
-    """Подключается к консоли гостя и назначает IP интерфейсу."""
-    with socket.create_connection((console_host, console_port), timeout=8) as s:
-        def send(cmd: str) -> None:
-            s.sendall(cmd.encode() + b"\n")
-            time.sleep(0.2)
-
-        # login: root / 0000
-        send("")            # wake up console
-        time.sleep(3)
-        s.recv(1024)
-        send("root")
-        time.sleep(0.3)
-        s.recv(1024)
-        send("0000")
-        time.sleep(0.3)
-        s.recv(1024)
-        send(f"ip link set {iface} up")
-        send(f"ip addr add {ip_cidr} dev {iface}")
-        # send("ssh-keygen -A")        # создаёт /etc/ssh/ssh_host_*,
-        send("systemctl enable --now sshd")
-        send("exit")
+async def _configure_guest(session: ConsoleSession, ip_cidr: str,
+                           extra: Sequence[str] = (), iface: str = "ens3") -> None:
+    """Назначает IP интерфейсу гостя и включает sshd (сессия уже залогинена);
+    ``extra`` — дополнительные команды (ограничение полосы связи)."""
+    await session.run_batch(
+        [
+            f"ip link set {iface} up",
+            f"ip addr replace {ip_cidr} dev {iface}",
+            # "ssh-keygen -A",        # создаёт /etc/ssh/ssh_host_*,
+            "systemctl enable --now sshd",
+            *extra,
+        ],
+        timeout=COMMAND_TIMEOUT,
+    )
+    await session.logout()
+
+
+async def _configure_when_ready(
+    project_id: str,
+    node: Dict[str, Any],
+    ip_cidr: str,
+    gns3: GNS3Client,
+    timeout: float,
+    retries: int,
+    extra: Sequence[str] = (),
+) -> Tuple[float, float]:
+    """Wait until *node* has booted, then assign its IP over the console.
+
+    Every attempt gets *timeout* seconds; failed attempts are retried up to
+    *retries* times.  Returns ``(boot_s, config_s)``: seconds until the guest
+    accepted the console login, and seconds spent configuring it.
+    """
+    t0 = time.perf_counter()
+    await wait_node_started(
+        lambda: gns3.node_status(project_id, node["node_id"]), timeout
+    )
+    for attempt in range(retries + 1):
+        try:
+            session = await login_when_ready(
+                "127.0.0.1", node["console"], GUEST_USER, GUEST_PASSWORD,
+                timeout=timeout, command_timeout=COMMAND_TIMEOUT, name=node["name"],
+            )
+            t_login = time.perf_counter()
+            async with session:
+                await _configure_guest(session, ip_cidr, extra)
+            return t_login - t0, time.perf_counter() - t_login
+        except (OSError, ConsoleError) as e:
+            if attempt == retries:
+                raise
+            print(f"[WARN] {node['name']}: attempt {attempt + 1} failed ({e}), retrying")
+    raise AssertionError("unreachable")
+
+
+async def _golden_ready(
+    project_id: str,
+    node: Dict[str, Any],
+    ip_cidr: str,
+    gns3: GNS3Client,
+    timeout: float,
+    retries: int,
+    extra: Sequence[str] = (),
+) -> Tuple[float, float]:
+    """Wait until a golden-image guest answers on its sshd port.
+
+    The guest assigns its own address at boot; over SSH it only reports its
+    NICs – the address must sit on the NIC whose MAC encodes it – and runs
+    *extra* commands (link shaping).  Returns ``(boot_s, config_s)`` like
+    :func:`_configure_when_ready`.
+    """
+    t0 = time.perf_counter()
+    ip = ip_cidr.split("/")[0]
+    await wait_node_started(
+        lambda: gns3.node_status(project_id, node["node_id"]), timeout
+    )
+    await wait_port_open(ip, GUEST_SSH_PORT, timeout * (retries + 1))
+    t_ready = time.perf_counter()
+    report, _ = await asyncio.to_thread(
+        exec_ssh, ip, " && ".join([ADDRESS_REPORT, *extra]), COMMAND_TIMEOUT
+    )
+    verify_guest_address(report, ip)
+    return t_ready - t0, time.perf_counter() - t_ready
 
 
+async def _configure_all(
+    project_id: str,
+    targets: List[Tuple[Dict[str, Any], str, List[str]]],
+    gns3: GNS3Client,
+    timeout: float,
+    retries: int,
+    concurrency: int,
+    golden: bool = False,
+) -> List[Any]:
+    """Configure every (node, ip_cidr, extra commands) target from one event loop."""
+    job = _golden_ready if golden else _configure_when_ready
+    return await run_many(
+        [
+            functools.partial(job, project_id, node, cidr, gns3, timeout, retries, extra)
+            for node, cidr, extra in targets
+        ],
+        concurrency,
+    )
+
+
+async def _bake_guest(
+    project_id: str, node: Dict[str, Any], gns3: GNS3Client, timeout: float
+) -> float:
+    """Log into a freshly booted base guest, install the golden state and
+    power it off.  Returns the seconds spent until the guest was stopped."""
+    t0 = time.perf_counter()
+    await wait_node_started(
+        lambda: gns3.node_status(project_id, node["node_id"]), timeout
+    )
+    session = await login_when_ready(
+        "127.0.0.1", node["console"], GUEST_USER, GUEST_PASSWORD,
+        timeout=timeout, command_timeout=COMMAND_TIMEOUT, name=node["name"],
+    )
+    async with session:
+        await session.run_batch(bake_commands(IP_PREFIX_LEN), timeout=COMMAND_TIMEOUT)
+        await session.send("systemctl poweroff")
+    # a clean shutdown flushes the disk; fall back to a hard stop after that
+    try:
+        await wait_node_started(
+            lambda: gns3.node_status(project_id, node["node_id"]),
+            min(timeout, 60.0),
+            want="stopped",
+        )
+    except ConsoleError:
+        print(f"[WARN] {node['name']} did not power off, stopping it")
+        gns3.post(f"/v3/projects/{project_id}/nodes/{node['node_id']}/stop")
+    return time.perf_counter() - t0
+
 
 # --------------------------------------------------------------------------------------
 # Helper functions
@@ -59,11 +217,34 @@ def _clean_alnum(s: str) -> str:
     return _alnum_only.sub("", s)
 
 
-def _open_project(project_id: str, headers: Dict[str, str]) -> None:
+def _parallel_map(fn: Callable[[T], R], items: Iterable[T], limit: int) -> List[R]:
+    """Apply *fn* to every item in a bounded thread pool, preserving order.
+
+    The first exception raised by *fn* is re-raised to the caller.
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = max(1, min(limit, len(items)))
+    if workers == 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deploy") as pool:
+        return list(pool.map(fn, items))
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], phase: str) -> Iterator[None]:
+    """Record the duration of a deployment phase (seconds, monotonic clock)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = round(time.perf_counter() - t0, 3)
+
+
+def _open_project(project_id: str, gns3: GNS3Client) -> None:
     """Ensure the project is opened inside GNS3."""
-    resp = requests.post(
-        f"{GNS3_SERVER_URL}/v3/projects/{project_id}/open", headers=headers
-    )
+    resp = gns3.post(f"/v3/projects/{project_id}/open", accept=(409,))
     if resp.status_code == 409:  # already open
         print(f"Project {project_id} already open")
         return
@@ -75,34 +256,104 @@ def _open_project(project_id: str, headers: Dict[str, str]) -> None:
 # Internal helpers used by the API logic
 # --------------------------------------------------------------------------------------
 
-def _get_or_create_project(name: str, headers: Dict[str, str]) -> Dict[str, Any]:
+def _find_project_id(name: str, gns3: GNS3Client) -> Optional[str]:
+    for p in gns3.projects():
+        if p.get("name") == name:
+            return p["project_id"]
+    return None
+
+
+def _teardown_project(
+    project_id: str,
+    gns3: GNS3Client,
+    concurrency: int,
+    delete_project: bool = False,
+    grace: float = TEARDOWN_GRACE,
+) -> Dict[str, Any]:
+    """Stop and remove everything in a project and make sure the VMs are gone.
+
+       1) Stop all running nodes (in parallel)
+       2) Delete the whole project, or its links and then its nodes (in parallel)
+       3) Wait up to *grace* seconds for the nodes' QEMU processes to exit and
+          kill the ones that do not (local ``/proc`` scan, see processes.py)
+
+    Returns a report with the counts and the resources freed.
+    """
+    resp = gns3.get(f"/v3/projects/{project_id}/nodes")
+    nodes = resp.json() if resp.status_code == 200 else []
+    resp = gns3.get(f"/v3/projects/{project_id}/links")
+    links = resp.json() if resp.status_code == 200 else []
+    node_ids = [n["node_id"] for n in nodes]
+    before = scan_qemu(node_ids)
+
+    running = [n for n in nodes if n.get("status") != "stopped"]
+    stopped = _parallel_map(
+        lambda n: gns3.post(f"/v3/projects/{project_id}/nodes/{n['node_id']}/stop").ok,
+        running,
+        concurrency,
+    )
+    report: Dict[str, Any] = {
+        "nodes_stopped": sum(stopped),
+        "links_deleted": 0,
+        "nodes_deleted": 0,
+        "project_deleted": False,
+    }
+
+    if delete_project:
+        resp = gns3.delete(f"/v3/projects/{project_id}")
+        report["project_deleted"] = resp.status_code in (200, 204)
+    if report["project_deleted"]:
+        report["links_deleted"], report["nodes_deleted"] = len(links), len(nodes)
+    else:
+        # links first: deleting a node would otherwise race its links' cleanup
+        report["links_deleted"] = sum(_parallel_map(
+            lambda l: gns3.delete(f"/v3/projects/{project_id}/links/{l['link_id']}").ok,
+            links,
+            concurrency,
+        ))
+        report["nodes_deleted"] = sum(_parallel_map(
+            lambda n: gns3.delete(f"/v3/projects/{project_id}/nodes/{n['node_id']}").ok,
+            nodes,
+            concurrency,
+        ))
+
+    # QEMU may still be flushing / shutting down – give it *grace* seconds
+    pids = {p.pid for p in before} | {p.pid for p in scan_qemu(node_ids)}
+    leftover = wait_exit(pids, grace)
+    killed = kill_processes(leftover) if leftover else {"terminated": [], "killed": [], "failed": []}
+    if leftover:
+        print(f"[WARN] {len(leftover)} QEMU processes of project {project_id} "
+              f"outlived teardown: {killed}")
+
+    qemu = [n for n in nodes if n.get("node_type") == "qemu"]
+    report["processes"] = {"found": len(pids), "exited": len(pids) - len(leftover), **killed}
+    report["freed"] = {
+        "vms": len(qemu),
+        "ram_mb": sum(int((n.get("properties") or {}).get("ram") or 0) for n in qemu),
+        "vcpus": sum(int((n.get("properties") or {}).get("cpus") or 1) for n in qemu),
+        "rss_mb": round(sum(p.rss_kb for p in before) / 1024, 1),
+    }
+    return report
+
+
+def _get_or_create_project(name: str, gns3: GNS3Client) -> Dict[str, Any]:
     """Return project object; create if it does not exist."""
-    projects = requests.get(f"{GNS3_SERVER_URL}/v3/projects", headers=headers).json()
-    for p in projects:
+    for p in gns3.projects():
         if p.get("name") == name:
             print(f"Found existing project '{name}' (id={p['project_id']})")
-            _open_project(p["project_id"], headers)
+            _open_project(p["project_id"], gns3)
             return p
 
-    resp = requests.post(
-        f"{GNS3_SERVER_URL}/v3/projects",
-        headers=headers,
-        json={"name": name},
-    )
-    resp.raise_for_status()
-    project = resp.json()
+    project = gns3.json("POST", "/v3/projects", json={"name": name})
+    gns3.remember("projects", project)
     print(f"Created new project '{name}' (id={project['project_id']})")
-    _open_project(project["project_id"], headers)
+    _open_project(project["project_id"], gns3)
     return project
 
 
-def _get_arch_image(headers: Dict[str, str]) -> Optional[str]:
+def _get_arch_image(gns3: GNS3Client) -> Optional[str]:
     """Return the *first* QEMU image whose filename starts with 'arch'."""
-    images_resp = requests.get(
-        f"{GNS3_SERVER_URL}/v3/images", params={"image_type": "qemu"}, headers=headers
-    )
-    images_resp.raise_for_status()
-    for img in images_resp.json():
+    for img in gns3.images("qemu"):
         # The API returns the *basename* in `filename`, full path in `file_path`
         filename = img.get("filename") or ""
         if filename.startswith("arch"):
@@ -115,7 +366,10 @@ def _get_or_create_qemu_template(
     image: str,
     ram: int,
     platform: Optional[str],
-    headers: Dict[str, str],
+    gns3: GNS3Client,
+    cpus: int = 1,
+    exact_image: bool = False,
+    linked_clone: bool = True,
 ) -> str:
     """Return `template_id`; create QEMU template when missing.
 
@@ -125,18 +379,22 @@ def _get_or_create_qemu_template(
         found, we quietly fall back to the provided *image* argument.
       • Use the *flat* template JSON format expected by GNS3 3.x, closely
         matching the example you supplied.
+
+    With *exact_image* the given image is used as-is (golden images).  A
+    template with ``linked_clone=False`` writes to the image itself; it is
+    only used to bake a golden image.
     """
 
     clean_name = _clean_alnum(template_name)
 
     # 1. Search for an existing template with the same (cleaned) name ---------
-    for t in requests.get(f"{GNS3_SERVER_URL}/v3/templates", headers=headers).json():
+    for t in gns3.templates():
         if t.get("name") == clean_name:
             print(f"Found QEMU template '{clean_name}' (id={t['template_id']})")
             return t["template_id"]
 
     # 2. Select the disk image ------------------------------------------------
-    image_path = _get_arch_image(headers) or image
+    image_path = image if exact_image else (_get_arch_image(gns3) or image)
 
     # 3. Prepare creation payload (flat, GNS3 3.x style) ----------------------
     payload: Dict[str, Any] = {
@@ -164,7 +422,7 @@ def _get_or_create_qemu_template(
         "console_auto_start": False,
         "aux_type": "none",
         "ram": ram,
-        "cpus": 1,
+        "cpus": cpus,
         "adapters": 1,
         "adapter_type": "e1000",
         "mac_address": "",
@@ -181,14 +439,14 @@ def _get_or_create_qemu_template(
         "kernel_image": "",
         "initrd": "",
         "kernel_command_line": "",
-        "linked_clone": True,
+        "linked_clone": linked_clone,
         "compute_id": "local",
         "template_type": "qemu",
     }
 
-    resp = requests.post(f"{GNS3_SERVER_URL}/v3/templates", headers=headers, json=payload)
-    resp.raise_for_status()
-    tid = resp.json()["template_id"]
+    template = gns3.json("POST", "/v3/templates", json=payload)
+    gns3.remember("templates", template)
+    tid = template["template_id"]
     print(f"Created QEMU template '{clean_name}' (id={tid})")
     return tid
 
@@ -199,30 +457,24 @@ def _create_node_from_template(
     x: int,
     y: int,
     name: Optional[str],
-    headers: Dict[str, str],
+    gns3: GNS3Client,
 ) -> Dict[str, Any]:
     """Instantiate a node from an existing template, positioned at (x, y)."""
     payload: Dict[str, Any] = {"x": x, "y": y}
     if name:
         payload["name"] = _sanitize(name)
 
-    resp = requests.post(
-        f"{GNS3_SERVER_URL}/v3/projects/{project_id}/templates/{template_id}",
-        headers=headers,
-        json=payload,
-    )
-    resp.raise_for_status()
-    return resp.json()
+    return gns3.json("POST", f"/v3/projects/{project_id}/templates/{template_id}", json=payload)
 
 
-def _create_links(
+def _create_link(
     project_id: str,
-    link_defs: List[Dict[str, Any]],
+    link: Dict[str, Any],
     node_ids: Dict[str, str],
-    headers: Dict[str, str],
-):
+    gns3: GNS3Client,
+) -> None:
     """
-    Создаёт связи так, как того требует GNS3 3.x:
+    Создаёт одну связь так, как того требует GNS3 3.x:
       • каждая связь содержит список «nodes» c node_id/adapter_number/port_number
       • можно заранее указать adapter/port в JSON-топологии; иначе берём 0:0
       • добавляем обязательные поля link_type и suspend
@@ -236,224 +488,737 @@ def _create_links(
         ]
     }
     """
-    for link in link_defs:
-        endpoints = link.get("endpoints", [])
-        if len(endpoints) < 2:
+    endpoints = link.get("endpoints", [])
+    if len(endpoints) < 2:
+        return
+
+    nodes_payload = []
+    for ep in endpoints:
+        # a) упрощённый формат: "N1"
+        if isinstance(ep, str):
+            ep_name, adapter, port = ep, 0, 0
+        # b) расширенный: {"node": "N1", "adapter": 1, "port": 0}
+        else:
+            ep_name = ep.get("node") or ep.get("name") or ep.get("id")
+            adapter = ep.get("adapter", ep.get("adapter_number", 0))
+            port = ep.get("port", ep.get("port_number", 0))
+
+        nodes_payload.append(
+            {
+                "node_id": node_ids[ep_name],
+                "adapter_number": adapter,
+                "port_number": port,
+            }
+        )
+
+    link_data = {
+        "link_type": link.get("link_type", "ethernet"),
+        "suspend": False,
+        "nodes": nodes_payload,
+    }
+    # задержка / джиттер / потери — фильтрами ubridge на самой связи
+    filters = gns3_filters(link_attrs(link))
+    if filters:
+        link_data["filters"] = filters
+
+    resp = gns3.post(f"/v3/projects/{project_id}/links", json=link_data)
+    if not resp.ok:
+        # e.g. a rejected filter: deploying without the link would silently
+        # run experiments on a different network
+        raise ValueError(f"GNS3 rejected link {endpoints[0]} <-> {endpoints[1]}: "
+                         f"HTTP {resp.status_code} {resp.text[:200]}")
+    print(f"Created link {endpoints[0]} <-> {endpoints[1]}")
+
+
+def _host_rate_limits(config: Dict[str, Any]) -> Dict[int, float]:
+    """Bandwidth (Mbit/s) of the link of every QEMU node, by node position.
+
+    GNS3 link filters cannot limit bandwidth, so it is enforced inside the
+    guest (tbf on its only interface) – which only works for links that
+    touch a VM.  Bandwidth of switch-to-switch links is left to placement.
+    """
+    position: Dict[str, int] = {}
+    for i, node in enumerate(config.get("nodes", [])):
+        if node.get("type", "qemu") == "qemu":
+            for key in (node.get("id"), node.get("name")):
+                if key:
+                    position.setdefault(key, i)
+    limits: Dict[int, float] = {}
+    for link in config.get("links", []):
+        bandwidth = link_attrs(link).get("bandwidth")
+        if not bandwidth:
             continue
+        for ep in link.get("endpoints", []):
+            name = ep if isinstance(ep, str) else ep.get("node") or ep.get("name") or ep.get("id")
+            if name in position:
+                i = position[name]
+                limits[i] = min(bandwidth, limits.get(i, bandwidth))
+    return limits
 
-        nodes_payload = []
-        for ep in endpoints:
-            # a) упрощённый формат: "N1"
-            if isinstance(ep, str):
-                ep_name, adapter, port = ep, 0, 0
-            # b) расширенный: {"node": "N1", "adapter": 1, "port": 0}
-            else:
-                ep_name = ep.get("node") or ep.get("name") or ep.get("id")
-                adapter = ep.get("adapter", ep.get("adapter_number", 0))
-                port = ep.get("port", ep.get("port_number", 0))
-
-            nodes_payload.append(
-                {
-                    "node_id": node_ids[ep_name],
-                    "adapter_number": adapter,
-                    "port_number": port,
-                }
-            )
 
-        link_data = {
-            "link_type": link.get("link_type", "ethernet"),
-            "suspend": False,
-            "nodes": nodes_payload,
-        }
+def _create_links(
+    project_id: str,
+    link_defs: List[Dict[str, Any]],
+    node_ids: Dict[str, str],
+    gns3: GNS3Client,
+    concurrency: int = DEPLOY_CONCURRENCY,
+):
+    """Create all links concurrently; every endpoint ID must already be known."""
+    _parallel_map(
+        lambda link: _create_link(project_id, link, node_ids, gns3),
+        link_defs,
+        concurrency,
+    )
 
-        requests.post(
-            f"{GNS3_SERVER_URL}/v3/projects/{project_id}/links",
-            headers=headers,
-            json=link_data,
-        )
-        print(f"Created link {endpoints[0]} <-> {endpoints[1]}")
 
+# topology name -> (ETag, normalized JSON body) from the Topology Manager
+_topology_bodies: Dict[str, Tuple[str, bytes]] = {}
 
-def _normalize_topology(config: Dict[str, Any]) -> Dict[str, Any]:
-    """Return topology description in the simplified internal format."""
-    if "topology" not in config:
-        return config
 
-    topo = config.get("topology", {})
+def _fetch_topology(name: str) -> Optional[Dict[str, Any]]:
+    """Normalized topology from the Topology Manager (None if not found).
+
+    The last body is kept with its ETag and revalidated with If-None-Match,
+    so an unchanged topology costs a 304 instead of a full transfer.  A fresh
+    dict is returned every time: callers mutate it.
+    """
+    cached = _topology_bodies.get(name)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    resp = requests.get(f"{TOPOLOGY_URL}/{name}", params={"format": "normalized"},
+                        headers=headers)
+    if resp.status_code == 304 and cached:
+        return json.loads(cached[1])
+    if resp.status_code != 200:
+        _topology_bodies.pop(name, None)
+        return None
+    if resp.headers.get("ETag"):
+        _topology_bodies[name] = (resp.headers["ETag"], resp.content)
+    return resp.json()
 
-    nodes: List[Dict[str, Any]] = []
-    for n in topo.get("nodes", []):
-        n_type = n.get("node_type") or n.get("type")
-        entry = {
-            "id": n.get("node_id") or n.get("name"),
-            "name": n.get("name"),
-            "type": n_type,
-            "x": n.get("x", 0),
-            "y": n.get("y", 0),
-        }
-        if n_type == "qemu":
-            props = n.get("properties", {})
-            entry["image"] = props.get("hda_disk_image") or n.get("image", "")
-            entry["ram"] = props.get("ram", n.get("ram", 512))
-            if props.get("platform"):
-                entry["platform"] = props.get("platform")
-
-        nodes.append(entry)
-
-    links: List[Dict[str, Any]] = []
-    for link in topo.get("links", []):
-        eps = []
-        for ep in link.get("nodes", []):
-            eps.append(
-                {
-                    "node": ep.get("node_id"),
-                    "adapter": ep.get("adapter_number", 0),
-                    "port": ep.get("port_number", 0),
-                }
-            )
-        if eps:
-            links.append({"endpoints": eps})
 
-    return {"nodes": nodes, "links": links}
+def _resolve_cpus(config: Dict[str, Any], override: Optional[int] = None) -> None:
+    """Fill in ``cpus`` for every QEMU node: ``override`` (request) wins over
+    the node's own value, which wins over ``VM_CPUS``."""
+    for node in config.get("nodes", []):
+        if node.get("type", "qemu") == "qemu":
+            node["cpus"] = int(override or node.get("cpus") or VM_CPUS)
 
 
 # --------------------------------------------------------------------------------------
-# API endpoint
+# Deployment cache
 # --------------------------------------------------------------------------------------
 
-@app.post("/start")
-def start_topology(payload: dict):
-    """Launch (or reuse) a virtual topology inside GNS3 server.
+# topology name -> {"fingerprint", "project_id", "nodes", "deployed_at"}.
+# Persisted so a restarted manager neither loses nor duplicates deployments.
+_deployments: Dict[str, Dict[str, Any]] = {}
+_deployments_lock = threading.Lock()
+_topology_locks: Dict[str, threading.Lock] = {}
+# RAM / vCPU budget shared by all deployments (see admission.py)
+admission = AdmissionController()
 
-    The function strictly follows these steps, mirroring the captured HTTP flow:
-       1) Ensure the project exists (create when absent)
-       2) Ensure the required QEMU template exists for every unique QCOW2 image
-       3) Instantiate nodes from templates
-       4) Create links
-       5) Start all nodes
-    """
 
-    topology_name = payload.get("topology")
-    if not topology_name:
-        return {"error": "topology not provided"}
+def _load_deployments() -> None:
+    try:
+        with open(DEPLOY_STATE_FILE) as f:
+            _deployments.update(json.load(f))
+    except (OSError, ValueError):
+        pass
 
-    token = payload.get("token")
-    if not token:
-        return {"error": "token missing"}
 
-    headers = {"Authorization": f"Bearer {token}"}
+def _save_deployments() -> None:
+    os.makedirs(os.path.dirname(DEPLOY_STATE_FILE), exist_ok=True)
+    tmp = f"{DEPLOY_STATE_FILE}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(_deployments, f)
+    os.replace(tmp, DEPLOY_STATE_FILE)
+
+
+def _remember_deployment(topology_name: str, entry: Dict[str, Any]) -> None:
+    with _deployments_lock:
+        _deployments[topology_name] = entry
+        _save_deployments()
+
+
+def _forget_deployment(topology_name: str) -> None:
+    with _deployments_lock:
+        if _deployments.pop(topology_name, None) is not None:
+            _save_deployments()
 
-    # ------------------------------------------------------------------
-    # Step 0. Fetch JSON definition from the (external) Topology Manager
-    # ------------------------------------------------------------------
-    cfg_resp = requests.get(f"http://localhost:8001/topologies/{topology_name}")
-    if cfg_resp.status_code != 200:
-        return {"error": "Topology configuration not found", "topology": topology_name}
 
-    config = _normalize_topology(cfg_resp.json())
+def _topology_lock(topology_name: str) -> threading.Lock:
+    """Deployments of the same topology are serialized."""
+    with _deployments_lock:
+        return _topology_locks.setdefault(topology_name, threading.Lock())
 
+
+_load_deployments()
+for _name, _entry in _deployments.items():
+    admission.restore(_name, _entry["nodes"])
+
+
+# --------------------------------------------------------------------------------------
+# API endpoint
+# --------------------------------------------------------------------------------------
+
+def _deploy_topology(
+    topology_name: str,
+    config: Dict[str, Any],
+    gns3: GNS3Client,
+    concurrency: int,
+    payload: Dict[str, Any],
+    timings: Dict[str, float],
+    golden: bool = False,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Deploy *config* from scratch into ``project_<topology_name>``.
+
+    The steps mirror the captured HTTP flow:
+       1) Ensure the project exists (create when absent) and is empty
+       2) Ensure the required QEMU template exists for every unique QCOW2 image
+       3) Instantiate nodes from templates (in parallel)
+       4) Create links (in parallel, once all endpoint IDs are known)
+       5) Start all nodes and configure guest consoles (in parallel)
+
+    With *golden* the nodes are linked clones of a baked golden image: each
+    one gets a MAC encoding its IP before start, and step 5 only waits for
+    the guests' sshd instead of configuring them over the console.
+
+    Returns ``(project_id, nodes_status)``.
+    """
     project_name = f"project_{topology_name}"
 
     # ------------------------------------------------------------------
-    # Step 1. Ensure project exists
+    # Step 1. Ensure project exists – and is empty, so nodes never pile up
     # ------------------------------------------------------------------
-    project = _get_or_create_project(project_name, headers)
-    project_id = project["project_id"]
+    with _timed(timings, "project"):
+        project = _get_or_create_project(project_name, gns3)
+        project_id = project["project_id"]
+        removed = _teardown_project(project_id, gns3, concurrency)["nodes_deleted"]
+        if removed:
+            print(f"Removed {removed} stale nodes from project {project_id}")
 
     # ------------------------------------------------------------------
     # Step 2. Ensure templates exist and build image→template map
     # ------------------------------------------------------------------
-    template_for_image: Dict[str, str] = {}
-    for node in config.get("nodes", []):
-        if node.get("type", "qemu") != "qemu":
-            continue  # Non‑QEMU nodes are handled later
-        image_path = node.get("image")
-        if image_path in template_for_image:
-            continue  # already done
-        template_name = f"tpl_{pathlib.Path(image_path).name}"  # e.g. tpl_arch3.qcow
-        template_id = _get_or_create_qemu_template(
-            template_name=template_name,
-            image=image_path,
-            ram=node.get("ram", 512),
-            platform=node.get("platform"),
-            headers=headers,
-        )
-        template_for_image[image_path] = template_id
+    # One template per (image, vCPU count, RAM): the template name encodes
+    # them, so a template created for other settings is never reused.
+    template_for_image: Dict[Tuple[str, int, int], str] = {}
+    with _timed(timings, "templates"):
+        for node in config.get("nodes", []):
+            if node.get("type", "qemu") != "qemu":
+                continue  # Non‑QEMU nodes are handled later
+            key = (node.get("image"), node["cpus"], int(node.get("ram", 512)))
+            if key in template_for_image:
+                continue  # already done
+            template_name = f"tpl_{pathlib.Path(key[0]).name}"  # e.g. tpl_arch3.qcow
+            if key[1] > 1:
+                template_name += f"_{key[1]}cpu"
+            if key[2] != 512:
+                template_name += f"_{key[2]}mb"
+            template_id = _get_or_create_qemu_template(
+                template_name=template_name,
+                image=key[0],
+                ram=key[2],
+                platform=node.get("platform"),
+                gns3=gns3,
+                cpus=key[1],
+                exact_image=golden,
+            )
+            template_for_image[key] = template_id
 
     # ------------------------------------------------------------------
-    # Step 3. Create nodes (from templates or directly)
+    # Step 3. Create nodes (from templates or directly), all in parallel
     # ------------------------------------------------------------------
-    node_ids: Dict[str, str] = {}
-
-    for node in config.get("nodes", []):
+    node_defs = config.get("nodes", [])
+    # IPs are fixed up-front by the order of QEMU nodes in the definition
+    qemu_defs = [i for i, n in enumerate(node_defs) if n.get("type", "qemu") == "qemu"]
+    if len(qemu_defs) > 2 ** (32 - IP_PREFIX_LEN) - 2:
+        raise ValueError(f"{len(qemu_defs)} VMs do not fit into {IP_BASE}0/{IP_PREFIX_LEN}")
+    ip_of = {i: f"{IP_BASE}{idx}" for idx, i in enumerate(qemu_defs, start=1)}
+    rate_of = _host_rate_limits(config)
+
+    def create_node(i: int) -> Dict[str, Any]:
+        node = node_defs[i]
         if node.get("type", "qemu") == "qemu":
             base = pathlib.Path(node["image"]).stem  # arch3 → "arch3"
-            template_basename = base  # <- used for autogenerated node name
-            template_id = template_for_image[node["image"]]
+            template_id = template_for_image[
+                (node["image"], node["cpus"], int(node.get("ram", 512)))
+            ]
 
-            node_name = node.get("name") or f"{template_basename}-{uuid.uuid4().hex[:4]}"
+            node_name = node.get("name") or f"{base}-{uuid.uuid4().hex[:4]}"
             created = _create_node_from_template(
                 project_id,
                 template_id,
                 x=node.get("x", 0),
                 y=node.get("y", 0),
                 name=node_name,
-                headers=headers,
-            )
-        else:
-            # Other node types (e.g. Ethernet switch, Docker) – create directly
-            node_data = {
-                "name": node["name"],
-                "node_type": node.get("node_type", node.get("type")),
-                "compute_id": "local",
-                "x": node.get("x", 0),
-                "y": node.get("y", 0),
-            }
-            res = requests.post(
-                f"{GNS3_SERVER_URL}/v3/projects/{project_id}/nodes", headers=headers, json=node_data
+                gns3=gns3,
             )
-            res.raise_for_status()
-            created = res.json()
+            if golden:
+                # the guest derives its address from the MAC at boot
+                created = gns3.json(
+                    "PUT",
+                    f"/v3/projects/{project_id}/nodes/{created['node_id']}",
+                    json={"properties": {"mac_address": mac_for_ip(ip_of[i])}},
+                )
+                mac = (created.get("properties") or {}).get("mac_address") or ""
+                try:
+                    assigned = ip_from_mac(mac)
+                except ValueError:
+                    assigned = None
+                if assigned != ip_of[i]:
+                    raise ValueError(f"GNS3 did not keep MAC {mac_for_ip(ip_of[i])} "
+                                     f"on node {node['name']} (has {mac or 'none'})")
+            return created
+
+        # Other node types (e.g. Ethernet switch, Docker) – create directly
+        node_data = {
+            "name": node["name"],
+            "node_type": node.get("node_type", node.get("type")),
+            "compute_id": "local",
+            "x": node.get("x", 0),
+            "y": node.get("y", 0),
+        }
+        if node.get("properties"):
+            # e.g. ports_mapping of generated switches with more than 8 ports
+            node_data["properties"] = node["properties"]
+        return gns3.json("POST", f"/v3/projects/{project_id}/nodes", json=node_data)
 
+    with _timed(timings, "nodes"):
+        created_nodes = _parallel_map(create_node, range(len(node_defs)), concurrency)
+
+    node_ids: Dict[str, str] = {}
+    for node, created in zip(node_defs, created_nodes):
         # Use the node's *configured* name as the key inside `node_ids`
-        node_key = node.get("name") or template_basename  # fall back to template base
+        node_key = node.get("name") or created.get("name")
         node_ids[node_key] = created["node_id"]
         node_key_id = node.get("id")                                  # N1
         if node_key_id:
-            node_ids[node_key_id] = created["node_id"]   
+            node_ids[node_key_id] = created["node_id"]
         print(f"Node '{node_key}' ready (id={node_ids[node_key]})")
 
     # ------------------------------------------------------------------
     # Step 4. Create links
     # ------------------------------------------------------------------
-    _create_links(project_id, config.get("links", []), node_ids, headers)
+    with _timed(timings, "links"):
+        _create_links(project_id, config.get("links", []), node_ids, gns3, concurrency)
 
     # ------------------------------------------------------------------
     # Step 5. Start all nodes
     # ------------------------------------------------------------------
-    start_resp = requests.post(
-        f"{GNS3_SERVER_URL}/v3/projects/{project_id}/nodes/start", headers=headers
-    )
-    start_resp.raise_for_status()
+    with _timed(timings, "start"):
+        gns3.post(f"/v3/projects/{project_id}/nodes/start").raise_for_status()
     print("All nodes started for project", project_id)
 
     # ------------------------------------------------------------------
     # Gather final node information (statuses, hosts, …)
     # ------------------------------------------------------------------
-    nodes_status = requests.get(
-        f"{GNS3_SERVER_URL}/v3/projects/{project_id}/nodes", headers=headers
-    ).json()
-
-    # sequential IP assignment only for QEMU nodes --------------------
-    qemu_nodes = [n for n in nodes_status if n.get("node_type") == "qemu"]
-    time.sleep(30)
-    for idx, node in enumerate(qemu_nodes, start=1):
-        ip = f"{IP_BASE}{idx}"
-        cidr = f"{ip}/24"
+    nodes_status = gns3.json("GET", f"/v3/projects/{project_id}/nodes")
+
+    # parallel IP assignment only for QEMU nodes ----------------------
+    # every VM is configured as soon as its own console reports a login
+    # prompt, there is no global boot delay.
+    # Nodes are created concurrently, so the GNS3 listing order is arbitrary –
+    # map them back to their position in the topology definition.
+    position = {c["node_id"]: i for i, c in enumerate(created_nodes)}
+    boot_timeout = float(payload.get("boot_timeout") or BOOT_TIMEOUT)
+    boot_retries = int(payload.get("boot_retries", BOOT_RETRIES))
+
+    targets = sorted(
+        (
+            (
+                node,
+                f"{ip_of[position[node['node_id']]]}/{IP_PREFIX_LEN}",
+                [rate_limit_command(rate_of[position[node["node_id"]]])]
+                if position[node["node_id"]] in rate_of else [],
+            )
+            for node in nodes_status
+            if position.get(node["node_id"]) in ip_of
+        ),
+        key=lambda t: position[t[0]["node_id"]],
+    )
+    with _timed(timings, "ip_config"):
+        results = asyncio.run(
+            _configure_all(
+                project_id, targets, gns3, boot_timeout, boot_retries, concurrency,
+                golden=golden,
+            )
+        )
+
+    boot, config = [], []
+    for (node, cidr, extra), res in zip(targets, results):
+        if isinstance(res, BaseException):
+            print(f"[WARN] could not configure IP on {node['name']}: {res}")
+            continue
+        ip = cidr.split("/")[0]
+        boot_s, config_s = res
+        node["ip_address"] = ip
+        if extra:
+            node["rate_mbit"] = rate_of[position[node["node_id"]]]
+        node["boot_s"] = round(boot_s, 3)
+        node["ready_s"] = round(boot_s + config_s, 3)
+        boot.append(boot_s)
+        config.append(config_s)
+        print(f"Configured {node['name']} → {ip} ({boot_s + config_s:.1f}s after start)")
+    # VMs boot in parallel: the slowest one bounds the deployment
+    if boot:
+        timings["boot_wait"] = round(max(boot), 3)
+        timings["guest_config"] = round(max(config), 3)
+
+    return project_id, nodes_status
+
+
+def _fingerprint(config: Dict[str, Any]) -> str:
+    """Stable hash of a normalized topology definition."""
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _live_inventory(
+    entry: Dict[str, Any], gns3: GNS3Client
+) -> Optional[List[Dict[str, Any]]]:
+    """Return the cached inventory refreshed from GNS3 if every node still runs
+    and every host got its IP address.
+
+    A deployment in which some VM failed IP configuration is remembered (so it
+    can be torn down) but never reused: the next ``/start`` redeploys it.
+    """
+    if any(n.get("node_type") == "qemu" and not n.get("ip_address") for n in entry["nodes"]):
+        return None
+    resp = gns3.get(f"/v3/projects/{entry['project_id']}/nodes")
+    if resp.status_code != 200:
+        return None
+    live = {n["node_id"]: n for n in resp.json()}
+    nodes = []
+    for cached in entry["nodes"]:
+        current = live.get(cached["node_id"])
+        if current is None or current.get("status") != "started":
+            return None
+        for key in ("ip_address", "boot_s", "ready_s", "rate_mbit"):
+            if key in cached:
+                current[key] = cached[key]
+        nodes.append(current)
+    if len(live) != len(nodes):
+        return None  # someone added nodes behind our back
+    return nodes
+
+
+@app.post("/start")
+def start_topology(payload: dict):
+    """Launch (or reuse) a virtual topology inside GNS3 server.
+
+    A deployed topology is remembered together with a fingerprint of its JSON
+    definition.  Later requests for the same, unchanged topology whose nodes
+    are all still running return the live node/IP inventory immediately
+    (``"reused": true``).  A changed definition, stopped/missing nodes or
+    ``payload["force"]`` trigger a reset and a full redeploy.
+
+    ``payload["concurrency"]`` bounds the number of simultaneous REST/console
+    operations; the response carries per-phase ``timings`` in seconds.
+    ``payload["cpus"]`` sets the vCPU count of every VM (default: the node's
+    ``cpus`` in the topology JSON, else ``GNS3_VM_CPUS``); it is part of the
+    fingerprint, so changing it redeploys.
+    ``payload["provisioning"]`` (default ``GNS3_PROVISIONING``) selects
+    ``"console"`` or ``"golden"``; the latter deploys linked clones of
+    ``payload["golden_image"]`` (default ``GNS3_GOLDEN_IMAGE``), baked with
+    ``POST /golden``, and skips console configuration entirely.
+    ``payload["admission"]`` (default ``GNS3_ADMISSION``) is the admission
+    policy for a fresh deployment that does not fit on the host: ``reject``,
+    ``queue``, ``scale`` or ``off`` (see admission.py).
+    """
+
+    topology_name = payload.get("topology")
+    if not topology_name:
+        return {"error": "topology not provided"}
+
+    token = payload.get("token")
+    if not token:
+        return {"error": "token missing"}
+
+    provisioning = payload.get("provisioning") or PROVISIONING
+    if provisioning not in PROVISIONING_MODES:
+        return {"error": f"unknown provisioning '{provisioning}'",
+                "supported": list(PROVISIONING_MODES)}
+    golden_image = payload.get("golden_image") or GOLDEN_IMAGE
+    if provisioning == "golden" and not golden_image:
+        return {"error": "golden image not set; bake one with POST /golden"}
+
+    concurrency = int(payload.get("concurrency") or DEPLOY_CONCURRENCY)
+    gns3 = GNS3Client(GNS3_SERVER_URL, token, pool_size=4 * concurrency)
+    timings: Dict[str, float] = {}
+    t_total = time.perf_counter()
+
+    # ------------------------------------------------------------------
+    # Step 0. Fetch JSON definition from the (external) Topology Manager
+    # ------------------------------------------------------------------
+    with _timed(timings, "topology"):
+        config = _fetch_topology(topology_name)
+        if config is None:
+            return {"error": "Topology configuration not found", "topology": topology_name}
+
+        config = _normalize_topology(config)
+        _resolve_cpus(config, payload.get("cpus"))
+        try:
+            for link in config.get("links", []):
+                gns3_filters(link_attrs(link))
+        except ValueError as e:
+            return {"error": str(e), "topology": topology_name}
+        if provisioning == "golden":
+            # part of the fingerprint: switching images redeploys
+            for node in config.get("nodes", []):
+                if node.get("type", "qemu") == "qemu":
+                    node["image"] = golden_image
+    fingerprint = _fingerprint(config)
+
+    with _topology_lock(topology_name):
+        entry = _deployments.get(topology_name)
+        if entry and not payload.get("force"):
+            if entry["fingerprint"] == fingerprint:
+                with _timed(timings, "reuse_check"):
+                    _open_project(entry["project_id"], gns3)
+                    nodes = _live_inventory(entry, gns3)
+                if nodes is not None:
+                    timings["total"] = round(time.perf_counter() - t_total, 3)
+                    print(f"Reusing deployment of '{topology_name}' ({entry['project_id']})")
+                    return {
+                        "project_id": entry["project_id"],
+                        "nodes": nodes,
+                        "timings": timings,
+                        "reused": True,
+                        "fingerprint": fingerprint,
+                        "rest": gns3.stats(),
+                    }
+                print(f"Deployment of '{topology_name}' is stale or incomplete, redeploying")
+            else:
+                print(f"Topology '{topology_name}' changed, redeploying")
+
+        try:
+            with _timed(timings, "admission"):
+                admitted = admission.admit(
+                    topology_name, config, payload.get("admission") or ADMIT_POLICY
+                )
+        except AdmissionError as e:
+            print(f"Topology '{topology_name}' not admitted: {e}")
+            return {"error": str(e), "topology": topology_name, "admission": e.report}
+        try:
+            project_id, nodes_status = _deploy_topology(
+                topology_name, config, gns3, concurrency, payload, timings,
+                golden=provisioning == "golden",
+            )
+        except ValueError as e:
+            admission.release(topology_name)
+            return {"error": str(e), "topology": topology_name}
+        except Exception:
+            admission.release(topology_name)
+            raise
+        _remember_deployment(topology_name, {
+            "fingerprint": fingerprint,
+            "project_id": project_id,
+            "nodes": nodes_status,
+            "deployed_at": time.time(),
+        })
+
+    timings["total"] = round(time.perf_counter() - t_total, 3)
+    unconfigured = [n["name"] for n in nodes_status
+                    if n.get("node_type") == "qemu" and not n.get("ip_address")]
+    if unconfigured:
+        print(f"[WARN] '{topology_name}' deployed without IP on {', '.join(unconfigured)}; "
+              "it will not be reused")
+    return {
+        "project_id": project_id,
+        "nodes": nodes_status,
+        "unconfigured": unconfigured,
+        "timings": timings,
+        "reused": False,
+        "fingerprint": fingerprint,
+        "provisioning": provisioning,
+        "admission": admitted,
+        "rest": gns3.stats(),
+    }
+
+
+@app.post("/golden")
+def bake_golden(payload: dict):
+    """Bake a golden image for ``provisioning="golden"`` deployments.
+
+    ``payload["image"]`` must be a dedicated *copy* of the base guest image
+    (e.g. ``arch3-golden.qcow2``): it is booted once through a non-linked
+    template, so the installed boot script and enabled sshd are written into
+    the image file itself.  The guest is then powered off and the temporary
+    project removed; deployments create linked clones of the baked image.
+    """
+    image = payload.get("image")
+    if not image:
+        return {"error": "image not provided"}
+
+    token = payload.get("token")
+    if not token:
+        return {"error": "token missing"}
+
+    gns3 = GNS3Client(GNS3_SERVER_URL, token)
+    timings: Dict[str, float] = {}
+    t_total = time.perf_counter()
+    timeout = float(payload.get("boot_timeout") or BOOT_TIMEOUT)
+
+    with _topology_lock("golden:bake"):
+        with _timed(timings, "project"):
+            project_id = _get_or_create_project("project_golden_bake", gns3)["project_id"]
+            _teardown_project(project_id, gns3, 1)
+        with _timed(timings, "templates"):
+            template_id = _get_or_create_qemu_template(
+                template_name=f"bake_{pathlib.Path(image).name}",
+                image=image,
+                ram=int(payload.get("ram") or 512),
+                platform=payload.get("platform"),
+                gns3=gns3,
+                cpus=VM_CPUS,
+                exact_image=True,
+                linked_clone=False,
+            )
+        node = _create_node_from_template(
+            project_id, template_id, x=0, y=0, name="golden", gns3=gns3
+        )
         try:
-            _set_ip_via_telnet("127.0.0.1", node["console"], cidr)
-            node["ip_address"] = ip
-            print(f"Configured {node['name']} → {ip}")
-        except Exception as e:
-            print(f"[WARN] could not configure IP on {node['name']}: {e}")
-    return {"project_id": project_id, "nodes": nodes_status}
\ No newline at end of file
+            with _timed(timings, "start"):
+                gns3.post(
+                    f"/v3/projects/{project_id}/nodes/{node['node_id']}/start"
+                ).raise_for_status()
+            with _timed(timings, "bake"):
+                asyncio.run(_bake_guest(project_id, node, gns3, timeout))
+        except (OSError, ConsoleError, requests.HTTPError) as e:
+            return {"error": f"bake failed: {e}", "image": image}
+        finally:
+            _teardown_project(project_id, gns3, 1, delete_project=True)
+
+    timings["total"] = round(time.perf_counter() - t_total, 3)
+    print(f"Golden image '{image}' baked in {timings['total']:.1f}s")
+    return {"golden_image": image, "timings": timings, "rest": gns3.stats()}
+
+
+@app.post("/teardown")
+def teardown_topology(payload: dict):
+    """Remove a deployed topology: stop and delete its nodes (and, with
+    ``payload["delete_project"]``, the whole project), verify that their QEMU
+    processes exited and forget the cache entry.
+
+    The response reports what was removed and the resources freed
+    (``freed``: VMs, configured RAM / vCPUs, resident memory of the QEMU
+    processes) plus the processes that had to be killed.
+    """
+    topology_name = payload.get("topology")
+    if not topology_name:
+        return {"error": "topology not provided"}
+
+    token = payload.get("token")
+    if not token:
+        return {"error": "token missing"}
+
+    concurrency = int(payload.get("concurrency") or DEPLOY_CONCURRENCY)
+    gns3 = GNS3Client(GNS3_SERVER_URL, token, pool_size=4 * concurrency)
+    timings: Dict[str, float] = {}
+    t_total = time.perf_counter()
+
+    with _topology_lock(topology_name):
+        entry = _deployments.get(topology_name)
+        project_id = entry["project_id"] if entry else _find_project_id(
+            f"project_{topology_name}", gns3
+        )
+        result: Dict[str, Any] = {"topology": topology_name, "project_id": project_id,
+                                  "nodes_deleted": 0, "project_deleted": False}
+        if project_id:
+            _open_project(project_id, gns3)
+            with _timed(timings, "teardown"):
+                result.update(_teardown_project(
+                    project_id, gns3, concurrency,
+                    delete_project=bool(payload.get("delete_project")),
+                    grace=float(payload.get("grace") or TEARDOWN_GRACE),
+                ))
+        _forget_deployment(topology_name)
+        admission.release(topology_name)
+    timings["total"] = round(time.perf_counter() - t_total, 3)
+    result["timings"] = timings
+    result["rest"] = gns3.stats()
+    return result
+
+
+@app.post("/cleanup")
+def cleanup(payload: dict):
+    """Tear down every cached deployment and, on request, kill orphaned QEMU
+    processes.
+
+    Orphans (``payload["kill_orphans"]``, default false) are QEMU processes
+    that GNS3 started for a project it knows about — a listed project or one
+    torn down here — but for a node that no longer exists in it.  If any
+    project's node listing fails, nothing is killed: the process may belong
+    to a node we just could not see.  Used by the experiment controller on
+    shutdown, so no VM outlives the experiments that needed it.
+    """
+    token = payload.get("token")
+    if not token:
+        return {"error": "token missing"}
+
+    t_total = time.perf_counter()
+    torn_down = {e["project_id"] for e in _deployments.values()}
+    reports = {
+        name: teardown_topology({**payload, "topology": name})
+        for name in list(_deployments)
+    }
+    result: Dict[str, Any] = {"deployments": reports, "orphans": []}
+    if payload.get("kill_orphans", False):
+        gns3 = GNS3Client(GNS3_SERVER_URL, token)
+        nodes_of: Dict[str, set] = {pid: set() for pid in torn_down}
+        listed = True
+        try:
+            for project in gns3.json("GET", "/v3/projects"):
+                resp = gns3.get(f"/v3/projects/{project['project_id']}/nodes")
+                if resp.status_code != 200:
+                    listed = False
+                    break
+                nodes_of[project["project_id"]] = {n["node_id"] for n in resp.json()}
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"[WARN] cannot list GNS3 projects: {e}")
+            listed = False
+        if not listed:
+            result["orphans_skipped"] = "GNS3 project listing failed"
+            print("Not killing orphaned QEMU processes: GNS3 project listing failed")
+        orphans = [
+            p for p in scan_qemu()
+            if listed and p.project_id in nodes_of and p.node_id not in nodes_of[p.project_id]
+        ]
+        if orphans:
+            result["orphans"] = [
+                {"pid": p.pid, "node_id": p.node_id, "name": p.name, "rss_mb": round(p.rss_kb / 1024, 1)}
+                for p in orphans
+            ]
+            result["processes"] = kill_processes(p.pid for p in orphans)
+            print(f"Killed {len(orphans)} orphaned QEMU processes: {result['processes']}")
+
+    freed = [r.get("freed", {}) for r in reports.values()]
+    result["freed"] = {
+        key: sum(f.get(key, 0) for f in freed) for key in ("vms", "ram_mb", "vcpus", "rss_mb")
+    }
+    result["freed"]["rss_mb"] = round(
+        result["freed"]["rss_mb"] + sum(o["rss_mb"] for o in result["orphans"]), 1
+    )
+    result["total"] = round(time.perf_counter() - t_total, 3)
+    return result
+
+
+@app.get("/admission")
+def admission_stats():
+    """Host capacity, the shared VM budget and the current reservations."""
+    return admission.stats()
+
+
+@app.get("/deployments")
+def list_deployments():
+    """Currently cached (deployed) topologies."""
+    return {
+        name: {
+            "project_id": e["project_id"],
+            "fingerprint": e["fingerprint"],
+            "deployed_at": e["deployed_at"],
+            "nodes": len(e["nodes"]),
+            "hosts": [n["ip_address"] for n in e["nodes"] if n.get("ip_address")],
+        }
+        for name, e in _deployments.items()
+    }
@@ -0,0 +1,147 @@
+"""
+gns3_vm_manager.processes
+Local scan of QEMU processes started by GNS3.
+
+GNS3 runs every QEMU node as ``qemu-system-* … -uuid <node_id> …`` from the
+node's working directory ``<project_id>/project-files/qemu/<node_id>`` (its
+disks live there too), so a node's process can be found in ``/proc`` by its
+node id.  Only processes whose cwd or command line contains that directory
+for their own ``-uuid`` count as GNS3's — libvirt or hand-started VMs also
+pass ``-uuid`` and must never be touched.  Teardown uses this to verify that
+stopped/deleted nodes really released their memory and to kill processes
+that GNS3 left behind (crashed server, interrupted teardown).
+
+On hosts without ``/proc`` (or when GNS3 runs on another machine) the scan
+simply finds nothing.
+"""
+
+import os
+import signal
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+
+@dataclass
+class QemuProcess:
+    pid: int
+    node_id: str
+    project_id: str
+    name: str          # value of -name (GNS3 node name)
+    rss_kb: int
+
+
+def _arg(argv: List[str], flag: str) -> Optional[str]:
+    try:
+        return argv[argv.index(flag) + 1]
+    except (ValueError, IndexError):
+        return None
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _gns3_project(pid: int, argv: List[str], node_id: str) -> Optional[str]:
+    """Project id if the process runs from GNS3's directory of *node_id*."""
+    node_dir = f"/project-files/qemu/{node_id}"
+    try:
+        paths = [os.readlink(f"/proc/{pid}/cwd")]
+    except OSError:
+        paths = []
+    paths += [a for arg in argv for a in arg.split(",") if node_dir in a]
+    for path in paths:
+        head, sep, _ = path.partition(node_dir)
+        if sep and os.path.basename(head):
+            return os.path.basename(head)
+    return None
+
+
+def scan_qemu(node_ids: Optional[Iterable[str]] = None) -> List[QemuProcess]:
+    """QEMU processes of GNS3 nodes (all of them, or only *node_ids*)."""
+    wanted = set(node_ids) if node_ids is not None else None
+    found = []
+    try:
+        pids = [int(p) for p in os.listdir("/proc") if p.isdigit()]
+    except OSError:
+        return found
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                argv = f.read().decode(errors="replace").split("\0")
+        except OSError:
+            continue  # exited meanwhile or not ours to read
+        if not argv or "qemu-system" not in os.path.basename(argv[0]):
+            continue
+        node_id = _arg(argv, "-uuid")
+        if node_id is None or (wanted is not None and node_id not in wanted):
+            continue
+        project_id = _gns3_project(pid, argv, node_id)
+        if project_id is None:
+            continue  # not started by GNS3
+        found.append(QemuProcess(pid, node_id, project_id, _arg(argv, "-name") or "",
+                                 _rss_kb(pid)))
+    return found
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    # an exited process that its parent has not reaped yet is gone for us
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except (OSError, IndexError):
+        return True
+
+
+def wait_exit(pids: Iterable[int], timeout: float, interval: float = 0.2) -> List[int]:
+    """Wait up to *timeout* seconds; returns the pids that are still alive."""
+    alive = [p for p in pids if _alive(p)]
+    deadline = time.monotonic() + timeout
+    while alive and time.monotonic() < deadline:
+        time.sleep(interval)
+        alive = [p for p in alive if _alive(p)]
+    return alive
+
+
+def kill(pids: Iterable[int], grace: float = 5.0) -> Dict[str, List[int]]:
+    """SIGTERM, then SIGKILL whatever survives *grace* seconds.
+
+    Returns ``{"terminated": [...], "killed": [...], "failed": [...]}``.
+    """
+    sent = []
+    failed = []
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+            sent.append(pid)
+        except ProcessLookupError:
+            continue
+        except PermissionError:
+            failed.append(pid)
+    stubborn = wait_exit(sent, grace)
+    for pid in stubborn:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            failed.append(pid)
+    still = wait_exit(stubborn, 2.0)
+    return {
+        "terminated": [p for p in sent if p not in stubborn],
+        "killed": [p for p in stubborn if p not in still],
+        "failed": failed + [p for p in still if p not in failed],
+    }
@@ -0,0 +1,122 @@
+"""
+gns3_vm_manager.provisioning
+Golden-image provisioning: guests that configure themselves at boot.
+
+The default ("console") provisioning logs into every freshly booted VM over
+its telnet console to bring the interface up, assign the IP and start sshd.
+In "golden" mode this work is done once, when the golden image is *baked*:
+
+* a small boot script is installed into the image together with a systemd
+  unit that runs it before sshd, and sshd is enabled;
+* the script derives the guest's IPv4 address from its MAC address – the
+  manager gives every node a locally administered MAC ``02:00:a:b:c:d`` that
+  encodes ``a.b.c.d`` (see :func:`mac_for_ip`).
+
+Deployments then create linked clones of the golden image, set each node's
+MAC through the GNS3 API and only wait for the guest's sshd port – there is
+no console session at all.  Once sshd answers, the guest reports its NICs
+(:data:`ADDRESS_REPORT`) and :func:`verify_guest_address` checks that the
+address sits on the NIC whose MAC encodes it – i.e. the guest that answered
+is the node we meant, not a neighbour with a clashing MAC.
+"""
+
+import ipaddress
+from typing import List
+
+MAC_PREFIX = "02:00"          # locally administered, unicast
+SCRIPT_PATH = "/usr/local/sbin/cluster-net-ip"
+UNIT_PATH = "/etc/systemd/system/cluster-net-ip.service"
+MODES = ("console", "golden")
+# guest command: one "<mac> [<ipv4>/<len> …]" line per NIC
+ADDRESS_REPORT = ("for d in /sys/class/net/*; do echo $(cat $d/address) "
+                  "$(ip -o -4 addr show dev ${d##*/} | awk '{print $4}'); done")
+
+
+def mac_for_ip(ip: str) -> str:
+    """``10.0.0.7`` → ``02:00:0a:00:00:07``."""
+    octets = ipaddress.IPv4Address(ip).packed
+    return MAC_PREFIX + "".join(f":{b:02x}" for b in octets)
+
+
+def ip_from_mac(mac: str) -> str:
+    """Inverse of :func:`mac_for_ip` (what the guest script computes)."""
+    parts = mac.lower().split(":")
+    if len(parts) != 6 or ":".join(parts[:2]) != MAC_PREFIX:
+        raise ValueError(f"{mac} does not encode an address")
+    return ".".join(str(int(p, 16)) for p in parts[2:])
+
+
+def verify_guest_address(report: str, ip: str) -> None:
+    """Check :data:`ADDRESS_REPORT` output of the guest reached at *ip*.
+
+    Raises ValueError unless *ip* is assigned to the NIC whose MAC encodes it.
+    """
+    assigned = {}
+    for line in report.splitlines():
+        fields = line.split()
+        if not fields or not fields[0].lower().startswith(MAC_PREFIX + ":"):
+            continue  # loopback, NICs without an encoded MAC, other output
+        assigned[ip_from_mac(fields[0])] = [a.split("/")[0] for a in fields[1:]]
+    if ip not in assigned:
+        raise ValueError(f"guest at {ip} has no NIC with MAC {mac_for_ip(ip)} "
+                         f"(MACs encode {sorted(assigned) or 'nothing'})")
+    if ip not in assigned[ip]:
+        raise ValueError(f"guest NIC {mac_for_ip(ip)} carries {assigned[ip] or 'no address'}, "
+                         f"not {ip}")
+
+
+def guest_script(prefix_len: int) -> List[str]:
+    """Boot script lines: assign the MAC-encoded address to every such NIC.
+
+    NICs may show up a little after the unit starts, so the script retries
+    for a few seconds until at least one matching interface was configured.
+    """
+    return [
+        "#!/bin/sh",
+        "# cluster_net: IPv4 address encoded in a 02:00:a:b:c:d MAC",
+        "for try in $(seq 20); do",
+        "  for dev in /sys/class/net/*; do",
+        "    mac=$(cat $dev/address)",
+        "    case $mac in 02:00:*) ;; *) continue ;; esac",
+        '    set -- $(echo $mac | tr : " ")',
+        "    ip link set ${dev##*/} up",
+        f"    ip addr replace $((0x$3)).$((0x$4)).$((0x$5)).$((0x$6))/{prefix_len} dev ${{dev##*/}}",
+        "    done=1",
+        "  done",
+        "  [ -n \"$done\" ] && exit 0",
+        "  sleep 0.5",
+        "done",
+        "exit 1",
+    ]
+
+
+GUEST_UNIT = [
+    "[Unit]",
+    "Description=cluster_net address from MAC",
+    "After=systemd-udev-trigger.service",
+    "Before=sshd.service",
+    "[Service]",
+    "Type=oneshot",
+    f"ExecStart={SCRIPT_PATH}",
+    "[Install]",
+    "WantedBy=multi-user.target",
+]
+
+
+def _write_file(path: str, lines: List[str]) -> str:
+    # printf over the console: no heredocs, one shell line per file
+    quoted = " ".join("'" + line + "'" for line in lines)
+    return f"printf '%s\\n' {quoted} > {path}"
+
+
+def bake_commands(prefix_len: int) -> List[str]:
+    """Console commands that turn a booted base guest into the golden state."""
+    return [
+        _write_file(SCRIPT_PATH, guest_script(prefix_len)),
+        f"chmod 755 {SCRIPT_PATH}",
+        _write_file(UNIT_PATH, GUEST_UNIT),
+        "ssh-keygen -A",
+        "systemctl daemon-reload",
+        "systemctl enable cluster-net-ip.service sshd",
+        "sync",
+    ]
@@ -0,0 +1,99 @@
+"""
+gns3_vm_manager.readiness
+Boot readiness detection for guest VMs.
+
+A node is *ready* once GNS3 reports it as ``started`` and its telnet console
+shows the login prompt.  Each node is watched independently, so a VM is
+configured as soon as it has booted instead of after a fixed global delay.
+Golden-image guests configure themselves; for them readiness is simply an
+open sshd port.
+"""
+
+import asyncio
+from typing import Callable, Optional
+
+from .console import ConsoleSession, ConsoleTimeout
+
+
+class NotReady(ConsoleTimeout):
+    """Raised when a node did not reach the expected state in time."""
+
+
+async def wait_node_started(
+    get_status: Callable[[], Optional[str]],
+    timeout: float,
+    interval: float = 0.5,
+    want: str = "started",
+) -> None:
+    """Poll the (blocking) *get_status* until it returns *want*."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        if await asyncio.to_thread(get_status) == want:
+            return
+        if loop.time() >= deadline:
+            raise NotReady(f"node not {want} within {timeout:.0f}s")
+        await asyncio.sleep(interval)
+
+
+async def connect_console(
+    host: str, port: int, timeout: float, name: str = ""
+) -> ConsoleSession:
+    """Open the console, retrying while QEMU does not accept connections yet."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        try:
+            return await ConsoleSession.open(host, port, timeout=5.0, name=name)
+        except (OSError, ConsoleTimeout):
+            if loop.time() >= deadline:
+                raise NotReady(f"console {host}:{port} unreachable") from None
+            await asyncio.sleep(0.5)
+
+
+async def login_when_ready(
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+    timeout: float,
+    command_timeout: float = 15.0,
+    name: str = "",
+) -> ConsoleSession:
+    """Wait for the guest's login prompt and log in.
+
+    Returns a logged-in session; the caller is responsible for closing it.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    session = await connect_console(host, port, timeout, name=name)
+    try:
+        await session.login(
+            user,
+            password,
+            timeout=command_timeout,
+            wait=max(1.0, deadline - loop.time()),
+        )
+    except ConsoleTimeout as e:
+        await session.close()
+        raise NotReady(str(e)) from None
+    except BaseException:
+        await session.close()
+        raise
+    return session
+
+
+async def wait_port_open(host: str, port: int, timeout: float, interval: float = 0.5) -> None:
+    """Wait until a TCP connection to *host*:*port* succeeds (e.g. guest sshd)."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), 5.0)
+        except (OSError, asyncio.TimeoutError):
+            if loop.time() >= deadline:
+                raise NotReady(f"{host}:{port} not reachable within {timeout:.0f}s") from None
+            await asyncio.sleep(interval)
+            continue
+        writer.close()
+        return
@@ -2,10 +2,11 @@ from PySide6.QtCore import QObject, Signal, QUrl, QTimer
 from PySide6.QtWebSockets import QWebSocket
 from PySide6.QtNetwork import QAbstractSocket
 from qasync import asyncSlot
-import requests, asyncio
+import requests, asyncio, json, html
 
 EXPCTL_REST = "http://localhost:8000"
 EXPCTL_WS   = "ws://localhost:8000/ws"
+TOPOLOGY_REST = "http://localhost:8001"
 
 
 class BackendController(QObject):
@@ -43,6 +44,20 @@ class BackendController(QObject):
         except Exception as e:
             self.status_msg.emit(f"<font color='red'>Ошибка запуска: {e}</font>")
 
+    async def list_topologies(self) -> list:
+        """Каталог топологий gns3_manager (имя + число хостов/коммутаторов/связей)."""
+        try:
+            r = await asyncio.to_thread(
+                requests.get, f"{TOPOLOGY_REST}/topologies", timeout=5
+            )
+            r.raise_for_status()
+            return r.json()
+        except Exception as e:
+            self.status_msg.emit(
+                f"<font color='red'>Каталог топологий недоступен: {e}</font>"
+            )
+            return []
+
     # ---------- INTERNAL ---------- #
     def _connect_ws(self, initial=False):
         """
@@ -53,8 +68,24 @@ class BackendController(QObject):
         self.ws.open(QUrl(EXPCTL_WS))
 
     def _on_ws_msg(self, text: str):
-        self.status_msg.emit(text)
-        if "завершён" in text and self._current_exp_id is not None:
+        """
+        Событие контроллера — JSON с полями type / exp_id / text (см.
+        experiment_controller/events.py).  Завершение эксперимента —
+        событие ``experiment`` со статусом completed или failed.
+        """
+        try:
+            event = json.loads(text)
+        except ValueError:
+            self.status_msg.emit(text)
+            return
+        if event.get("type") == "subscribed":
+            return
+        self.status_msg.emit(html.escape(event.get("text") or str(event)))
+        if (
+            event.get("type") == "experiment"
+            and event.get("status") in ("completed", "failed")
+            and event.get("exp_id") == self._current_exp_id
+        ):
             try:
                 r = requests.get(
                     f"{EXPCTL_REST}/experiments/{self._current_exp_id}/result",
@@ -7,7 +7,7 @@ from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QLabel, QComboBox,
     QPushButton, QTextEdit, QApplication, QMessageBox
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from qasync import asyncSlot
 from .controller import BackendController
 
@@ -27,6 +27,7 @@ class MainWindow(QMainWindow):
                                 alignment=Qt.AlignmentFlag.AlignLeft))
 
         self.combo_topology = QComboBox()
+        # до ответа gns3_manager — список по умолчанию
         self.combo_topology.addItems(["torus", "fat-tree", "thin-tree"])
         layout.addWidget(self.combo_topology)
 
@@ -59,6 +60,7 @@ class MainWindow(QMainWindow):
         self.btn_start.clicked.connect(self._on_start_clicked)
         self.ctrl.status_msg.connect(self._append_log)
         self.ctrl.experiment_done.connect(self._on_done)
+        QTimer.singleShot(0, self._load_topologies)
 
     # ---------- Слоты ---------- #
 
@@ -69,6 +71,25 @@ class MainWindow(QMainWindow):
         strategy = self.combo_strategy.currentText()
         await self.ctrl.run_experiment(topo, task_topo, strategy)
 
+    @asyncSlot()
+    async def _load_topologies(self):
+        """Заполняет выбор топологии из каталога gns3_manager."""
+        items = await self.ctrl.list_topologies()
+        if not items:
+            return
+        current = self.combo_topology.currentText()
+        self.combo_topology.clear()
+        for i, t in enumerate(items):
+            self.combo_topology.addItem(t["name"])
+            self.combo_topology.setItemData(
+                i,
+                f"хостов: {t['hosts']}, коммутаторов: {t['switches']}, связей: {t['links']}",
+                Qt.ItemDataRole.ToolTipRole,
+            )
+        idx = self.combo_topology.findText(current)
+        if idx >= 0:
+            self.combo_topology.setCurrentIndex(idx)
+
     def _append_log(self, html_text: str):
         self.text_log.append(html_text)
 
@@ -1,45 +1,158 @@
 """
 metrics_collector.main
-Мини-сервис: фиксирует t_start / t_end и отдаёт exec_time.
-Можно дополнять CPU/Net-метриками позже.
+Мини-сервис: фиксирует t_start / t_end (монотонные часы) и отдаёт exec_time, а пока
+эксперимент идёт — снимает с VM временные ряды CPU / памяти / сети
+(см. sampler.py) в кольцевые буферы с прореживанием и перцентилями.
+
+Хранится не более METRICS_KEEP завершённых экспериментов (старые
+вытесняются); забытые активные сборы останавливаются через
+METRICS_MAX_DURATION секунд.
 """
 
+import os
 import time, uuid
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
+from .ringbuffer import DEFAULT_PERCENTILES, summarize
+from .sampler import FIELDS, Collector
+
 app = FastAPI(title="Metrics Collector")
-active: dict[str, float] = {}   # id -> t_start
-done:   dict[str, float] = {}   # id -> exec_time
+
+METRICS_INTERVAL = float(os.environ.get("METRICS_INTERVAL", "1.0"))
+METRICS_CAPACITY = int(os.environ.get("METRICS_CAPACITY", "3600"))   # отсчётов на хост
+METRICS_KEEP = int(os.environ.get("METRICS_KEEP", "200"))
+METRICS_MAX_DURATION = float(os.environ.get("METRICS_MAX_DURATION", str(24 * 3600)))
+
+
+class Run:
+    def __init__(self, collector: Collector):
+        self.collector = collector
+        self.started_at = time.time()           # для отображения
+        self.t0_ns = time.perf_counter_ns()     # для замера (монотонные часы)
+        self.exec_time: float | None = None
+
+    def elapsed(self) -> float:
+        return (time.perf_counter_ns() - self.t0_ns) / 1e9
+
+
+active: Dict[str, Run] = {}                      # id -> идущий эксперимент
+done: "OrderedDict[str, Run]" = OrderedDict()    # id -> завершённый (LRU-ограничение)
 
 
 class StartReq(BaseModel):
     exp_id: int
+    hosts: List[str] = []          # VM, с которых снимать метрики
+    interval: float | None = None  # период опроса, с
 
 
 class EndReq(BaseModel):
     token: str
 
 
+def _finish(token: str) -> Run:
+    run = active.pop(token)
+    run.exec_time = run.elapsed()
+    run.collector.stop()
+    done[token] = run
+    while len(done) > METRICS_KEEP:
+        done.popitem(last=False)
+    return run
+
+
+def _reap_stale() -> None:
+    for token, run in list(active.items()):
+        if run.elapsed() > METRICS_MAX_DURATION:
+            _finish(token)
+
+
+def _percentiles(text: str | None) -> List[float]:
+    if not text:
+        return list(DEFAULT_PERCENTILES)
+    try:
+        values = [float(p) for p in text.split(",") if p.strip()]
+    except ValueError:
+        raise HTTPException(400, "percentiles must be comma-separated numbers")
+    if any(not 0 <= p <= 100 for p in values):
+        raise HTTPException(400, "percentiles must lie in 0..100")
+    return values
+
+
+def _summary(run: Run, percentiles: List[float]) -> dict:
+    buffers = run.collector.buffers
+    per_host = {h: b.aggregate(percentiles) for h, b in buffers.items()}
+    samples = [b.arrays()[1] for b in buffers.values() if len(b)]
+    cluster = summarize(np.concatenate(samples), FIELDS, percentiles) if samples else {}
+    return {"cluster": cluster, "hosts": per_host}
+
+
+def _lookup(token: str) -> Run:
+    run = active.get(token) or done.get(token)
+    if run is None:
+        raise HTTPException(404, "metrics not found")
+    return run
+
+
 @app.post("/start")
 def start(req: StartReq):
+    _reap_stale()
+    interval = req.interval or METRICS_INTERVAL
+    if interval <= 0:
+        raise HTTPException(400, "interval must be positive")
     token = str(uuid.uuid4())
-    active[token] = time.time()
+    collector = Collector(req.exp_id, req.hosts, interval, METRICS_CAPACITY)
+    active[token] = Run(collector)
+    collector.start()
     return {"token": token}
 
 
 @app.post("/finish")
 def finish(req: EndReq):
-    t0 = active.pop(req.token, None)
-    if t0 is None:
+    if req.token not in active:
         raise HTTPException(404, "unknown token")
-    exec_time = time.time() - t0
-    done[req.token] = exec_time
-    return {"exec_time": exec_time}
+    run = _finish(req.token)
+    return {
+        "exec_time": run.exec_time,
+        "summary": _summary(run, list(DEFAULT_PERCENTILES)),
+    }
 
 
 @app.get("/metrics/{token}")
-def get_metrics(token: str):
-    if token not in done:
-        raise HTTPException(404, "metrics not found")
-    return {"exec_time": done[token]}
+def get_metrics(token: str, percentiles: str | None = None):
+    """exec_time и сводка по каждому хосту и по кластеру целиком."""
+    run = _lookup(token)
+    c = run.collector
+    return {
+        "exp_id": c.exp_id,
+        "status": "running" if token in active else "finished",
+        "started_at": run.started_at,
+        "exec_time": run.exec_time,
+        "interval": c.interval,
+        "samples": {h: len(b) for h, b in c.buffers.items()},
+        "dropped": {h: b.dropped for h, b in c.buffers.items()},
+        "errors": c.errors,
+        "summary": _summary(run, _percentiles(percentiles)),
+    }
+
+
+@app.get("/metrics/{token}/series")
+def get_series(token: str, host: str | None = None, points: int = 200):
+    """Временной ряд, прореженный до ``points`` отсчётов на хост."""
+    c = _lookup(token).collector
+    if host is not None and host not in c.buffers:
+        raise HTTPException(404, "host not found")
+    hosts = [host] if host else c.hosts
+    series = {}
+    for h in hosts:
+        t, v = c.buffers[h].downsample(points)
+        entry = {"t": np.round(t, 3).tolist()}
+        for i, name in enumerate(FIELDS):
+            # NaN (пропуски) в JSON — null
+            col = v[:, i].astype(np.float64)
+            entry[name] = [None if np.isnan(x) else round(float(x), 3) for x in col]
+        series[h] = entry
+    return {"fields": list(FIELDS), "hosts": series}
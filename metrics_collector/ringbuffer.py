@@ -0,0 +1,100 @@
+"""
+metrics_collector.ringbuffer
+Кольцевой буфер временного ряда на массивах NumPy.
+
+Память выделяется один раз: метки времени — float64, значения — float32
+(по столбцу на метрику).  При переполнении перезаписываются самые старые
+отсчёты.  Поддерживаются прореживание (усреднение по корзинам) и сводные
+статистики (min / max / mean / перцентили).
+
+Пишет поток опроса, читают обработчики запросов: запись отсчёта и снимок
+окна делаются под блокировкой, чтобы читатель не увидел метки времени
+вразнобой со значениями.
+"""
+
+import threading
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0)
+
+
+class RingBuffer:
+    def __init__(self, fields: Sequence[str], capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self._t = np.empty(capacity, dtype=np.float64)
+        self._v = np.empty((capacity, len(self.fields)), dtype=np.float32)
+        self._next = 0
+        self._count = 0
+        self.total = 0          # сколько отсчётов добавлено за всё время
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def dropped(self) -> int:
+        """Сколько старых отсчётов перезаписано."""
+        with self._lock:
+            return self.total - self._count
+
+    def append(self, t: float, values: Sequence[float]) -> None:
+        with self._lock:
+            self._t[self._next] = t
+            self._v[self._next] = values
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self.total += 1
+
+    def arrays(self):
+        """(t, values) в хронологическом порядке (согласованные копии)."""
+        with self._lock:
+            if self._count < self.capacity:
+                return self._t[: self._count].copy(), self._v[: self._count].copy()
+            order = np.r_[self._next : self.capacity, 0 : self._next]
+            return self._t[order], self._v[order]
+
+    def downsample(self, points: int):
+        """Не более ``points`` отсчётов: среднее по равным корзинам."""
+        t, v = self.arrays()
+        n = len(t)
+        if points < 1 or n <= points:
+            return t, v
+        edges = np.linspace(0, n, points + 1).astype(np.int64)[:-1]
+        sizes = np.diff(np.r_[edges, n])
+        t_ds = np.add.reduceat(t, edges) / sizes
+        v_ds = np.add.reduceat(v.astype(np.float64), edges, axis=0) / sizes[:, None]
+        return t_ds, v_ds
+
+    def aggregate(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Dict[str, float]]:
+        return summarize(self.arrays()[1], self.fields, percentiles)
+
+
+def summarize(
+    values: np.ndarray,
+    fields: Sequence[str],
+    percentiles: Optional[Sequence[float]] = DEFAULT_PERCENTILES,
+) -> Dict[str, Dict[str, float]]:
+    """Статистика по каждому столбцу ``values`` (NaN — пропуски — не учитываются)."""
+    out: Dict[str, Dict[str, float]] = {}
+    percentiles = list(percentiles or [])
+    for i, name in enumerate(fields):
+        col = values[:, i].astype(np.float64) if len(values) else np.empty(0)
+        col = col[~np.isnan(col)]
+        if not col.size:
+            continue
+        stats = {
+            "min": float(col.min()),
+            "max": float(col.max()),
+            "mean": float(col.mean()),
+            "last": float(col[-1]),
+        }
+        if percentiles:
+            for p, q in zip(percentiles, np.percentile(col, percentiles)):
+                stats[f"p{p:g}"] = float(q)
+        out[name] = stats
+    return out
@@ -0,0 +1,123 @@
+"""
+metrics_collector.sampler
+Периодический сбор метрик VM во время эксперимента.
+
+Раз в ``interval`` секунд на каждой VM одной SSH-командой (через пул
+соединений experiment_controller.utils_ssh — без нового рукопожатия)
+читаются счётчики /proc: CPU, память, сеть, load average.  Счётчики
+переводятся в загрузку и скорости по разности с предыдущим отсчётом и
+складываются в кольцевой буфер хоста.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from experiment_controller.utils_ssh import exec_ssh
+
+from .ringbuffer import RingBuffer
+
+FIELDS = ("cpu_pct", "mem_used_pct", "rx_bps", "tx_bps", "load1")
+SAMPLE_CMD = (
+    "head -1 /proc/stat; grep -E '^(MemTotal|MemAvailable):' /proc/meminfo; "
+    "cat /proc/loadavg; tail -n +3 /proc/net/dev"
+)
+SAMPLE_TIMEOUT = 5.0
+SAMPLE_CONCURRENCY = 16
+
+
+def parse_proc(text: str) -> Dict[str, float]:
+    """Сырые счётчики из вывода SAMPLE_CMD."""
+    raw = {"rx": 0.0, "tx": 0.0}
+    for line in text.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "cpu":
+            ticks = [float(x) for x in parts[1:]]
+            raw["cpu_total"] = sum(ticks)
+            raw["cpu_idle"] = ticks[3] + (ticks[4] if len(ticks) > 4 else 0.0)  # idle + iowait
+        elif parts[0] == "MemTotal:":
+            raw["mem_total"] = float(parts[1])
+        elif parts[0] == "MemAvailable:":
+            raw["mem_avail"] = float(parts[1])
+        elif ":" in line and "/" not in parts[0]:
+            iface, _, counters = line.partition(":")
+            cols = counters.split()
+            if iface.strip() != "lo" and len(cols) >= 9:
+                raw["rx"] += float(cols[0])
+                raw["tx"] += float(cols[8])
+        elif len(parts) >= 4 and "/" in parts[3]:
+            raw["load1"] = float(parts[0])
+    return raw
+
+
+def to_row(prev: Dict[str, float], cur: Dict[str, float], dt: float) -> List[float]:
+    """Отсчёт (в порядке FIELDS) по двум последовательным чтениям счётчиков."""
+    nan = float("nan")
+    d_total = cur.get("cpu_total", 0.0) - prev.get("cpu_total", 0.0)
+    d_idle = cur.get("cpu_idle", 0.0) - prev.get("cpu_idle", 0.0)
+    cpu = 100.0 * (1.0 - d_idle / d_total) if d_total > 0 else nan
+    mem = (
+        100.0 * (1.0 - cur["mem_avail"] / cur["mem_total"])
+        if cur.get("mem_total") and "mem_avail" in cur else nan
+    )
+    rx = (cur["rx"] - prev["rx"]) / dt if dt > 0 and cur["rx"] >= prev["rx"] else nan
+    tx = (cur["tx"] - prev["tx"]) / dt if dt > 0 and cur["tx"] >= prev["tx"] else nan
+    return [cpu, mem, rx, tx, cur.get("load1", nan)]
+
+
+class Collector:
+    """Сбор метрик одного эксперимента в фоновом потоке."""
+
+    def __init__(self, exp_id: int, hosts: Sequence[str], interval: float, capacity: int):
+        self.exp_id = exp_id
+        self.hosts = list(dict.fromkeys(hosts))
+        self.interval = interval
+        self.buffers = {h: RingBuffer(FIELDS, capacity) for h in self.hosts}
+        self.errors: Dict[str, int] = {h: 0 for h in self.hosts}
+        self._prev: Dict[str, tuple] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.hosts:
+            self._thread = threading.Thread(
+                target=self._run, name=f"metrics-{self.exp_id}", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=SAMPLE_TIMEOUT + self.interval)
+        self._sample_all(None)          # последний отсчёт — состояние на момент финиша
+
+    def _sample(self, host: str) -> None:
+        try:
+            out, _ = exec_ssh(host, SAMPLE_CMD, timeout=SAMPLE_TIMEOUT)
+            cur = parse_proc(out)
+        except Exception:
+            self.errors[host] += 1
+            return
+        now = time.time()
+        mono = time.monotonic()
+        prev = self._prev.get(host)
+        self._prev[host] = (mono, cur)
+        if prev is not None:
+            self.buffers[host].append(now, to_row(prev[1], cur, mono - prev[0]))
+
+    def _sample_all(self, pool: Optional[ThreadPoolExecutor]) -> None:
+        if pool is None:
+            with ThreadPoolExecutor(max_workers=min(len(self.hosts), SAMPLE_CONCURRENCY) or 1) as p:
+                list(p.map(self._sample, self.hosts))
+        else:
+            list(pool.map(self._sample, self.hosts))
+
+    def _run(self) -> None:
+        with ThreadPoolExecutor(max_workers=min(len(self.hosts), SAMPLE_CONCURRENCY)) as pool:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                self._sample_all(pool)
+                self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,220 @@
+"""
+placement_engine.bench
+Офлайн-бенчмарк стратегий размещения — без развёртывания VM.
+
+Для каждой топологии кластера (файлы ``gns3_manager/topologies`` и
+синтетические кластеры заданных размеров, а также топологии генератора
+gns3_manager по именам ``--generate``) и каждого типа графа задачи
+(STAR / GRID / CUBE / TREE, как в GUI) прогоняются все стратегии;
+фиксируются hop-bytes, dilation, время расчёта отображения и время
+построения матрицы расстояний между хостами (``distance_ms``; с
+``--max-distance-ms`` превышение порога — код возврата 1).
+
+Запуск:
+    python -m placement_engine.bench --sizes 4,8,16,64,256 --output bench.json
+    python -m placement_engine.bench --generate fat-tree-k8,dragonfly-a4-p2-h2 --scale ''
+    python -m placement_engine.bench --generate fat-tree-k16 --scale '' --sizes 1024 \
+        --tasks GRID --strategies simple --repeat 1 --max-distance-ms 1000
+
+Результат — JSON (stdout или ``--output``), таблица — в stderr.
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from gns3_manager.generator import generate, parse_spec
+
+from .mapper import STRATEGIES, map_ranks, mapping_cost
+from .taskgraph import TASK_TOPOLOGIES, comm_matrix, task_edges
+from .topology import ClusterGraph, host_distances, parse_topology
+
+TOPOLOGY_DIR = Path(__file__).resolve().parent.parent / "gns3_manager" / "topologies"
+
+
+def synthetic_torus(hosts: int) -> ClusterGraph:
+    """Двумерный тор из VM, соединённых напрямую (как ``torus.json``)."""
+    cols = max(1, int(round(hosts ** 0.5)))
+    while hosts % cols:
+        cols -= 1
+    rows = hosts // cols
+    edges = set()
+    for i in range(hosts):
+        r, c = divmod(i, cols)
+        for j in (r * cols + (c + 1) % cols, ((r + 1) % rows) * cols + c):
+            if j != i:
+                edges.add((min(i, j), max(i, j)))
+    return _graph([f"vm{i}" for i in range(hosts)], ["qemu"] * hosts, sorted(edges))
+
+
+def synthetic_tree(hosts: int, radix: int = 8) -> ClusterGraph:
+    """Двухуровневое дерево: по ``radix`` VM на листовой коммутатор, листья — под ядром."""
+    leaves = (hosts + radix - 1) // radix
+    names = [f"vm{i}" for i in range(hosts)] + [f"leaf{i}" for i in range(leaves)] + ["core"]
+    kinds = ["qemu"] * hosts + ["ethernet_switch"] * (leaves + 1)
+    core = hosts + leaves
+    edges = [(i, hosts + i // radix) for i in range(hosts)]
+    edges += [(hosts + l, core) for l in range(leaves)]
+    return _graph(names, kinds, edges)
+
+
+def _graph(names: List[str], kinds: List[str], edges: Sequence[Tuple[int, int]]) -> ClusterGraph:
+    arr = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    return ClusterGraph(names=names, kinds=kinds, edges=arr,
+                        weights=np.ones(len(arr), dtype=np.float64))
+
+
+def load_clusters(
+    topology_dir: Path, scale: Sequence[int], specs: Sequence[str] = ()
+) -> Iterator[Tuple[str, ClusterGraph]]:
+    for path in sorted(topology_dir.glob("*.json")):
+        try:
+            graph = parse_topology(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            print(f"skip {path.name}: {e}", file=sys.stderr)
+            continue
+        if graph.hosts:
+            yield path.stem, graph
+    for n in scale:
+        yield f"synthetic-torus-{n}", synthetic_torus(n)
+        yield f"synthetic-tree-{n}", synthetic_tree(n)
+    for name in specs:
+        yield name, parse_topology(generate(*parse_spec(name)))
+
+
+def bench_case(
+    w: np.ndarray, d: np.ndarray, strategy: str, repeat: int, rng: random.Random
+) -> Dict[str, Any]:
+    """Стоимость и время одной стратегии; для random стоимость усредняется."""
+    times, costs = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        perm = map_ranks(strategy, w, d, rng)
+        times.append((time.perf_counter() - t0) * 1000)
+        costs.append(mapping_cost(w, d, perm))
+    row: Dict[str, Any] = {
+        key: statistics.fmean(c[key] for c in costs) for key in costs[0]
+    }
+    row["time_ms"] = statistics.median(times)
+    row["time_ms_min"] = min(times)
+    return row
+
+
+def run(
+    clusters: Sequence[Tuple[str, ClusterGraph]],
+    sizes: Sequence[int],
+    tasks: Sequence[str],
+    strategies: Sequence[str],
+    repeat: int,
+    seed: int,
+) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    results = []
+    for name, graph in clusters:
+        hosts = graph.hosts
+        t0 = time.perf_counter()
+        d = host_distances(graph, hosts)
+        distance_ms = (time.perf_counter() - t0) * 1000
+        for n in sorted({s for s in sizes if s <= len(hosts)} | {len(hosts)}):
+            for task in tasks:
+                w = comm_matrix(n, task_edges(task, n))
+                base = None
+                for strategy in strategies:
+                    row = {"cluster": name, "hosts": len(hosts), "task": task,
+                           "ranks": n, "strategy": strategy, "distance_ms": distance_ms}
+                    row.update(bench_case(w, d, strategy, repeat, rng))
+                    if strategy == "simple":
+                        base = row["hop_bytes"]
+                    if base:
+                        row["vs_simple"] = row["hop_bytes"] / base
+                    results.append(row)
+    return results
+
+
+def _table(results: List[Dict[str, Any]]) -> str:
+    head = f"{'cluster':<22}{'task':<6}{'ranks':>6}  {'strategy':<9}{'hop_bytes':>11}{'dil':>6}{'ms':>10}"
+    lines = [head, "-" * len(head)]
+    for r in results:
+        lines.append(
+            f"{r['cluster']:<22}{r['task']:<6}{r['ranks']:>6}  {r['strategy']:<9}"
+            f"{r['hop_bytes']:>11.1f}{r['dilation']:>6.1f}{r['time_ms']:>10.3f}"
+        )
+    return "\n".join(lines)
+
+
+def _csv_ints(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m placement_engine.bench",
+                                 description="Offline benchmark of placement strategies")
+    ap.add_argument("--topologies", type=Path, default=TOPOLOGY_DIR,
+                    help="directory with gns3_manager topology JSON files")
+    ap.add_argument("--sizes", type=_csv_ints, default=[4, 8, 16, 64, 256],
+                    help="rank counts to test (capped by the cluster's VM count)")
+    ap.add_argument("--scale", type=_csv_ints, default=[64, 256],
+                    help="VM counts of synthetic torus/tree clusters ('' to disable)")
+    ap.add_argument("--generate", default="",
+                    help="generated topologies, e.g. fat-tree-k8,torus-4x4x4,dragonfly-a4-p2-h2")
+    ap.add_argument("--tasks", default=",".join(TASK_TOPOLOGIES))
+    ap.add_argument("--strategies", default=",".join(STRATEGIES))
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--output", type=Path, help="write JSON here instead of stdout")
+    ap.add_argument("--max-distance-ms", type=float,
+                    help="fail (exit 1) if building a cluster's distance matrix takes longer")
+    args = ap.parse_args(argv)
+
+    strategies = [s.strip().lower() for s in args.strategies.split(",") if s.strip()]
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        ap.error(f"unknown strategy: {', '.join(sorted(unknown))}")
+    tasks = [t.strip().upper() for t in args.tasks.split(",") if t.strip()]
+    specs = [g.strip() for g in args.generate.split(",") if g.strip()]
+    bad = [g for g in specs if parse_spec(g) is None]
+    if bad:
+        ap.error(f"not a generator spec: {', '.join(bad)}")
+
+    try:
+        clusters = list(load_clusters(args.topologies, args.scale, specs))
+    except ValueError as e:
+        ap.error(str(e))
+    results = run(clusters, args.sizes, tasks, strategies, max(1, args.repeat), args.seed)
+    report = {
+        "meta": {
+            "created_at": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    print(_table(results), file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    if args.max_distance_ms is not None:
+        slow = sorted({(r["cluster"], round(r["distance_ms"], 1)) for r in results
+                       if r["distance_ms"] > args.max_distance_ms})
+        for cluster, ms in slow:
+            print(f"distance matrix of {cluster}: {ms} ms > {args.max_distance_ms} ms",
+                  file=sys.stderr)
+        if slow:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
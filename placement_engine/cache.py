@@ -0,0 +1,109 @@
+"""
+placement_engine.cache
+Кэш готовых отображений rank → host.
+
+Ключ — SHA-256 канонического JSON запроса (хосты, граф задачи, стратегия,
+ёмкости, seed) вместе с версией топологии кластера (ETag каталога или хэш
+переданного графа — оба считаются по содержимому), поэтому
+правка JSON-топологии автоматически делает старые записи недостижимыми.
+Вытеснение — LRU; при заданном файле кэш переживает перезапуск сервиса.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Сколько отображений держать в памяти и куда их сохранять (пусто — не сохранять)
+CACHE_SIZE = int(os.environ.get("PLACEMENT_CACHE_SIZE", "256"))
+CACHE_FILE = os.environ.get("PLACEMENT_CACHE_FILE", "")
+# Сколько матриц расстояний между хостами держать (по версии топологии и хостам)
+DISTANCE_CACHE_SIZE = int(os.environ.get("PLACEMENT_DISTANCE_CACHE_SIZE", "32"))
+
+
+def cache_key(request: Dict[str, Any], topology: Optional[Dict[str, Any]]) -> str:
+    """Канонический хэш запроса и описания топологии."""
+    canonical = json.dumps(
+        {"request": request, "topology": topology},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class MappingCache:
+    """Потокобезопасный LRU-кэш ответов ``/map`` с необязательной записью на диск."""
+
+    def __init__(self, capacity: int = CACHE_SIZE, path: str = CACHE_FILE):
+        self.capacity = max(0, capacity)
+        self.path = path
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.capacity:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+                self.evictions += 1
+            self._save()
+
+    def clear(self) -> int:
+        with self._lock:
+            dropped = len(self._items)
+            self._items.clear()
+            self._save()
+            return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._items),
+                "capacity": self.capacity,
+                "file": self.path or None,
+            }
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return
+        # файл хранит записи от старых к новым — порядок LRU сохраняется
+        for key, value in items[-self.capacity:] if self.capacity else []:
+            self._items[key] = value
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(list(self._items.items()), f)
+        os.replace(tmp, self.path)
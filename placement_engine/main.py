@@ -5,23 +5,55 @@ placement_engine.main
 Поддерживаемые стратегии:
 – simple   : выбор узлов по порядку
 – random   : случайное соответствие rank → host
-– optimal  : учитывает топологию кластера
-– advanced : использует оптимальное размещение и
-              корректирует его под топологию задачи
+– optimal  : жадное отображение графа задачи на граф кластера
+              (минимум hop-bytes по матрице расстояний между хостами;
+              связи с delay / bandwidth / loss весят больше одного хопа)
+– advanced : локальный поиск (обмены/переносы рангов) от жадного
+              решения и от порядка описания — лучшее из двух
+
+Граф кластера строится по JSON-топологии из gns3_manager (по имени
+``cluster_topology`` или переданной целиком в ``cluster_graph``), граф задачи —
+по ``task_graph.edges`` либо по типу ``task_topology`` (STAR/GRID/CUBE/TREE).
+Вместо топологии можно передать замеренную матрицу ``distance_matrix``
+(например, из experiment_controller/probe.py) — расстояния между ``nodes``
+в любых единицах; она нормируется так, что ближайшая пара — один хоп.
+
+Хост может принимать несколько рангов: ``slots`` — ёмкость хоста в рангах,
+``cores`` — число CPU в VM (по умолчанию равно ``slots``).  Ранги
+распределяются по слотам с учётом топологии; rankfile получает номер ядра
+в ``slot=``, hostfile — ``slots=N``.
+
+Готовые отображения кэшируются (LRU, см. ``cache.py``); статистика —
+``GET /cache/stats``.  Матрицы расстояний между хостами кэшируются отдельно —
+по ETag топологии (или хэшу переданного ``cluster_graph``) и списку хостов:
+новое отображение на той же топологии не ищет кратчайшие пути заново.  Стратегия random кэшируется только при заданном
+``seed`` — тогда её результат воспроизводим.
 """
 
-import random, json
+import random
+import time
+from typing import Any, Dict, List
+
+import numpy as np
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from typing import List
+
+from .cache import DISTANCE_CACHE_SIZE, MappingCache, cache_key
+from .mapper import STRATEGIES, expand_slots, map_ranks, mapping_cost
+from .taskgraph import comm_matrix, task_edges
+from .topology import (fetch_topology, host_distance_matrix, measured_distance_matrix,
+                       parse_topology, topology_etag)
 
 app = FastAPI(title="Placement Engine")
+mapping_cache = MappingCache()
+# матрицы хопов между хостами (ключ — версия топологии + хосты); на диск не пишутся
+distance_cache = MappingCache(DISTANCE_CACHE_SIZE, path="")
 
 
 class TaskGraph(BaseModel):
     processes: int                # N процессов
-    # edges не используются в простых стратегиях, но поле оставим
-    edges: List[List[int]] | None = None
+    # рёбра [u, v] или [u, v, объём]; без них граф строится по task_topology
+    edges: List[List[float]] | None = None
 
 
 class MapRequest(BaseModel):
@@ -29,61 +61,151 @@ class MapRequest(BaseModel):
     nodes: List[str]              # hostnames / IP
     strategy: str = "simple"      # simple|random|optimal|advanced
     cluster_topology: str | None = None
+    # граф кластера целиком (нормализованный формат gns3_manager, например из
+    # генератора) — вместо загрузки cluster_topology по имени
+    cluster_graph: Dict[str, Any] | None = None
     task_topology: str | None = None
-
-
-def _optimal_order(hosts: List[str], topology: str | None) -> List[str]:
-    """Return hosts ordered with basic cluster topology awareness."""
-    if topology in {"fat-tree", "thin-tree"}:
-        return sorted(hosts)
-    if topology == "torus":
-        return hosts  # already near-optimal for toy example
-    return hosts
-
-
-def _advanced_order(
-    hosts: List[str], cluster_topology: str | None, task_topology: str | None
-) -> List[str]:
-    hosts = list(_optimal_order(hosts, cluster_topology))
-    if task_topology == "GRID":
-        return hosts[::-1]
-    if task_topology == "CUBE":
-        mid = len(hosts) // 2
-        return hosts[mid:] + hosts[:mid]
-    return hosts
+    node_names: List[str] | None = None   # имя узла GNS3 для каждого из nodes
+    slots: int | List[int] | None = None  # ёмкость хоста (рангов): одна на всех или по хостам
+    cores: int | List[int] | None = None  # CPU в VM; по умолчанию = slots
+    seed: int | None = None               # для воспроизводимой стратегии random
+    # замеренные расстояния между nodes (N×N) — вместо графа кластера
+    distance_matrix: List[List[float]] | None = None
+
+
+def _per_host(value: int | List[int] | None, n_hosts: int, default: List[int], field: str) -> List[int]:
+    if value is None:
+        return default
+    if isinstance(value, int):
+        values = [value] * n_hosts
+    else:
+        values = list(value)
+    if len(values) != n_hosts or any(v < 1 for v in values):
+        raise HTTPException(400, f"{field} must be a positive int or one per host")
+    return values
+
+
+def _topology_id(data: MapRequest, config: Dict[str, Any] | None) -> str | None:
+    """Версия графа кластера: ETag из каталога gns3_manager или хэш
+    переданного целиком ``cluster_graph``."""
+    if config is None:
+        return None
+    if data.cluster_graph is None and data.cluster_topology:
+        etag = topology_etag(data.cluster_topology)
+        if etag:
+            return etag
+    return cache_key({}, config)
+
+
+def _distance_matrix(
+    data: MapRequest, hosts: List[str], config: Dict[str, Any] | None,
+    topology_id: str | None = None,
+) -> np.ndarray:
+    """Хопы между хостами (взвешенные характеристиками связей) или замеренная
+    матрица; без топологии кластера — все хосты равноудалены."""
+    if data.distance_matrix is not None:
+        try:
+            return measured_distance_matrix(data.distance_matrix, len(hosts))
+        except ValueError as e:
+            raise HTTPException(400, f"distance_matrix: {e}")
+    if config is not None:
+        key = cache_key({"hosts": hosts, "names": data.node_names}, {"id": topology_id})
+        d = distance_cache.get(key) if topology_id else None
+        if d is not None:
+            return d
+        try:
+            graph = parse_topology(config)
+        except ValueError as e:
+            raise HTTPException(400, f"cluster topology: {e}")
+        try:
+            d = host_distance_matrix(graph, hosts, data.node_names)
+        except ValueError:
+            pass                  # в топологии меньше VM, чем хостов
+        else:
+            d.flags.writeable = False    # общая для запросов из кэша
+            if topology_id:
+                distance_cache.put(key, d)
+            return d
+    d = np.ones((len(hosts), len(hosts)))
+    np.fill_diagonal(d, 0.0)
+    return d
+
+
+def _core_spec(slot: int, capacity: int, cores: int) -> str:
+    """Значение ``slot=`` в rankfile: своё ядро, если рангов не больше ядер,
+    иначе (переподписка) — все ядра VM."""
+    if capacity <= cores:
+        return str(slot)
+    return "0" if cores == 1 else f"0-{cores - 1}"
 
 
 def make_mapping(data: MapRequest):
     n_proc = data.task_graph.processes
     hosts = list(data.nodes)
 
-    if n_proc > len(hosts):
-        raise HTTPException(400, f"need ≥ {n_proc} hosts, given {len(hosts)}")
+    capacity = _per_host(data.slots, len(hosts), [1] * len(hosts), "slots")
+    cores = _per_host(data.cores, len(hosts), capacity, "cores")
+    if n_proc > sum(capacity):
+        raise HTTPException(400, f"need ≥ {n_proc} slots, given {sum(capacity)} on {len(hosts)} hosts")
 
     strat = data.strategy.lower()
-
-    if strat == "simple":
-        pass
-    elif strat == "random":
-        random.shuffle(hosts)
-    elif strat == "optimal":
-        hosts = _optimal_order(hosts, data.cluster_topology)
-    elif strat == "advanced":
-        hosts = _advanced_order(hosts, data.cluster_topology, data.task_topology)
-    else:
+    if strat not in STRATEGIES:
         raise HTTPException(400, "unknown strategy")
 
-    mapping = {rank: hosts[rank] for rank in range(n_proc)}
+    config = data.cluster_graph
+    if config is None and data.cluster_topology and data.distance_matrix is None:
+        config = fetch_topology(data.cluster_topology)
+    topology_id = _topology_id(data, config)
+    cacheable = strat != "random" or data.seed is not None
+    if cacheable:
+        key = cache_key({**data.model_dump(exclude={"cluster_graph"}), "strategy": strat},
+                        {"id": topology_id})
+        cached = mapping_cache.get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+    edges = data.task_graph.edges
+    if edges is None:
+        edges = task_edges(data.task_topology, n_proc)
+    try:
+        w = comm_matrix(n_proc, edges)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    t0 = time.perf_counter()
+    d = _distance_matrix(data, hosts, config, topology_id)
+    distance_time = time.perf_counter() - t0
+    d_slots, host_of, slot_of = expand_slots(d, capacity)
+
+    t0 = time.perf_counter()
+    rng = random.Random(data.seed) if data.seed is not None else None
+    perm = map_ranks(strat, w, d_slots, rng)
+    elapsed = time.perf_counter() - t0
+
+    mapping, slots = {}, {}
+    for rank in range(n_proc):
+        h, k = int(host_of[perm[rank]]), int(slot_of[perm[rank]])
+        mapping[rank] = hosts[h]
+        slots[rank] = _core_spec(k, capacity[h], cores[h])
 
     # генерируем rankfile (OpenMPI) в виде текста
-    rankfile_lines = [f"rank {r}={h} slot=0" for r, h in mapping.items()]
+    rankfile_lines = [f"rank {r}={h} slot={slots[r]}" for r, h in mapping.items()]
     rankfile_txt   = "\n".join(rankfile_lines)
 
-    return {
+    used = sorted({int(host_of[p]) for p in perm})
+    result = {
         "mapping": mapping,        # rank -> host
+        "slots": slots,            # rank -> ядро(а) на хосте
         "rankfile": rankfile_txt,  # для записи на диск
-        "hostfile": "\n".join(hosts[:n_proc])
+        "hostfile": "\n".join(f"{hosts[h]} slots={capacity[h]}" for h in used),
+        "oversubscribed": any(capacity[h] > cores[h] for h in used),
+        "cost": mapping_cost(w, d_slots, perm),
+        "mapping_time_ms": round(elapsed * 1000, 3),
+        "distance_time_ms": round(distance_time * 1000, 3),
     }
+    if cacheable:
+        mapping_cache.put(key, result)
+    return {**result, "cached": False}
 
 
 @app.post("/map")
@@ -91,3 +213,15 @@ def map_endpoint(req: MapRequest):
     """Calculate process-to-host mapping and auxiliary files."""
     return make_mapping(req)
 
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters and occupancy of the mapping and distance caches."""
+    return {**mapping_cache.stats(), "distances": distance_cache.stats()}
+
+
+@app.delete("/cache")
+def cache_clear():
+    """Drop every cached mapping (in memory and on disk) and distance matrix."""
+    distance_cache.clear()
+    return {"cleared": mapping_cache.clear()}
@@ -0,0 +1,176 @@
+"""
+placement_engine.mapper
+Топологически-осведомлённое отображение рангов на хосты.
+
+Минимизируется коммуникационная стоимость (hop-bytes)
+
+    C(π) = Σ_{i<j} W[i, j] · D[π(i), π(j)],
+
+где W — матрица объёмов обмена графа задачи, D — матрица расстояний
+между хостами.  Начальное решение строится жадно, затем улучшается
+локальным поиском (обмен двух рангов / перенос ранга на свободный хост).
+Все шаги векторизованы в NumPy и поддерживают состояние инкрементально:
+одна итерация — O(n·m) операций для n рангов и m хостов.
+
+Многослотовые хосты разворачиваются в отдельные слоты (``expand_slots``),
+и те же алгоритмы упаковывают сильно связанные ранги на один хост.
+"""
+
+import random
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+STRATEGIES = ("simple", "random", "optimal", "advanced")
+
+
+def greedy_map(w: np.ndarray, d: np.ndarray) -> np.ndarray:
+    """
+    Жадное построение: первым ставится самый «общительный» ранг на самый
+    центральный хост, далее — ранг, сильнее всего связанный с уже
+    размещёнными, на свободный хост с минимальной добавочной стоимостью.
+
+    Возвращает π: массив длины n с индексами хостов.
+    """
+    n, m = len(w), len(d)
+    if n > m:
+        raise ValueError(f"need ≥ {n} hosts, given {m}")
+    perm = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return perm
+    placed = np.zeros(n, dtype=bool)
+    used = np.zeros(m, dtype=bool)
+    conn = np.zeros(n)                     # связь каждого ранга с размещёнными
+    spread = np.zeros(m)                   # Σ расстояний до занятых хостов
+    volume = w.sum(axis=1)
+
+    for step in range(n):
+        if step == 0:
+            r = int(np.argmax(volume))
+            cost = d.sum(axis=1)           # самый центральный хост
+        else:
+            # сильнее всего связан с размещёнными; при равенстве — больший объём
+            score = np.where(placed, -np.inf, conn + 1e-9 * volume)
+            r = int(np.argmax(score))
+            # cost[h] = Σ_{k размещён} W[r, k] · D[h, π(k)] — одно умножение D на вектор;
+            # без связей с размещёнными держим ранг компактно рядом с ними
+            x = np.zeros(m)
+            x[perm[placed]] = w[r, placed]
+            cost = d @ x + 1e-6 * spread
+        cost[used] = np.inf
+        h = int(np.argmin(cost))
+
+        perm[r] = h
+        placed[r] = True
+        used[h] = True
+        conn += w[:, r]
+        spread += d[:, h]
+    return perm
+
+
+def local_search(
+    w: np.ndarray,
+    d: np.ndarray,
+    perm: np.ndarray,
+    max_iters: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Улучшение «лучший шаг»: на каждой итерации среди всех обменов пар
+    рангов и переносов ранга на свободный хост выбирается шаг с
+    наибольшим выигрышем; останов — когда выигрышных шагов нет.
+
+    H[a, h] = Σ_k W[a, k] · D[π(k), h] поддерживается ранг-1 обновлениями:
+      Δ_swap(a, b) = H[a,π(b)] + H[b,π(a)] − H[a,π(a)] − H[b,π(b)] + 2·W[a,b]·D[π(a),π(b)]
+      Δ_move(a, h) = H[a, h] − H[a, π(a)]
+    """
+    n, m = len(w), len(d)
+    perm = perm.copy()
+    if n < 2 or not w.any():
+        return perm
+    if max_iters is None:
+        max_iters = 4 * n
+    h_mat = w @ d[perm, :]                         # (n, m)
+    used = np.zeros(m, dtype=bool)
+    used[perm] = True
+    rows = np.arange(n)
+
+    for _ in range(max_iters):
+        g = h_mat[:, perm]                         # G[a, b] = H[a, π(b)]
+        own = g[rows, rows]                        # H[a, π(a)]
+        dp = d[np.ix_(perm, perm)]
+        swap = g + g.T - own[:, None] - own[None, :] + 2.0 * w * dp
+        a, b = np.unravel_index(int(np.argmin(swap)), swap.shape)
+        best_swap = swap[a, b]
+
+        best_move = 0.0
+        if not used.all():
+            move = h_mat[:, ~used] - own[:, None]
+            ma, mh = np.unravel_index(int(np.argmin(move)), move.shape)
+            best_move = move[ma, mh]
+            mh = int(np.flatnonzero(~used)[mh])
+
+        if min(best_swap, best_move) >= -1e-9:
+            break
+        if best_swap <= best_move:
+            p, q = perm[a], perm[b]
+            h_mat += np.outer(w[:, a] - w[:, b], d[q] - d[p])
+            perm[a], perm[b] = q, p
+        else:
+            p = perm[ma]
+            h_mat += np.outer(w[:, ma], d[mh] - d[p])
+            perm[ma] = mh
+            used[p], used[mh] = False, True
+    return perm
+
+
+def mapping_cost(w: np.ndarray, d: np.ndarray, perm: np.ndarray) -> Dict[str, float]:
+    """Метрики отображения: hop_bytes (целевая функция), dilation (самое
+    длинное ребро задачи в хопах) и средняя длина ребра."""
+    iu, ju = np.nonzero(np.triu(w, 1))
+    if len(iu) == 0:
+        return {"hop_bytes": 0.0, "dilation": 0.0, "avg_dilation": 0.0}
+    dist = d[perm[iu], perm[ju]]
+    return {
+        "hop_bytes": float(np.dot(w[iu, ju], dist)),
+        "dilation": float(dist.max()),
+        "avg_dilation": float(dist.mean()),
+    }
+
+
+def expand_slots(d: np.ndarray, capacity: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Матрица расстояний между слотами: хост h даёт ``capacity[h]`` слотов,
+    слоты одного хоста находятся на расстоянии 0 (обмен через общую память).
+
+    Возвращает (D_slots, хост каждого слота, номер слота внутри хоста);
+    слоты идут блоками по хостам — порядок simple заполняет хост целиком.
+    """
+    cap = np.asarray(capacity, dtype=np.int64)
+    if len(cap) != len(d) or (cap < 0).any():
+        raise ValueError("capacity must give a non-negative slot count per host")
+    host_of = np.repeat(np.arange(len(cap)), cap)
+    starts = np.cumsum(cap) - cap
+    slot_of = np.arange(len(host_of)) - np.repeat(starts, cap)
+    return d[np.ix_(host_of, host_of)], host_of, slot_of
+
+
+def map_ranks(
+    strategy: str, w: np.ndarray, d: np.ndarray, rng: Optional[random.Random] = None
+) -> np.ndarray:
+    """π по имени стратегии (см. ``STRATEGIES``)."""
+    n, m = len(w), len(d)
+    if n > m:
+        raise ValueError(f"need ≥ {n} hosts, given {m}")
+    if strategy == "simple":
+        return np.arange(n)
+    if strategy == "random":
+        return np.asarray((rng or random).sample(range(m), n), dtype=np.int64)
+    if strategy == "optimal":
+        return greedy_map(w, d)
+    if strategy == "advanced":
+        # два старта: жадный и порядок описания (он бывает уже хорош, если
+        # нумерация хостов повторяет структуру графа задачи); берём лучший
+        starts = (greedy_map(w, d), np.arange(n))
+        return min((local_search(w, d, p) for p in starts),
+                   key=lambda p: mapping_cost(w, d, p)["hop_bytes"])
+    raise ValueError("unknown strategy")
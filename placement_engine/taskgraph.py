@@ -0,0 +1,82 @@
+"""
+placement_engine.taskgraph
+Графы взаимодействия MPI-процессов.
+
+Если в запросе нет явных ``edges``, граф строится по типу топологии
+задачи, выбранному в GUI (STAR / GRID / CUBE / TREE).
+"""
+
+import math
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+TASK_TOPOLOGIES = ("STAR", "GRID", "CUBE", "TREE")
+
+
+def star_edges(n: int) -> List[List[int]]:
+    return [[0, i] for i in range(1, n)]
+
+
+def grid_edges(n: int) -> List[List[int]]:
+    """Двумерная решётка, близкая к квадратной (последний ряд может быть неполным)."""
+    cols = math.isqrt(n - 1) + 1 if n > 1 else 1       # ceil(sqrt(n))
+    edges = []
+    for i in range(n):
+        c = i % cols
+        if c + 1 < cols and i + 1 < n:
+            edges.append([i, i + 1])
+        if i + cols < n:
+            edges.append([i, i + cols])
+    return edges
+
+
+def cube_edges(n: int) -> List[List[int]]:
+    """Гиперкуб; при n не степени двойки — его индуцированный подграф."""
+    edges = []
+    for i in range(n):
+        bit = 1
+        while bit < n:
+            j = i ^ bit
+            if i < j < n:
+                edges.append([i, j])
+            bit <<= 1
+    return edges
+
+
+def tree_edges(n: int) -> List[List[int]]:
+    """Двоичное дерево: родитель ранга i — (i - 1) // 2."""
+    return [[(i - 1) // 2, i] for i in range(1, n)]
+
+
+_GENERATORS = {
+    "STAR": star_edges,
+    "GRID": grid_edges,
+    "CUBE": cube_edges,
+    "TREE": tree_edges,
+}
+
+
+def task_edges(task_topology: Optional[str], n: int) -> List[List[int]]:
+    """Рёбра графа задачи заданного типа (пустой список для неизвестного)."""
+    gen = _GENERATORS.get((task_topology or "").upper())
+    return gen(n) if gen and n > 1 else []
+
+
+def comm_matrix(n: int, edges: Sequence[Sequence[float]]) -> np.ndarray:
+    """Симметричная матрица объёмов обмена n×n.
+
+    Ребро — ``[u, v]`` (вес 1) или ``[u, v, w]``; повторные рёбра суммируются.
+    """
+    w = np.zeros((n, n), dtype=np.float64)
+    if not edges:
+        return w
+    arr = np.asarray([list(e) + [1.0] * (3 - len(e)) for e in edges], dtype=np.float64)
+    u = arr[:, 0].astype(np.int64)
+    v = arr[:, 1].astype(np.int64)
+    if (u < 0).any() or (v < 0).any() or (u >= n).any() or (v >= n).any():
+        raise ValueError(f"task graph edge refers to a rank outside 0..{n - 1}")
+    keep = u != v
+    np.add.at(w, (u[keep], v[keep]), arr[keep, 2])
+    np.add.at(w, (v[keep], u[keep]), arr[keep, 2])
+    return w
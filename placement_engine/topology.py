@@ -0,0 +1,282 @@
+"""
+placement_engine.topology
+Граф кластера из JSON-описания топологии gns3_manager и матрица
+расстояний между хостами.
+
+Расстояние измеряется в хопах: связь без характеристик стоит 1.  Связь
+с задержкой / джиттером / полосой / потерями (см. gns3_manager/links.py)
+стоит дороже — во столько раз, во сколько дольше по ней идёт сообщение
+REF_MESSAGE_KB (задержка + передача, с повторами при потерях), чем по
+связи по умолчанию (HOP_LATENCY_MS, REF_BANDWIDTH).
+
+Замеренную матрицу (например, задержек между VM) ``measured_distance_matrix``
+приводит к тем же единицам: ближайшая пара хостов — один хоп.
+
+Поддерживаются оба формата файлов из ``gns3_manager/topologies``:
+упрощённый (``nodes``/``links`` с ``endpoints``) и экспорт GNS3
+(``topology.nodes`` / ``topology.links[].nodes``).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+
+from gns3_manager.links import link_attrs
+
+TOPOLOGY_URL = "http://localhost:8001/topologies"
+HOP_LATENCY_MS = 0.1      # задержка одной связи без характеристик
+REF_BANDWIDTH = 1000.0    # Мбит/с — полоса связи без bandwidth
+REF_MESSAGE_KB = 64       # размер сообщения, по которому сравниваются связи
+
+
+@dataclass
+class ClusterGraph:
+    names: List[str]                 # имя каждой вершины (узел GNS3)
+    kinds: List[str]                 # тип вершины: qemu / ethernet_switch / …
+    edges: np.ndarray                # (E, 2) индексы вершин
+    weights: np.ndarray              # (E,) стоимость прохода по связи
+
+    @property
+    def hosts(self) -> List[int]:
+        """Индексы вершин-хостов (VM) в порядке описания топологии."""
+        return [i for i, k in enumerate(self.kinds) if k == "qemu"]
+
+
+def link_cost(attrs: Dict[str, float]) -> float:
+    """Вес связи в хопах по её характеристикам (1.0 — связь по умолчанию)."""
+    def seconds(latency_ms: float, bandwidth: float, loss: float) -> float:
+        transfer_ms = REF_MESSAGE_KB * 8 / bandwidth        # кбит / (Мбит/с) = мс
+        return (latency_ms + transfer_ms) / (1 - min(loss, 99.0) / 100)
+
+    base = seconds(HOP_LATENCY_MS, REF_BANDWIDTH, 0.0)
+    return seconds(
+        HOP_LATENCY_MS + attrs.get("delay", 0.0) + attrs.get("jitter", 0.0),
+        attrs.get("bandwidth", REF_BANDWIDTH),
+        attrs.get("loss", 0.0),
+    ) / base
+
+
+def parse_topology(config: Dict[str, Any]) -> ClusterGraph:
+    """Строит граф кластера по JSON-описанию (любой из двух форматов).
+    Недопустимые характеристики связей — ValueError."""
+    if "topology" in config:
+        topo = config["topology"]
+        raw_nodes = [
+            (n.get("node_id") or n.get("name"), n.get("name"), n.get("node_type") or n.get("type"))
+            for n in topo.get("nodes", [])
+        ]
+        raw_links = [
+            ([ep.get("node_id") for ep in link.get("nodes", [])], link_attrs(link))
+            for link in topo.get("links", [])
+        ]
+    else:
+        raw_nodes = [
+            (n.get("id") or n.get("name"), n.get("name"), n.get("type") or n.get("node_type"))
+            for n in config.get("nodes", [])
+        ]
+        raw_links = []
+        for link in config.get("links", []):
+            eps = []
+            for ep in link.get("endpoints", []):
+                eps.append(ep if isinstance(ep, str) else ep.get("node") or ep.get("name") or ep.get("id"))
+            raw_links.append((eps, link_attrs(link)))
+
+    index: Dict[str, int] = {}
+    names, kinds = [], []
+    for node_id, name, kind in raw_nodes:
+        idx = len(names)
+        names.append(name or node_id)
+        kinds.append(kind or "qemu")
+        # на узел можно сослаться и по id, и по имени
+        index[node_id] = idx
+        if name:
+            index.setdefault(name, idx)
+
+    edges, weights = [], []
+    for eps, attrs in raw_links:
+        ids = [index[e] for e in eps if e in index]
+        if len(ids) >= 2 and ids[0] != ids[1]:
+            edges.append(ids[:2])
+            weights.append(link_cost(attrs) if attrs else 1.0)
+    edge_arr = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    return ClusterGraph(
+        names=names,
+        kinds=kinds,
+        edges=edge_arr,
+        weights=np.asarray(weights, dtype=np.float64),
+    )
+
+
+# имя -> (ETag, описание): повторный запрос неизменённой топологии — 304 без тела
+_fetched: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+
+def fetch_topology(name: str, timeout: float = 5.0) -> Optional[Dict[str, Any]]:
+    """Нормализованное JSON-описание топологии из gns3_manager (None, если недоступно).
+
+    Возвращаемый словарь общий для всех вызовов — не изменять.
+    """
+    cached = _fetched.get(name)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    try:
+        resp = requests.get(f"{TOPOLOGY_URL}/{name}", params={"format": "normalized"},
+                            headers=headers, timeout=timeout)
+    except requests.RequestException:
+        return None
+    if resp.status_code == 304 and cached:
+        return cached[1]
+    if resp.status_code != 200:
+        _fetched.pop(name, None)
+        return None
+    config = resp.json()
+    if resp.headers.get("ETag"):
+        _fetched[name] = (resp.headers["ETag"], config)
+    return config
+
+
+def topology_etag(name: str) -> Optional[str]:
+    """ETag последнего описания ``name``, полученного ``fetch_topology``."""
+    cached = _fetched.get(name)
+    return cached[0] if cached else None
+
+
+def _shortest_from(graph: ClusterGraph, sources: np.ndarray) -> np.ndarray:
+    """Кратчайшие расстояния от вершин ``sources`` до всех вершин, (S, V).
+
+    Беллман–Форд, векторизованный по источникам: шаг релаксирует все рёбра
+    для всех источников сразу — по одному сдвигу NumPy на каждую позицию в
+    списках соседей (их не больше максимальной степени вершины).  Шагов —
+    столько, сколько связей на самом длинном кратчайшем пути (диаметр сети,
+    а не число вершин).
+    """
+    n = len(graph.names)
+    dist = np.full((n + 1, len(sources)), np.inf)   # строка n — «нет соседа»
+    dist[sources, np.arange(len(sources))] = 0.0
+    if not len(graph.edges):
+        return dist[:n].T
+    u, v = graph.edges[:, 0], graph.edges[:, 1]
+    src, dst = np.concatenate([u, v]), np.concatenate([v, u])
+    w = np.concatenate([graph.weights, graph.weights])
+    order = np.argsort(dst, kind="stable")
+    src, dst, w = src[order], dst[order], w[order]
+    # списки соседей каждой вершины, дополненные до максимальной степени
+    degree = np.bincount(dst, minlength=n)
+    pos = np.arange(len(dst)) - np.repeat(np.cumsum(degree) - degree, degree)
+    nbr = np.full((n, degree.max()), n)
+    nbr_w = np.full((n, degree.max()), np.inf)
+    nbr[dst, pos], nbr_w[dst, pos] = src, w
+    for _ in range(n):
+        best = dist[:n].copy()
+        for k in range(nbr.shape[1]):
+            np.minimum(best, dist[nbr[:, k]] + nbr_w[:, k, None], out=best)
+        if np.array_equal(best, dist[:n]):
+            break
+        dist[:n] = best
+    return dist[:n].T
+
+
+def _attachments(graph: ClusterGraph, vertices: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Для каждой вершины — откуда считать пути и сколько к ним прибавить.
+
+    Хост с единственным соседом (VM за коммутатором) выходит в сеть только
+    через него: его расстояния — вес связи + расстояния соседа.  Так
+    кратчайшие пути считаются от коммутаторов доступа (их в разы меньше,
+    чем VM), остальные хосты — сами по себе.
+    """
+    neighbours: Dict[int, Dict[int, float]] = {int(i): {} for i in vertices}
+    for (a, b), w in zip(graph.edges.tolist(), graph.weights.tolist()):
+        for x, y in ((a, b), (b, a)):
+            if x in neighbours:
+                known = neighbours[x].get(y)
+                neighbours[x][y] = w if known is None else min(known, w)
+    attach, offset = [], []
+    for i in vertices:
+        near = neighbours[int(i)]
+        if len(near) == 1:
+            (j, w), = near.items()
+            attach.append(j)
+            offset.append(w)
+        else:
+            attach.append(int(i))
+            offset.append(0.0)
+    return np.asarray(attach, dtype=np.int64), np.asarray(offset)
+
+
+def host_distances(graph: ClusterGraph, vertices: Sequence[int]) -> np.ndarray:
+    """Кратчайшие расстояния между вершинами ``vertices`` (обычно хостами).
+
+    Пути ищутся только от самих хостов (точнее, их коммутаторов доступа), а
+    не между всеми вершинами вместе с коммутаторами.  Недостижимые пары
+    получают штраф больше любого реального пути.
+    """
+    idx = np.asarray(vertices, dtype=np.int64)
+    attach, offset = _attachments(graph, idx)
+    sources, row = np.unique(attach, return_inverse=True)
+    dist = offset[:, None] + _shortest_from(graph, sources)[row][:, idx]
+    np.fill_diagonal(dist, 0.0)
+    finite = dist[np.isfinite(dist)]
+    penalty = (finite.max() if finite.size else 0.0) + 1.0
+    dist[~np.isfinite(dist)] = 2 * penalty
+    return dist
+
+
+def host_vertices(
+    graph: ClusterGraph, hosts: Sequence[str], names: Optional[Sequence[str]] = None
+) -> List[int]:
+    """
+    Сопоставляет адреса хостов вершинам графа.
+
+    Сначала по ``names`` (имя узла GNS3 для каждого хоста), затем по
+    совпадению адреса с именем вершины; оставшиеся хосты получают
+    свободные VM-вершины по порядку описания — в том же порядке
+    gns3_vm_manager раздаёт IP-адреса.
+    """
+    by_name = {graph.names[i]: i for i in graph.hosts}
+    free = [i for i in graph.hosts]
+    result: List[Optional[int]] = []
+    for pos, host in enumerate(hosts):
+        label = names[pos] if names and pos < len(names) else None
+        idx = by_name.get(label) if label else None
+        if idx is None:
+            idx = by_name.get(host)
+        if idx is not None and idx in free:
+            free.remove(idx)
+        else:
+            idx = None
+        result.append(idx)
+    for pos, idx in enumerate(result):
+        if idx is None:
+            if not free:
+                raise ValueError(f"topology has fewer VMs than hosts ({len(hosts)})")
+            result[pos] = free.pop(0)
+    return result  # type: ignore[return-value]
+
+
+def host_distance_matrix(
+    graph: ClusterGraph, hosts: Sequence[str], names: Optional[Sequence[str]] = None
+) -> np.ndarray:
+    """Матрица расстояний (len(hosts) × len(hosts)) между хостами в хопах
+    (с учётом весов связей)."""
+    return host_distances(graph, host_vertices(graph, hosts, names))
+
+
+def measured_distance_matrix(matrix: Sequence[Sequence[float]], n_hosts: int) -> np.ndarray:
+    """Замеренные расстояния → хопы: ближайшая пара разных хостов — 1.
+
+    Замеры в двух направлениях усредняются, диагональ обнуляется;
+    ValueError — не N×N, отрицательные или нечисловые значения.
+    """
+    try:
+        d = np.asarray(matrix, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError("must be a numeric matrix") from None
+    if d.shape != (n_hosts, n_hosts):
+        raise ValueError(f"expected {n_hosts}×{n_hosts}, got {'×'.join(map(str, d.shape))}")
+    if not np.isfinite(d).all() or (d < 0).any():
+        raise ValueError("values must be finite and non-negative")
+    d = (d + d.T) / 2
+    np.fill_diagonal(d, 0.0)
+    positive = d[d > 0]
+    return d / positive.min() if positive.size else d